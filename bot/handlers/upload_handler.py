@@ -7,12 +7,13 @@ from datetime import datetime
 from typing import List, Dict, Optional
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
+from sqlalchemy import func
 from database.db_v2 import SessionLocal
 from models import User, University, Course, Unit, Topic, Question
 from bot.services.ai_service import AIService
 from bot.utils.formatters import format_question_preview
-from services.moderation import moderate_question_with_ai
-from services.analytics_service import AnalyticsService
+from handlers.moderation_handlers import ModerationHandlers
+from services.analytics_service import analytics_service
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,7 +22,8 @@ logger = logging.getLogger(__name__)
 class UploadHandler:
     def __init__(self):
         self.ai_service = AIService()
-        self.analytics_service = AnalyticsService()
+        self.analytics_service = analytics_service
+        self.moderation_handlers = ModerationHandlers()
     
     async def start_upload_process(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Start the upload process by asking for upload type."""
@@ -454,10 +456,10 @@ D) {question['options'][3]}
 **Successfully uploaded:** {uploaded_count} questions
 **Uploader:** @{update.effective_user.username or update.effective_user.first_name}
 
-🤖 **AI Moderation:** All questions have been automatically reviewed by AI
-📊 **Status:** Questions are now available for students to practice! 🎉
+🤖 **AI Moderation:** Running in the background for each question
+📊 **Status:** Accepted questions become available for students to practice! 🎉
 
-💡 **Note:** Some questions may require additional review by super admins."""
+💡 **Note:** Questions the AI flags will wait for review by super admins."""
             
             keyboard = [
                 [InlineKeyboardButton("📤 Upload More", callback_data="upload_questions")],
@@ -496,17 +498,13 @@ D) {question['options'][3]}
             db.close()
     
     async def _upload_questions_to_db(self, questions: List[Dict], user: User, metadata: Optional[Dict] = None) -> int:
-        """Upload questions to database with AI moderation."""
+        """Upload questions to database and queue AI moderation for each one."""
         db = SessionLocal()
-        uploaded_count = 0
-        moderated_count = 0
+        inserted = []
         
         try:
             for question_data in questions:
-                # Run AI moderation on the question
-                moderation_result = moderate_question_with_ai(question_data)
-                
-                # Create question record
+                # Held for review until the background AI moderation records its verdict
                 question = Question(
                     question_text=question_data['question'],
                     option_a=question_data['options'][0],
@@ -522,47 +520,35 @@ D) {question['options'][3]}
                     unit=(metadata or {}).get('unit'),
                     topic=(metadata or {}).get('topic'),
                     created_at=datetime.utcnow(),
-                    # AI moderation fields
-                    moderation_score=moderation_result.get('moderation_score', 0),
-                    moderation_comments=moderation_result.get('moderation_comments', ''),
-                    moderated_by_ai=True
+                    needs_review=True,
+                    moderated_by_ai=False
                 )
                 
-                # Set moderation status based on AI decision
-                action = moderation_result.get('action', 'flag')
-                if action == 'accept':
-                    question.needs_review = False
-                elif action == 'reject':
-                    question.is_active = False
-                    question.needs_review = False
-                else:  # flag
-                    question.needs_review = True
-                
                 db.add(question)
                 db.flush()  # Get the question ID
-                
-                # Update contributor stats
-                self.analytics_service.update_contributor_stats(user.user_id, question.question_id, action)
-                
-                uploaded_count += 1
-                if moderation_result.get('moderation_score', 0) > 0:
-                    moderated_count += 1
-            
-            db.commit()
+                inserted.append((question_data, question.question_id))
             
-            # Update user upload count
-            user.upload_count = (user.upload_count or 0) + uploaded_count
+            # Update user upload count; `user` is detached, so bump the column in SQL
+            db.query(User).filter(User.user_id == user.user_id).update(
+                {User.upload_count: func.coalesce(User.upload_count, 0) + len(inserted)},
+                synchronize_session=False
+            )
             db.commit()
             
-            logger.info(f"Uploaded {uploaded_count} questions, {moderated_count} moderated by AI")
-            return uploaded_count
-            
         except Exception as e:
             db.rollback()
             logger.error(f"Error uploading questions: {e}")
             raise e
         finally:
             db.close()
+        
+        # Moderation (and the contributor stats it updates) runs after the reply, one
+        # question at a time in a single background task; only committed rows are scheduled
+        if inserted:
+            self.moderation_handlers.schedule_moderation(inserted)
+        
+        logger.info(f"Uploaded {len(inserted)} questions, AI moderation scheduled")
+        return len(inserted)
     
     def _clear_upload_context(self, context: ContextTypes.DEFAULT_TYPE):
         """Clear upload-related context data."""
@@ -3,7 +3,7 @@ from datetime import datetime
 from typing import List, Tuple, Optional
 from sqlalchemy.orm import Session
 from models import QuizSession, QuizAnswer, Question
-from services.analytics_service import AnalyticsService
+from services.analytics_service import analytics_service
 
 
 class QuizEngine:
@@ -46,8 +46,7 @@ class QuizEngine:
         self.db.refresh(session)
         
         # Store question IDs in session for reference
-        question_ids = [str(q.id) for q in selected]
-        session.question_ids = ','.join(question_ids)
+        session.question_ids = [q.id for q in selected]
         self.db.commit()
         
         return session, selected
@@ -57,7 +56,7 @@ class QuizEngine:
         if not session.question_ids:
             return None
             
-        question_id_list = [int(qid) for qid in session.question_ids.split(',')]
+        question_id_list = session.question_ids
         
         if session.current_index >= len(question_id_list):
             return None
@@ -143,7 +142,6 @@ class QuizEngine:
         
         # Update user analytics
         try:
-            analytics_service = AnalyticsService()
             analytics_service.update_user_analytics(session.user_id, session)
         except Exception as e:
             # Log error but don't fail the quiz completion
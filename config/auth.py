@@ -3,6 +3,8 @@ Authentication configuration for BotCamp Medical
 Contains admin and super-admin access codes
 """
 
+import hmac
+
 # Admin access codes (can be changed by super admin)
 ADMIN_CODES = {
     "admin123": "Admin User 1",
@@ -16,13 +18,22 @@ SUPER_ADMIN_CODE = "superadmin2024"
 # Default super admin Telegram ID (set this to your Telegram ID)
 DEFAULT_SUPER_ADMIN_ID = 1769515855  # Replace with actual super admin ID
 
+def _codes_match(code: str, expected: str) -> bool:
+    # Constant-time so response timing doesn't leak how much of a code matched
+    return hmac.compare_digest(code.encode(), expected.encode())
+
 def verify_admin_code(code: str) -> bool:
     """Verify if the provided code is a valid admin code"""
-    return code in ADMIN_CODES
+    if not code:
+        return False
+    matched = False
+    for known in ADMIN_CODES:
+        matched |= _codes_match(code, known)
+    return matched
 
 def verify_super_admin_code(code: str) -> bool:
     """Verify if the provided code is the super admin code"""
-    return code == SUPER_ADMIN_CODE
+    return bool(code) and _codes_match(code, SUPER_ADMIN_CODE)
 
 def get_admin_name(code: str) -> str:
     """Get the admin name for a given code"""
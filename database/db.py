@@ -13,6 +13,10 @@ def _to_async_url(url: str) -> str:
         return url
     if url.startswith("sqlite:"):
         return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    # Plain Postgres URLs (and Heroku-style postgres://) go through asyncpg
+    for prefix in ("postgresql://", "postgres://", "postgresql+psycopg2://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
     # For other drivers, caller must provide a proper async URL
     return url
 
@@ -22,7 +26,16 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Create async engine/session
 ASYNC_DATABASE_URL = _to_async_url(DATABASE_URL)
-async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False, future=True)
+# Every handler checks out its own session, so size the pool for concurrent
+# updates rather than the default 5 + 10 overflow
+_ASYNC_POOL_KWARGS = {} if ASYNC_DATABASE_URL.startswith("sqlite") else {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "20")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "40")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+}
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, echo=False, future=True, pool_pre_ping=True, **_ASYNC_POOL_KWARGS
+)
 AsyncSessionLocal = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False, autocommit=False)
 
 def get_db():
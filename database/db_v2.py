@@ -1,16 +1,47 @@
+import asyncio
 import os
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, TypeVar
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
 from models import Base
 
 
 DATABASE_URL = os.getenv("DB_URL", "sqlite:///./botcamp_medical.db")
 
-engine = create_engine(DATABASE_URL, echo=True, future=True)
+# Size the pool for bursts of concurrent Telegram callbacks; pre-ping so
+# connections dropped by the server while idle are replaced transparently.
+# LIFO checkout keeps reusing the few warm connections and lets the rest idle out.
+_POOL_KWARGS = {} if DATABASE_URL.startswith("sqlite") else {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "20")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_use_lifo": True,
+}
+
+engine = create_engine(
+    DATABASE_URL, echo=True, future=True, pool_pre_ping=True, query_cache_size=1200, **_POOL_KWARGS
+)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 
-def create_all():
-    Base.metadata.create_all(bind=engine)
+@contextmanager
+def get_session() -> Iterator[Session]:
+    """Yield a session that is always returned to the pool on exit."""
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+T = TypeVar("T")
 
 
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run blocking session work in a worker thread so the bot's event loop keeps serving updates."""
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+def create_all():
+    Base.metadata.create_all(bind=engine)
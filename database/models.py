@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, JSON, Float
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, JSON, Float, Index
+from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -18,7 +19,7 @@ class User(Base):
     
     # Additional fields for enhanced functionality
     telegram_id = Column(Integer, unique=True, index=True)
-    username = Column(String, nullable=True)
+    username = Column(String, nullable=True, index=True)  # /setadminscope and super-admin lookups by @username
     first_name = Column(String, nullable=True)
     last_name = Column(String, nullable=True)
     
@@ -35,6 +36,11 @@ class User(Base):
     quiz_sessions = relationship("QuizSession", back_populates="user")
     quiz_results = relationship("QuizResult", back_populates="user")
     uploaded_questions = relationship("Question", foreign_keys="Question.uploader_id", back_populates="uploader")
+    
+    __table_args__ = (
+        # Role filters and the global stats GROUP BY role; named as in add_role_management_tables
+        Index("idx_users_role", role),
+    )
 
 class University(Base):
     __tablename__ = "universities"
@@ -108,7 +114,7 @@ class Question(Base):
     explanation = Column(Text, nullable=True)
     uploader_id = Column(Integer, ForeignKey("users.user_id"), nullable=True)
     verified_by = Column(Integer, ForeignKey("users.user_id"), nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
     
     # Additional fields for enhanced functionality
     topic_id = Column(Integer, ForeignKey("topics.id"), nullable=True)
@@ -128,8 +134,19 @@ class Question(Base):
     moderation_score = Column(Integer, nullable=True)
     moderation_comments = Column(Text, nullable=True)
     moderated_by_ai = Column(Boolean, default=False)
-    needs_review = Column(Boolean, default=False)
+    needs_review = Column(Boolean, default=False, index=True)
     reviewed_by_admin_id = Column(Integer, ForeignKey("admins.id"), nullable=True)
+    
+    __table_args__ = (
+        # Moderation queue: newest pending questions first, indexing only pending rows
+        Index(
+            "ix_questions_pending_created_at", created_at,
+            postgresql_where=(needs_review == True),
+            sqlite_where=(needs_review == True)
+        ),
+        # Quiz sampling filters active questions within a topic
+        Index("ix_questions_topic_active", topic_id, is_active),
+    )
 
 class QuizSession(Base):
     __tablename__ = "quiz_sessions"
@@ -150,12 +167,20 @@ class QuizSession(Base):
     duration_seconds = Column(Integer, nullable=True)
     accuracy = Column(Integer, nullable=True)
     topic_accuracy_breakdown = Column(JSON, nullable=True)
+    question_ids = Column(JSON, nullable=True)  # Ordered list of question IDs
     
     # Relationships
     user = relationship("User", back_populates="quiz_sessions")
     topic = relationship("Topic")
     paper = relationship("Paper")
     answers = relationship("QuizAnswer", back_populates="session")
+    
+    __table_args__ = (
+        # Unfinished-session check and stats aggregates on every quiz menu tap
+        Index("ix_quiz_sessions_user_completed", user_id, is_completed),
+        # History and retry list a user's sessions newest first
+        Index("ix_quiz_sessions_user_started", user_id, started_at.desc()),
+    )
 
 class QuizAnswer(Base):
     __tablename__ = "quiz_answers"
@@ -257,7 +282,7 @@ class AdminUpload(Base):
     ai_model = Column(String, nullable=True)  # Gemini/GPT
     questions_detected = Column(Integer, default=0)
     approved_questions = Column(Integer, default=0)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
     
     # Relationships
     uploader = relationship("User")
@@ -383,6 +408,11 @@ class QuestionUpload(Base):
     # Relationships
     uploader = relationship("User", foreign_keys=[uploaded_by])
     approver = relationship("User", foreign_keys=[approved_by])
+    
+    __table_args__ = (
+        # Pending queue, batch approval and the global stats GROUP BY status
+        Index("idx_question_uploads_status", status),
+    )
 
 class RoleAuditLog(Base):
     __tablename__ = "role_audit_logs"
@@ -7,7 +7,7 @@ import logging
 from services.ocr import extract_text_from_file
 from services.ai_parser import parse_mcqs_with_ai
 from services.moderation import moderate_question_with_ai
-from services.analytics_service import AnalyticsService
+from services.analytics_service import analytics_service
 import json
 import os
 from services.cache import memory_cache
@@ -668,8 +668,9 @@ async def moderation_queue_command(update: Update, context: ContextTypes.DEFAULT
                 return
         
         # Use analytics service to get moderation queue
-        analytics_service = AnalyticsService()
-        pending_questions = analytics_service.get_moderation_queue()
+        queue = analytics_service.get_moderation_queue_page(limit=10)
+        pending_questions = queue["questions"]
+        total_count = queue["total_count"]
         
         if not pending_questions:
             await update.message.reply_text("✅ No questions pending moderation review.")
@@ -679,7 +680,7 @@ async def moderation_queue_command(update: Update, context: ContextTypes.DEFAULT
         message = "🔍 **Moderation Queue**\n\n"
         keyboard = []
         
-        for i, q in enumerate(pending_questions[:10]):  # Show first 10
+        for i, q in enumerate(pending_questions):  # First page only
             message += f"**{i+1}.** {q['question_text']}\n"
             message += f"📊 Score: {q['moderation_score']}/100 | 👤 {q['uploader']}\n"
             message += f"📅 {q['created_at']} | 🏷️ {q['topic']}\n\n"
@@ -691,8 +692,8 @@ async def moderation_queue_command(update: Update, context: ContextTypes.DEFAULT
                 InlineKeyboardButton(f"✏️ Review {i+1}", callback_data=f"mod_review_{q['question_id']}")
             ])
         
-        if len(pending_questions) > 10:
-            message += f"... and {len(pending_questions) - 10} more questions pending review."
+        if total_count > len(pending_questions):
+            message += f"... and {total_count - len(pending_questions)} more questions pending review."
         
         keyboard.append([InlineKeyboardButton("🔄 Refresh", callback_data="moderation_queue")])
         
@@ -781,13 +782,13 @@ async def moderation_approve_callback(update: Update, context: ContextTypes.DEFA
             question.reviewed_by_admin_id = update.effective_user.id
             
             # Update contributor stats
-            analytics_service = AnalyticsService()
             if question.uploader_id:
                 analytics_service.update_contributor_stats(question.uploader_id, question_id, "approved")
             
             # Log the event
             db.add(EventLog(user_id=update.effective_user.id, event_type="moderation_approve", context={"question_id": question_id}))
             await db.commit()
+            analytics_service.invalidate_cached_analytics()
         
         await query.edit_message_text("✅ Question approved and published!")
         
@@ -817,13 +818,13 @@ async def moderation_reject_callback(update: Update, context: ContextTypes.DEFAU
             question.reviewed_by_admin_id = update.effective_user.id
             
             # Update contributor stats
-            analytics_service = AnalyticsService()
             if question.uploader_id:
                 analytics_service.update_contributor_stats(question.uploader_id, question_id, "rejected")
             
             # Log the event
             db.add(EventLog(user_id=update.effective_user.id, event_type="moderation_reject", context={"question_id": question_id}))
             await db.commit()
+            analytics_service.invalidate_cached_analytics()
         
         await query.edit_message_text("❌ Question rejected and unpublished.")
         
@@ -849,7 +850,6 @@ async def analytics_quizzes_command(update: Update, context: ContextTypes.DEFAUL
                 return
             
             # Get analytics based on user role
-            analytics_service = AnalyticsService()
             if user_obj.role == 'student':
                 analytics = analytics_service.get_quiz_analytics(user_id=user_obj.user_id)
             else:
@@ -995,7 +995,6 @@ async def my_contributions_command(update: Update, context: ContextTypes.DEFAULT
                 return
             
             # Get contributor analytics
-            analytics_service = AnalyticsService()
             analytics = analytics_service.get_contributor_analytics(user_obj.user_id)
             
             if not analytics:
@@ -1084,9 +1083,7 @@ async def my_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 return
             
             # Get personal analytics
-            analytics_service = AnalyticsService()
-            analytics = analytics_service.get_quiz_analytics(user_id=user_obj.user_id)
-            contributor_analytics = analytics_service.get_contributor_analytics(user_obj.user_id)
+            analytics, contributor_analytics = analytics_service.get_personal_stats(user_obj.user_id)
             
             message = f"👤 **{user_obj.username or user_obj.first_name or 'Student'}**\n\n"
             
@@ -1156,7 +1153,6 @@ async def admin_dashboard_command(update: Update, context: ContextTypes.DEFAULT_
                 return
         
         # Get dashboard data
-        analytics_service = AnalyticsService()
         dashboard_data = analytics_service.get_admin_dashboard_data()
         
         if not dashboard_data:
@@ -10,7 +10,7 @@ from telegram.ext import ContextTypes
 from database.models import User, Question, QuestionUpload, UploadBatch
 from database.db_v2 import SessionLocal
 from services.session_service import SessionService
-from services.analytics_service import AnalyticsService
+from services.analytics_service import analytics_service
 from services.multi_admin_service import MultiAdminService
 from services.role_management_service import RoleManagementService
 
@@ -19,7 +19,7 @@ logger = logging.getLogger(__name__)
 class AdminRoleHandlers:
     def __init__(self):
         self.session_service = SessionService()
-        self.analytics_service = AnalyticsService()
+        self.analytics_service = analytics_service
         self.multi_admin_service = MultiAdminService()
         self.role_service = RoleManagementService()
     
@@ -13,7 +13,6 @@ from typing import List, Dict, Any
 import logging
 import json
 import os
-from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
@@ -412,8 +411,7 @@ Ready to submit {approved_count} questions to the database?"""
                     status="approved",
                     ai_model="gemini",  # or detect from AI service
                     questions_detected=len(session["questions"]),
-                    approved_questions=len(session["approved_questions"]),
-                    created_at=datetime.utcnow()
+                    approved_questions=len(session["approved_questions"])
                 )
                 db.add(admin_upload)
                 db.commit()
@@ -433,8 +431,7 @@ Ready to submit {approved_count} questions to the database?"""
                         correct_option=question_data["correct_option"],
                         explanation=question_data.get("explanation", ""),
                         uploader_id=telegram_id,
-                        is_active=True,
-                        created_at=datetime.utcnow()
+                        is_active=True
                     )
                     db.add(question)
                     questions_added += 1
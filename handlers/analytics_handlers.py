@@ -6,15 +6,119 @@ import logging
 from typing import Dict, Any
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from database.models import User
-from database.db_v2 import SessionLocal
-from services.analytics_service import AnalyticsService
+from database.db_v2 import run_db
+from services.user_cache import resolve_user
+from utils.helpers import escape_markdown_legacy as md
+from services.analytics_service import analytics_service
 
 logger = logging.getLogger(__name__)
 
+# Static message bodies, filled from the analytics dicts with str.format
+_QUIZ_TMPL = (
+    "**{header}:**\n"
+    "📝 Total Quizzes: {total_quizzes}\n"
+    "✅ Completed: {completed_quizzes}\n"
+    "🎯 Average Accuracy: {average_accuracy}%\n"
+    "📚 Questions Attempted: {total_questions_attempted}\n"
+    "✅ Correct Answers: {total_correct_answers}\n\n"
+)
+
+_CONTRIBUTIONS_TMPL = (
+    "👤 **{user_info[username]}**\n"
+    "🎭 Role: {role}\n\n"
+    "📤 **Upload Statistics:**\n"
+    "📝 Total Uploaded: {upload_stats[total_uploaded]}\n"
+    "✅ Approved: {upload_stats[approved]}\n"
+    "⚠️ Flagged: {upload_stats[flagged]}\n"
+    "❌ Rejected: {upload_stats[rejected]}\n"
+    "📊 Approval Rate: {upload_stats[approval_rate]}%\n\n"
+    "🎯 **Quality Metrics:**\n"
+    "⭐ Average AI Score: {quality_metrics[average_moderation_score]}/100\n"
+    "📚 Most Active Unit: {quality_metrics[most_active_unit]}\n"
+    "🏷️ Most Active Topic: {quality_metrics[most_active_topic]}\n\n"
+    "📊 **Quiz Performance:**\n"
+    "🎮 Quizzes Taken: {quiz_performance[total_quizzes_taken]}\n"
+    "🎯 Average Accuracy: {quiz_performance[average_accuracy]}%\n\n"
+)
+
+_DASHBOARD_TMPL = (
+    "📊 **Admin Dashboard**\n\n"
+    "🏢 **System Overview:**\n"
+    "👥 Total Users: {system_overview[total_users]}\n"
+    "🎓 Students: {system_overview[total_students]}\n"
+    "👨‍💼 Admins: {system_overview[total_admins]}\n"
+    "🔧 Super Admins: {system_overview[total_super_admins]}\n\n"
+    "📚 **Content:**\n"
+    "❓ Total Questions: {system_overview[total_questions]}\n"
+    "🏷️ Topics: {system_overview[total_topics]}\n"
+    "📖 Units: {system_overview[total_units]}\n"
+    "🎓 Courses: {system_overview[total_courses]}\n"
+    "🏫 Universities: {system_overview[total_universities]}\n\n"
+    "📈 **This Week's Activity:**\n"
+    "🎮 Quiz Sessions: {recent_activity[quiz_sessions_this_week]}\n"
+    "📤 New Uploads: {recent_activity[uploads_this_week]}\n"
+    "🎯 Average Accuracy: {recent_activity[average_quiz_accuracy]}%\n"
+    "🔥 Most Active Topic: {recent_activity[most_active_topic]}\n\n"
+    "🔍 **Moderation:**\n"
+    "⚠️ Pending Review: {moderation[questions_pending_review]}\n"
+)
+
+_MY_QUIZ_PERFORMANCE_TMPL = (
+    "📊 **Quiz Performance:**\n"
+    "🎮 Total Quizzes: {total_quizzes}\n"
+    "✅ Completed: {completed_quizzes}\n"
+    "🎯 Average Accuracy: {average_accuracy}%\n"
+    "📚 Questions Attempted: {total_questions_attempted}\n"
+    "✅ Correct Answers: {total_correct_answers}\n\n"
+)
+
+# Static keyboards are immutable, so build them once at import time
+MAIN_MENU_BTN = InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")
+QUIZ_ANALYTICS_BTN = InlineKeyboardButton("📊 Quiz Analytics", callback_data="analytics_quizzes")
+
+_QUIZ_ANALYTICS_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔄 Refresh", callback_data="analytics_quizzes")],
+    [MAIN_MENU_BTN]
+])
+_QUIZ_ANALYTICS_STUDENT_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔄 Refresh", callback_data="analytics_quizzes")],
+    [InlineKeyboardButton("📈 My Stats", callback_data="my_stats")],
+    [MAIN_MENU_BTN]
+])
+_CONTRIBUTIONS_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔄 Refresh", callback_data="my_contributions")],
+    [InlineKeyboardButton("📤 Upload Questions", callback_data="upload_questions")],
+    [MAIN_MENU_BTN]
+])
+_DASHBOARD_ROWS = [
+    [InlineKeyboardButton("🔍 Moderation Queue", callback_data="moderation_queue")],
+    [QUIZ_ANALYTICS_BTN],
+    [InlineKeyboardButton("🔄 Refresh", callback_data="admin_dashboard")]
+]
+_ADMIN_DASHBOARD_MARKUP = InlineKeyboardMarkup(_DASHBOARD_ROWS + [[MAIN_MENU_BTN]])
+_SUPER_ADMIN_DASHBOARD_MARKUP = InlineKeyboardMarkup(
+    _DASHBOARD_ROWS + [[InlineKeyboardButton("⚙️ System Status", callback_data="system_status")], [MAIN_MENU_BTN]]
+)
+_STATS_ROWS = [
+    [InlineKeyboardButton("🎮 Take Quiz", callback_data="take_quiz")],
+    [QUIZ_ANALYTICS_BTN],
+    [InlineKeyboardButton("🔄 Refresh", callback_data="my_stats")]
+]
+_STATS_MARKUP = InlineKeyboardMarkup(_STATS_ROWS + [[MAIN_MENU_BTN]])
+_ADMIN_STATS_MARKUP = InlineKeyboardMarkup(
+    _STATS_ROWS + [[InlineKeyboardButton("📤 My Contributions", callback_data="my_contributions")], [MAIN_MENU_BTN]]
+)
+
+_MY_CONTRIBUTIONS_TMPL = (
+    "📤 **Contributions:**\n"
+    "📝 Questions Uploaded: {total_uploaded}\n"
+    "✅ Approved: {approved}\n"
+    "📊 Approval Rate: {approval_rate}%\n\n"
+)
+
 class AnalyticsHandlers:
     def __init__(self):
-        self.analytics_service = AnalyticsService()
+        self.analytics_service = analytics_service
     
     async def analytics_quizzes_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show quiz analytics"""
@@ -22,80 +126,54 @@ class AnalyticsHandlers:
             user_id = update.effective_user.id
             
             # Check user role
-            session = get_db_session()()
-            user = session.query(User).filter(User.telegram_id == user_id).first()
+            user = await run_db(resolve_user, user_id)
             
             if not user:
                 await update.message.reply_text("❌ User not found.")
-                session.close()
                 return
             
             # Get analytics based on user role
             if user.role == 'student':
-                analytics = self.analytics_service.get_quiz_analytics(user_id=user.user_id)
+                analytics = await run_db(self.analytics_service.get_quiz_analytics, user_id=user.user_id)
             else:
-                analytics = self.analytics_service.get_quiz_analytics()
+                analytics = await run_db(self.analytics_service.get_quiz_analytics)
             
             if not analytics:
                 await update.message.reply_text("📊 No quiz data available yet.")
-                session.close()
                 return
             
             # Format message
-            message = "📊 **Quiz Analytics**\n\n"
-            
-            if user.role == 'student':
-                message += f"**Your Performance:**\n"
-                message += f"📝 Total Quizzes: {analytics['total_quizzes']}\n"
-                message += f"✅ Completed: {analytics['completed_quizzes']}\n"
-                message += f"🎯 Average Accuracy: {analytics['average_accuracy']}%\n"
-                message += f"📚 Questions Attempted: {analytics['total_questions_attempted']}\n"
-                message += f"✅ Correct Answers: {analytics['total_correct_answers']}\n\n"
-            else:
-                message += f"**System Overview:**\n"
-                message += f"📝 Total Quizzes: {analytics['total_quizzes']}\n"
-                message += f"✅ Completed: {analytics['completed_quizzes']}\n"
-                message += f"🎯 Average Accuracy: {analytics['average_accuracy']}%\n"
-                message += f"📚 Questions Attempted: {analytics['total_questions_attempted']}\n"
-                message += f"✅ Correct Answers: {analytics['total_correct_answers']}\n\n"
+            header = "Your Performance" if user.role == 'student' else "System Overview"
+            parts = ["📊 **Quiz Analytics**\n\n", _QUIZ_TMPL.format(header=header, **analytics)]
             
             # Most attempted topics
             if analytics['most_attempted_topics']:
-                message += "🔥 **Most Attempted Topics:**\n"
-                for topic in analytics['most_attempted_topics'][:3]:
-                    message += f"• {topic['name']}: {topic['count']} quizzes\n"
-                message += "\n"
+                parts.append("🔥 **Most Attempted Topics:**\n")
+                parts.extend(f"• {topic['name']}: {topic['count']} quizzes\n"
+                             for topic in analytics['most_attempted_topics'][:3])
+                parts.append("\n")
             
             # Lowest performing topics
             if analytics['lowest_performing_topics']:
-                message += "⚠️ **Topics Needing Attention:**\n"
-                for topic in analytics['lowest_performing_topics'][:3]:
-                    message += f"• {topic['name']}: {topic['accuracy']}% accuracy\n"
-                message += "\n"
+                parts.append("⚠️ **Topics Needing Attention:**\n")
+                parts.extend(f"• {topic['name']}: {topic['accuracy']}% accuracy\n"
+                             for topic in analytics['lowest_performing_topics'][:3])
+                parts.append("\n")
             
             # Top students (only for admins/super_admins)
             if user.role in ['admin', 'super_admin'] and analytics['top_students']:
-                message += "🏆 **Top Students:**\n"
-                for student in analytics['top_students'][:5]:
-                    message += f"• {student['username']}: {student['accuracy']}% ({student['quizzes']} quizzes)\n"
-            
-            keyboard = [
-                [InlineKeyboardButton("🔄 Refresh", callback_data="analytics_quizzes")],
-                [InlineKeyboardButton("📈 My Stats", callback_data="my_stats")] if user.role == 'student' else [],
-                [InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")]
-            ]
+                parts.append("🏆 **Top Students:**\n")
+                parts.extend(f"• {student['username']}: {student['accuracy']}% ({student['quizzes']} quizzes)\n"
+                             for student in analytics['top_students'][:5])
             
-            # Remove empty lists
-            keyboard = [row for row in keyboard if row]
+            message = "".join(parts)
             
             await update.message.reply_text(
                 message,
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                reply_markup=_QUIZ_ANALYTICS_STUDENT_MARKUP if user.role == 'student' else _QUIZ_ANALYTICS_MARKUP,
                 parse_mode='Markdown'
             )
             
-            session.close()
-            
         except Exception as e:
             logger.error(f"Error in analytics_quizzes_command: {e}")
             await update.message.reply_text("❌ Error loading quiz analytics.")
@@ -106,67 +184,41 @@ class AnalyticsHandlers:
             user_id = update.effective_user.id
             
             # Get user info
-            session = SessionLocal()
-            user = session.query(User).filter(User.telegram_id == user_id).first()
+            user = await run_db(resolve_user, user_id)
             
             if not user:
                 await update.message.reply_text("❌ User not found.")
-                session.close()
                 return
             
             # Get contributor analytics
-            analytics = self.analytics_service.get_contributor_analytics(user.user_id)
+            analytics = await run_db(self.analytics_service.get_contributor_analytics, user.user_id)
             
             if not analytics:
                 await update.message.reply_text("📊 No contribution data available.")
-                session.close()
                 return
             
-            # Format message
-            message = f"👤 **{analytics['user_info']['username']}**\n"
-            message += f"🎭 Role: {analytics['user_info']['role'].title()}\n\n"
-            
-            message += "📤 **Upload Statistics:**\n"
-            message += f"📝 Total Uploaded: {analytics['upload_stats']['total_uploaded']}\n"
-            message += f"✅ Approved: {analytics['upload_stats']['approved']}\n"
-            message += f"⚠️ Flagged: {analytics['upload_stats']['flagged']}\n"
-            message += f"❌ Rejected: {analytics['upload_stats']['rejected']}\n"
-            message += f"📊 Approval Rate: {analytics['upload_stats']['approval_rate']}%\n\n"
-            
-            message += "🎯 **Quality Metrics:**\n"
-            message += f"⭐ Average AI Score: {analytics['quality_metrics']['average_moderation_score']}/100\n"
-            message += f"📚 Most Active Unit: {analytics['quality_metrics']['most_active_unit']}\n"
-            message += f"🏷️ Most Active Topic: {analytics['quality_metrics']['most_active_topic']}\n\n"
-            
-            message += "📊 **Quiz Performance:**\n"
-            message += f"🎮 Quizzes Taken: {analytics['quiz_performance']['total_quizzes_taken']}\n"
-            message += f"🎯 Average Accuracy: {analytics['quiz_performance']['average_accuracy']}%\n\n"
-            
             # Add motivational message based on performance
             approval_rate = analytics['upload_stats']['approval_rate']
             if approval_rate >= 90:
-                message += "🌟 Excellent work! You're a top contributor!"
+                motivation = "🌟 Excellent work! You're a top contributor!"
             elif approval_rate >= 75:
-                message += "👍 Great job! Keep up the good work!"
+                motivation = "👍 Great job! Keep up the good work!"
             elif approval_rate >= 50:
-                message += "📈 Good progress! Try to improve question quality."
+                motivation = "📈 Good progress! Try to improve question quality."
             else:
-                message += "💪 Keep trying! Review the feedback and improve."
+                motivation = "💪 Keep trying! Review the feedback and improve."
             
-            keyboard = [
-                [InlineKeyboardButton("🔄 Refresh", callback_data="my_contributions")],
-                [InlineKeyboardButton("📤 Upload Questions", callback_data="upload_questions")],
-                [InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")]
-            ]
+            # Format message
+            message = _CONTRIBUTIONS_TMPL.format(
+                role=analytics['user_info']['role'].title(), **analytics
+            ) + motivation
             
             await update.message.reply_text(
                 message,
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                reply_markup=_CONTRIBUTIONS_MARKUP,
                 parse_mode='Markdown'
             )
             
-            session.close()
-            
         except Exception as e:
             logger.error(f"Error in my_contributions_command: {e}")
             await update.message.reply_text("❌ Error loading contribution data.")
@@ -177,72 +229,29 @@ class AnalyticsHandlers:
             user_id = update.effective_user.id
             
             # Check if user is admin or super_admin
-            session = get_db_session()()
-            user = session.query(User).filter(User.telegram_id == user_id).first()
+            user = await run_db(resolve_user, user_id)
+            role = user.role if user else None
             
-            if not user or user.role not in ['admin', 'super_admin']:
+            if role not in ['admin', 'super_admin']:
                 await update.message.reply_text("❌ Access denied. Admin privileges required.")
-                session.close()
                 return
             
             # Get dashboard data
-            dashboard_data = self.analytics_service.get_admin_dashboard_data()
+            dashboard_data = await run_db(self.analytics_service.get_admin_dashboard_data)
             
             if not dashboard_data:
                 await update.message.reply_text("📊 No dashboard data available.")
-                session.close()
                 return
             
             # Format message
-            message = "📊 **Admin Dashboard**\n\n"
-            
-            # System overview
-            overview = dashboard_data['system_overview']
-            message += "🏢 **System Overview:**\n"
-            message += f"👥 Total Users: {overview['total_users']}\n"
-            message += f"🎓 Students: {overview['total_students']}\n"
-            message += f"👨‍💼 Admins: {overview['total_admins']}\n"
-            message += f"🔧 Super Admins: {overview['total_super_admins']}\n\n"
-            
-            message += "📚 **Content:**\n"
-            message += f"❓ Total Questions: {overview['total_questions']}\n"
-            message += f"🏷️ Topics: {overview['total_topics']}\n"
-            message += f"📖 Units: {overview['total_units']}\n"
-            message += f"🎓 Courses: {overview['total_courses']}\n"
-            message += f"🏫 Universities: {overview['total_universities']}\n\n"
-            
-            # Recent activity
-            activity = dashboard_data['recent_activity']
-            message += "📈 **This Week's Activity:**\n"
-            message += f"🎮 Quiz Sessions: {activity['quiz_sessions_this_week']}\n"
-            message += f"📤 New Uploads: {activity['uploads_this_week']}\n"
-            message += f"🎯 Average Accuracy: {activity['average_quiz_accuracy']}%\n"
-            message += f"🔥 Most Active Topic: {activity['most_active_topic']}\n\n"
-            
-            # Moderation
-            moderation = dashboard_data['moderation']
-            message += "🔍 **Moderation:**\n"
-            message += f"⚠️ Pending Review: {moderation['questions_pending_review']}\n"
-            
-            keyboard = [
-                [InlineKeyboardButton("🔍 Moderation Queue", callback_data="moderation_queue")],
-                [InlineKeyboardButton("📊 Quiz Analytics", callback_data="analytics_quizzes")],
-                [InlineKeyboardButton("🔄 Refresh", callback_data="admin_dashboard")]
-            ]
-            
-            if user.role == 'super_admin':
-                keyboard.append([InlineKeyboardButton("⚙️ System Status", callback_data="system_status")])
-            
-            keyboard.append([InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")])
+            message = _DASHBOARD_TMPL.format(**dashboard_data)
             
             await update.message.reply_text(
                 message,
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                reply_markup=_SUPER_ADMIN_DASHBOARD_MARKUP if role == 'super_admin' else _ADMIN_DASHBOARD_MARKUP,
                 parse_mode='Markdown'
             )
             
-            session.close()
-            
         except Exception as e:
             logger.error(f"Error in admin_dashboard_command: {e}")
             await update.message.reply_text("❌ Error loading admin dashboard.")
@@ -253,66 +262,44 @@ class AnalyticsHandlers:
             user_id = update.effective_user.id
             
             # Get user info
-            session = SessionLocal()
-            user = session.query(User).filter(User.telegram_id == user_id).first()
+            user = await run_db(resolve_user, user_id)
             
             if not user:
                 await update.message.reply_text("❌ User not found.")
-                session.close()
                 return
             
             # Get personal analytics
-            analytics = self.analytics_service.get_quiz_analytics(user_id=user.user_id)
-            contributor_analytics = self.analytics_service.get_contributor_analytics(user.user_id)
+            analytics, contributor_analytics = await run_db(self.analytics_service.get_personal_stats, user.user_id)
             
-            message = f"👤 **{user.username or user.first_name or 'Student'}**\n\n"
+            parts = [f"👤 **{md(user.username or user.first_name or 'Student')}**\n\n"]
             
             # Quiz performance
             if analytics and analytics['total_quizzes'] > 0:
-                message += "📊 **Quiz Performance:**\n"
-                message += f"🎮 Total Quizzes: {analytics['total_quizzes']}\n"
-                message += f"✅ Completed: {analytics['completed_quizzes']}\n"
-                message += f"🎯 Average Accuracy: {analytics['average_accuracy']}%\n"
-                message += f"📚 Questions Attempted: {analytics['total_questions_attempted']}\n"
-                message += f"✅ Correct Answers: {analytics['total_correct_answers']}\n\n"
+                parts.append(_MY_QUIZ_PERFORMANCE_TMPL.format(**analytics))
             else:
-                message += "📊 **Quiz Performance:**\n"
-                message += "🎮 No quizzes taken yet. Start taking quizzes to see your stats!\n\n"
+                parts.append("📊 **Quiz Performance:**\n"
+                             "🎮 No quizzes taken yet. Start taking quizzes to see your stats!\n\n")
             
             # Contribution stats (if any)
             if contributor_analytics and contributor_analytics['upload_stats']['total_uploaded'] > 0:
-                message += "📤 **Contributions:**\n"
-                message += f"📝 Questions Uploaded: {contributor_analytics['upload_stats']['total_uploaded']}\n"
-                message += f"✅ Approved: {contributor_analytics['upload_stats']['approved']}\n"
-                message += f"📊 Approval Rate: {contributor_analytics['upload_stats']['approval_rate']}%\n\n"
+                parts.append(_MY_CONTRIBUTIONS_TMPL.format(**contributor_analytics['upload_stats']))
             
             # Motivational message
             if analytics and analytics['average_accuracy'] >= 80:
-                message += "🌟 Excellent performance! Keep it up!"
+                parts.append("🌟 Excellent performance! Keep it up!")
             elif analytics and analytics['average_accuracy'] >= 60:
-                message += "👍 Good work! You're improving!"
+                parts.append("👍 Good work! You're improving!")
             else:
-                message += "💪 Keep practicing! Every quiz helps you learn!"
-            
-            keyboard = [
-                [InlineKeyboardButton("🎮 Take Quiz", callback_data="take_quiz")],
-                [InlineKeyboardButton("📊 Quiz Analytics", callback_data="analytics_quizzes")],
-                [InlineKeyboardButton("🔄 Refresh", callback_data="my_stats")]
-            ]
+                parts.append("💪 Keep practicing! Every quiz helps you learn!")
             
-            if user.role in ['admin', 'super_admin']:
-                keyboard.append([InlineKeyboardButton("📤 My Contributions", callback_data="my_contributions")])
-            
-            keyboard.append([InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")])
+            message = "".join(parts)
             
             await update.message.reply_text(
                 message,
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                reply_markup=_ADMIN_STATS_MARKUP if user.role in ['admin', 'super_admin'] else _STATS_MARKUP,
                 parse_mode='Markdown'
             )
             
-            session.close()
-            
         except Exception as e:
             logger.error(f"Error in my_stats_command: {e}")
             await update.message.reply_text("❌ Error loading personal stats.")
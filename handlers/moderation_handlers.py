@@ -2,20 +2,54 @@
 Moderation handlers for Step 5 - AI Moderation, Analytics & Dashboards
 """
 
+import asyncio
 import logging
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from database.models import Question, User
-from database.db_v2 import SessionLocal
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload
+from database.models import Question
+from database.db_v2 import get_session, run_db
 from services.moderation import moderate_question_with_ai
-from services.analytics_service import AnalyticsService
+from services.analytics_service import analytics_service
+from services.user_cache import resolve_user
+from utils.helpers import escape_markdown_legacy as md
 
 logger = logging.getLogger(__name__)
 
+# AI moderation calls are slow network requests; a small dedicated pool keeps bulk uploads
+# from occupying the default executor that run_db and asyncio.to_thread share
+_MODERATION_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="moderation")
+
+# AI moderation actions -> contributor stat buckets
+_AI_ACTION_STATS = {"accept": "approved", "flag": "flagged", "reject": "rejected"}
+
+REFRESH_QUEUE_BTN = InlineKeyboardButton("🔄 Refresh", callback_data="moderation_queue")
+BACK_TO_QUEUE_BTN = InlineKeyboardButton("🔙 Back to Queue", callback_data="moderation_queue")
+
+_REVIEW_TMPL = (
+    "🔍 **Question Review**\n\n"
+    "**Question:** {question_text}\n\n"
+    "**A)** {option_a}\n"
+    "**B)** {option_b}\n"
+    "**C)** {option_c}\n"
+    "**D)** {option_d}\n\n"
+    "**Correct Answer:** {correct_option}\n"
+    "**Explanation:** {explanation}\n\n"
+    "**Topic:** {topic}\n"
+    "**Unit:** {unit}\n"
+    "**Uploader:** {uploader}\n"
+    "**AI Score:** {moderation_score}/100\n"
+    "**AI Comments:** {comments}\n"
+    "**Created:** {created}"
+)
+
 class ModerationHandlers:
     def __init__(self):
-        self.analytics_service = AnalyticsService()
+        self.analytics_service = analytics_service
+        self._moderation_tasks = set()  # strong refs so background tasks aren't collected
     
     async def moderation_queue_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show moderation queue for super admins"""
@@ -23,42 +57,47 @@ class ModerationHandlers:
             user_id = update.effective_user.id
             
             # Check if user is super admin
-            session = SessionLocal()
-            user = session.query(User).filter(User.telegram_id == user_id).first()
+            user = await run_db(resolve_user, user_id)
+            role = user.role if user else None
             
-            if not user or user.role != 'super_admin':
+            if role != 'super_admin':
                 await update.message.reply_text("❌ Access denied. Super admin privileges required.")
-                session.close()
                 return
             
             # Get pending questions
-            pending_questions = self.analytics_service.get_moderation_queue()
+            queue = await run_db(self.analytics_service.get_moderation_queue_page, limit=10)
+            pending_questions = queue["questions"]
+            total_count = queue["total_count"]
             
             if not pending_questions:
                 await update.message.reply_text("✅ No questions pending moderation review.")
-                session.close()
                 return
             
             # Create message with inline keyboard
-            message = "🔍 **Moderation Queue**\n\n"
-            keyboard = []
-            
-            for i, q in enumerate(pending_questions[:10]):  # Show first 10
-                message += f"**{i+1}.** {q['question_text']}\n"
-                message += f"📊 Score: {q['moderation_score']}/100 | 👤 {q['uploader']}\n"
-                message += f"📅 {q['created_at']} | 🏷️ {q['topic']}\n\n"
-                
-                # Add action buttons for each question
-                keyboard.append([
-                    InlineKeyboardButton(f"✅ Approve {i+1}", callback_data=f"mod_approve_{q['question_id']}"),
-                    InlineKeyboardButton(f"❌ Reject {i+1}", callback_data=f"mod_reject_{q['question_id']}"),
-                    InlineKeyboardButton(f"✏️ Review {i+1}", callback_data=f"mod_review_{q['question_id']}")
-                ])
-            
-            if len(pending_questions) > 10:
-                message += f"... and {len(pending_questions) - 10} more questions pending review."
-            
-            keyboard.append([InlineKeyboardButton("🔄 Refresh", callback_data="moderation_queue")])
+            parts = ["🔍 **Moderation Queue**\n\n"]
+            parts.extend(
+                f"**{i}.** {q['question_text']}\n"
+                f"📊 Score: {q['moderation_score']}/100 | 👤 {q['uploader']}\n"
+                f"📅 {q['created_at']} | 🏷️ {q['topic']}\n\n"
+                for i, q in enumerate(pending_questions, 1)  # First page only
+            )
+            
+            # Action buttons for each question
+            keyboard = [
+                [
+                    InlineKeyboardButton(f"✅ Approve {i}", callback_data=f"mod_approve_{q['question_id']}"),
+                    InlineKeyboardButton(f"❌ Reject {i}", callback_data=f"mod_reject_{q['question_id']}"),
+                    InlineKeyboardButton(f"✏️ Review {i}", callback_data=f"mod_review_{q['question_id']}")
+                ]
+                for i, q in enumerate(pending_questions, 1)
+            ]
+            
+            if total_count > len(pending_questions):
+                parts.append(f"... and {total_count - len(pending_questions)} more questions pending review.")
+            
+            message = "".join(parts)
+            
+            keyboard.append([REFRESH_QUEUE_BTN])
             
             await update.message.reply_text(
                 message,
@@ -66,8 +105,6 @@ class ModerationHandlers:
                 parse_mode='Markdown'
             )
             
-            session.close()
-            
         except Exception as e:
             logger.error(f"Error in moderation_queue_command: {e}")
             await update.message.reply_text("❌ Error loading moderation queue.")
@@ -80,38 +117,35 @@ class ModerationHandlers:
             
             question_id = int(query.data.split('_')[-1])
             
-            session = SessionLocal()
-            question = session.query(Question).filter(Question.question_id == question_id).first()
+            question = await run_db(self._load_question_with_uploader, question_id)
             
             if not question:
                 await query.edit_message_text("❌ Question not found.")
-                session.close()
                 return
             
-            # Get uploader info
-            uploader = session.query(User).filter(User.user_id == question.uploader_id).first()
-            
-            message = f"🔍 **Question Review**\n\n"
-            message += f"**Question:** {question.question_text}\n\n"
-            message += f"**A)** {question.option_a}\n"
-            message += f"**B)** {question.option_b}\n"
-            message += f"**C)** {question.option_c}\n"
-            message += f"**D)** {question.option_d}\n\n"
-            message += f"**Correct Answer:** {question.correct_option}\n"
-            message += f"**Explanation:** {question.explanation or 'None'}\n\n"
-            message += f"**Topic:** {question.topic}\n"
-            message += f"**Unit:** {question.unit}\n"
-            message += f"**Uploader:** {uploader.username or uploader.first_name if uploader else 'Unknown'}\n"
-            message += f"**AI Score:** {question.moderation_score}/100\n"
-            message += f"**AI Comments:** {question.moderation_comments or 'None'}\n"
-            message += f"**Created:** {question.created_at.strftime('%Y-%m-%d %H:%M') if question.created_at else 'Unknown'}"
+            uploader = question.uploader
+            message = _REVIEW_TMPL.format(
+                question_text=md(question.question_text),
+                option_a=md(question.option_a),
+                option_b=md(question.option_b),
+                option_c=md(question.option_c),
+                option_d=md(question.option_d),
+                correct_option=md(question.correct_option),
+                explanation=md(question.explanation or 'None'),
+                topic=md(question.topic),
+                unit=md(question.unit),
+                uploader=md(uploader.username or uploader.first_name) if uploader else 'Unknown',
+                moderation_score=question.moderation_score,
+                comments=md(question.moderation_comments or 'None'),
+                created=question.created_at.strftime('%Y-%m-%d %H:%M') if question.created_at else 'Unknown'
+            )
             
             keyboard = [
                 [
                     InlineKeyboardButton("✅ Approve", callback_data=f"mod_approve_{question_id}"),
                     InlineKeyboardButton("❌ Reject", callback_data=f"mod_reject_{question_id}")
                 ],
-                [InlineKeyboardButton("🔙 Back to Queue", callback_data="moderation_queue")]
+                [BACK_TO_QUEUE_BTN]
             ]
             
             await query.edit_message_text(
@@ -120,8 +154,6 @@ class ModerationHandlers:
                 parse_mode='Markdown'
             )
             
-            session.close()
-            
         except Exception as e:
             logger.error(f"Error in moderation_review_callback: {e}")
             await query.edit_message_text("❌ Error loading question details.")
@@ -134,25 +166,12 @@ class ModerationHandlers:
             
             question_id = int(query.data.split('_')[-1])
             
-            session = SessionLocal()
-            question = session.query(Question).filter(Question.question_id == question_id).first()
+            found = await run_db(self._approve_question, question_id, update.effective_user.id)
             
-            if not question:
+            if not found:
                 await query.edit_message_text("❌ Question not found.")
-                session.close()
                 return
             
-            # Approve the question
-            question.needs_review = False
-            question.reviewed_by_admin_id = update.effective_user.id
-            
-            # Update contributor stats
-            if question.uploader_id:
-                self.analytics_service.update_contributor_stats(question.uploader_id, question_id, "approved")
-            
-            session.commit()
-            session.close()
-            
             await query.edit_message_text("✅ Question approved successfully!")
             
         except Exception as e:
@@ -167,26 +186,12 @@ class ModerationHandlers:
             
             question_id = int(query.data.split('_')[-1])
             
-            session = SessionLocal()
-            question = session.query(Question).filter(Question.question_id == question_id).first()
+            found = await run_db(self._reject_question, question_id, update.effective_user.id)
             
-            if not question:
+            if not found:
                 await query.edit_message_text("❌ Question not found.")
-                session.close()
                 return
             
-            # Reject the question
-            question.is_active = False
-            question.needs_review = False
-            question.reviewed_by_admin_id = update.effective_user.id
-            
-            # Update contributor stats
-            if question.uploader_id:
-                self.analytics_service.update_contributor_stats(question.uploader_id, question_id, "rejected")
-            
-            session.commit()
-            session.close()
-            
             await query.edit_message_text("❌ Question rejected.")
             
         except Exception as e:
@@ -196,40 +201,113 @@ class ModerationHandlers:
     async def moderate_question_after_upload(self, question_data: Dict[str, Any], question_id: int):
         """Automatically moderate a question after upload"""
         try:
-            # Run AI moderation
-            moderation_result = moderate_question_with_ai(question_data)
-            
-            session = SessionLocal()
-            question = session.query(Question).filter(Question.question_id == question_id).first()
-            
-            if question:
-                question.moderation_score = moderation_result.get('moderation_score', 0)
-                question.moderation_comments = moderation_result.get('moderation_comments', '')
-                question.moderated_by_ai = True
-                
-                # Set needs_review based on AI decision
-                action = moderation_result.get('action', 'flag')
-                if action == 'flag':
-                    question.needs_review = True
-                elif action == 'reject':
-                    question.is_active = False
-                    question.needs_review = False
-                else:  # accept
-                    question.needs_review = False
-                
-                session.commit()
-                
-                # Update contributor stats
-                if question.uploader_id:
-                    self.analytics_service.update_contributor_stats(
-                        question.uploader_id, 
-                        question_id, 
-                        action
-                    )
-            
-            session.close()
+            # Run AI moderation (network-bound) on its own small pool, off the event loop and
+            # out of the default executor that run_db shares
+            moderation_result = await asyncio.get_running_loop().run_in_executor(
+                _MODERATION_EXECUTOR, moderate_question_with_ai, question_data
+            )
+            
+            await run_db(self._apply_moderation_result, question_id, moderation_result)
+            
             return moderation_result
             
         except Exception as e:
             logger.error(f"Error in moderate_question_after_upload: {e}")
             return {"error": str(e)}
+    
+    async def _moderate_batch(self, items: List[Tuple[Dict[str, Any], int]]):
+        for question_data, question_id in items:
+            await self.moderate_question_after_upload(question_data, question_id)
+    
+    def schedule_moderation(self, items: List[Tuple[Dict[str, Any], int]]) -> asyncio.Task:
+        """Moderate an uploaded batch of (question_data, question_id) in one background task
+        
+        Questions are moderated one after another, so a large upload holds at most one
+        moderation worker and the upload reply isn't delayed.
+        """
+        task = asyncio.create_task(self._moderate_batch(list(items)))
+        self._moderation_tasks.add(task)
+        task.add_done_callback(self._moderation_tasks.discard)
+        return task
+    
+    def _load_question_with_uploader(self, question_id: int) -> Optional[Question]:
+        """Question and uploader in a single round-trip"""
+        with get_session() as session:
+            return session.query(Question).options(joinedload(Question.uploader)).filter(
+                Question.question_id == question_id
+            ).first()
+    
+    def _approve_question(self, question_id: int, admin_id: int) -> bool:
+        """Mark a question approved; returns False if it does not exist"""
+        with get_session() as session, session.begin():
+            row = session.execute(
+                update(Question)
+                .where(Question.question_id == question_id)
+                .values(needs_review=False, reviewed_by_admin_id=admin_id)
+                .returning(Question.uploader_id)
+            ).first()
+            if row is None:
+                return False
+            
+            # Update contributor stats
+            if row.uploader_id:
+                self.analytics_service.update_contributor_stats(
+                    row.uploader_id, question_id, "approved", session=session
+                )
+        
+        self.analytics_service.invalidate_cached_analytics()
+        return True
+    
+    def _reject_question(self, question_id: int, admin_id: int) -> bool:
+        """Deactivate a rejected question; returns False if it does not exist"""
+        with get_session() as session, session.begin():
+            row = session.execute(
+                update(Question)
+                .where(Question.question_id == question_id)
+                .values(is_active=False, needs_review=False, reviewed_by_admin_id=admin_id)
+                .returning(Question.uploader_id)
+            ).first()
+            if row is None:
+                return False
+            
+            # Update contributor stats
+            if row.uploader_id:
+                self.analytics_service.update_contributor_stats(
+                    row.uploader_id, question_id, "rejected", session=session
+                )
+        
+        self.analytics_service.invalidate_cached_analytics()
+        return True
+    
+    def _apply_moderation_result(self, question_id: int, moderation_result: Dict[str, Any]):
+        """Persist the AI moderation verdict for an uploaded question"""
+        # Set needs_review / is_active based on AI decision
+        action = moderation_result.get('action', 'flag')
+        values = {
+            "moderation_score": moderation_result.get('moderation_score', 0),
+            "moderation_comments": moderation_result.get('moderation_comments', ''),
+            "moderated_by_ai": True,
+            "needs_review": action == 'flag',
+        }
+        if action == 'reject':
+            values["is_active"] = False
+        
+        with get_session() as session, session.begin():
+            row = session.execute(
+                update(Question)
+                .where(Question.question_id == question_id)
+                .values(**values)
+                .returning(Question.uploader_id)
+            ).first()
+            
+            # Update contributor stats in the same transaction
+            if row is not None and row.uploader_id:
+                self.analytics_service.update_contributor_stats(
+                    row.uploader_id,
+                    question_id,
+                    _AI_ACTION_STATS.get(action, action),
+                    session=session
+                )
+        
+        if row is not None:
+            self.analytics_service.invalidate_cached_analytics()
@@ -2,15 +2,37 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from database.db import get_async_db
 from database.models import User, Question, QuizSession, QuizAnswer, Topic, Paper, EventLog
-from sqlalchemy import select, func
-import random
+from sqlalchemy import select, func, update, case, cast, Integer
+from sqlalchemy.orm import joinedload
+import asyncio
 import logging
 from datetime import datetime
 import os
+from typing import Dict, Iterable, NamedTuple, Optional
 from services.cache import memory_cache
 
 logger = logging.getLogger(__name__)
 
+ACTIVE_TOPICS_TTL = int(os.getenv("CACHE_TTL_TOPICS", "300"))
+# Stored questions are not edited in place, so their display data can live long
+QUESTION_CACHE_TTL = int(os.getenv("CACHE_TTL_QUESTION", "3600"))
+
+_OPTIONS = ('A', 'B', 'C', 'D')
+_OPTION_FIELDS = {opt: f"option_{opt.lower()}" for opt in _OPTIONS}
+_ANSWER_CB_FMT = "answer_{sid}_{qid}_{opt}"
+
+class CachedQuestion(NamedTuple):
+    """Display fields of a Question, safe to keep across sessions and in user_data"""
+    id: int
+    question_text: str
+    option_a: str
+    option_b: str
+    option_c: str
+    option_d: str
+    correct_option: str
+    explanation: Optional[str]
+    uploader_username: Optional[str]
+
 def _compute_grade(percentage: int) -> str:
     if percentage >= 80:
         return 'A'
@@ -22,20 +44,57 @@ def _compute_grade(percentage: int) -> str:
         return 'D'
     return 'E'
 
+async def _resolve_user_id(update: Update, context: ContextTypes.DEFAULT_TYPE, db) -> Optional[int]:
+    """Map the Telegram user to the internal user id, remembered in user_data"""
+    db_user_id = context.user_data.get('db_user_id')
+    if db_user_id is None:
+        result = await db.execute(select(User.user_id).where(User.telegram_id == update.effective_user.id))
+        db_user_id = result.scalar_one_or_none()
+        if db_user_id is not None:
+            context.user_data['db_user_id'] = db_user_id
+    return db_user_id
+
+async def _get_questions(db, qids: Iterable[int]) -> Dict[int, CachedQuestion]:
+    """Return display data for the given ids, querying only the cache misses"""
+    found = {}
+    missing = []
+    for qid in qids:
+        cached = memory_cache.get(f"q_{qid}")
+        if cached is None:
+            missing.append(qid)
+        else:
+            found[qid] = cached
+    if missing:
+        result = await db.execute(
+            select(Question).options(joinedload(Question.uploader)).where(Question.question_id.in_(missing))
+        )
+        for q in result.scalars().all():
+            cached = CachedQuestion(
+                q.question_id, q.question_text, q.option_a, q.option_b, q.option_c, q.option_d,
+                q.correct_option, q.explanation, q.uploader.username if q.uploader else None
+            )
+            memory_cache.set(f"q_{q.question_id}", cached, QUESTION_CACHE_TTL)
+            found[q.question_id] = cached
+    return found
+
+async def _get_question(db, qid: int) -> Optional[CachedQuestion]:
+    return (await _get_questions(db, (qid,))).get(qid)
+
 async def take_quiz_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle take quiz callback"""
     query = update.callback_query
     await query.answer()
     
     # Check for unfinished session first
-    user = update.effective_user
     unfinished_session = None
     async for db in get_async_db():
-        # Find user by telegram_id
-        result = await db.execute(select(User).where(User.telegram_id == user.id))
-        db_user = result.scalar_one_or_none()
-        if db_user:
-            result = await db.execute(select(QuizSession).where(QuizSession.user_id == db_user.id, QuizSession.is_completed == False))
+        db_user_id = await _resolve_user_id(update, context, db)
+        if db_user_id is not None:
+            result = await db.execute(
+                select(QuizSession)
+                .where(QuizSession.user_id == db_user_id, QuizSession.is_completed == False)
+                .limit(1)
+            )
             unfinished_session = result.scalars().first()
     if unfinished_session:
         remaining = max(unfinished_session.total_questions - (unfinished_session.current_question or 0), 0)
@@ -49,11 +108,14 @@ async def take_quiz_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         return
 
-    # Get database session (list topics)
-    async for db in get_async_db():
-        # Get all active topics
-        result = await db.execute(select(Topic).where(Topic.is_active == True))
-        topics = result.scalars().all()
+    # Active topics change only on admin edits; writers must
+    # memory_cache.delete("active_topics") when they add or toggle a topic
+    topics = memory_cache.get("active_topics")
+    if topics is None:
+        async for db in get_async_db():
+            result = await db.execute(select(Topic.id, Topic.name).where(Topic.is_active == True))
+            topics = [tuple(row) for row in result.all()]
+        memory_cache.set("active_topics", topics, ACTIVE_TOPICS_TTL)
     
     if not topics:
         await query.edit_message_text(
@@ -65,10 +127,10 @@ async def take_quiz_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
     
     keyboard = []
-    for topic in topics:
+    for topic_id, topic_name in topics:
         keyboard.append([InlineKeyboardButton(
-            topic.name,
-            callback_data=f"quiz_topic_{topic.id}"
+            topic_name,
+            callback_data=f"quiz_topic_{topic_id}"
         )])
     
     keyboard.append([InlineKeyboardButton("🔙 Back to Main Menu", callback_data="main_menu")])
@@ -81,6 +143,15 @@ async def take_quiz_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         parse_mode='Markdown'
     )
 
+def _topic_question_count_stmt(topic_id: int):
+    """Topic name and its active question count in one grouped query"""
+    return (
+        select(Topic.name, func.count(Question.question_id))
+        .outerjoin(Question, (Question.topic_id == Topic.id) & (Question.is_active == True))
+        .where(Topic.id == topic_id)
+        .group_by(Topic.id, Topic.name)
+    )
+
 async def quiz_topic_selected_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle quiz topic selection"""
     query = update.callback_query
@@ -90,24 +161,18 @@ async def quiz_topic_selected_callback(update: Update, context: ContextTypes.DEF
     
     # Get database session
     async for db in get_async_db():
-        # Get topic
-        result = await db.execute(select(Topic).where(Topic.id == topic_id))
-        topic = result.scalar_one_or_none()
+        # Get topic name and its active question count
+        result = await db.execute(_topic_question_count_stmt(topic_id))
+        row = result.first()
         
-        if not topic:
+        if not row:
             await query.edit_message_text("Topic not found.")
             return
-        
-        # Get available questions for this topic
-        result = await db.execute(select(Question).where(
-            Question.topic_id == topic_id,
-            Question.is_active == True
-        ))
-        questions = result.scalars().all()
-    
-    if not questions:
+        topic_name, question_count = row
+    
+    if not question_count:
         await query.edit_message_text(
-            f"No questions available for {topic.name} at the moment.",
+            f"No questions available for {topic_name} at the moment.",
             reply_markup=InlineKeyboardMarkup([[
                 InlineKeyboardButton("🔙 Back to Quiz Topics", callback_data="take_quiz")
             ]])
@@ -125,7 +190,7 @@ async def quiz_topic_selected_callback(update: Update, context: ContextTypes.DEF
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     await query.edit_message_text(
-        f"📚 **Quiz Options for {topic.name}:**\n\nAvailable questions: {len(questions)}",
+        f"📚 **Quiz Options for {topic_name}:**\n\nAvailable questions: {question_count}",
         reply_markup=reply_markup,
         parse_mode='Markdown'
     )
@@ -139,101 +204,90 @@ async def start_quiz_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
     topic_id = int(parts[2])
     num_questions = int(parts[3])
     
-    user = update.effective_user
-    
     # Get database session
     async for db in get_async_db():
-        # Get user
-        result = await db.execute(select(User).where(User.telegram_id == user.id))
-        db_user = result.scalar_one_or_none()
-        
-        if not db_user:
+        db_user_id = await _resolve_user_id(update, context, db)
+        if db_user_id is None:
             await query.edit_message_text("User not found. Please use /start first.")
             return
         
         # Get topic
-        result = await db.execute(select(Topic).where(Topic.id == topic_id))
-        topic = result.scalar_one_or_none()
-        
+        topic = await db.get(Topic, topic_id)
         if not topic:
             await query.edit_message_text("Topic not found.")
             return
         
-        # Get available questions
-        result = await db.execute(select(Question).where(
-            Question.topic_id == topic_id,
-            Question.is_active == True
-        ))
-        all_questions = result.scalars().all()
-        
-        if len(all_questions) < num_questions:
+        # Draw the sample in SQL so only num_questions ids come back
+        result = await db.execute(
+            select(Question.question_id)
+            .where(Question.topic_id == topic_id, Question.is_active == True)
+            .order_by(func.random())
+            .limit(num_questions)
+        )
+        qids = list(result.scalars().all())
+
+        if len(qids) < num_questions:
             await query.edit_message_text(
-                f"Not enough questions available. Only {len(all_questions)} questions found.",
+                f"Not enough questions available. Only {len(qids)} questions found.",
                 reply_markup=InlineKeyboardMarkup([[
                     InlineKeyboardButton("🔙 Back to Quiz Options", callback_data=f"quiz_topic_{topic_id}")
                 ]])
             )
             return
+
+        # Load the selected questions in at most one round-trip, keeping the sampled order
+        qmap = await _get_questions(db, qids)
+        selected_questions = [qmap[qid] for qid in qids if qid in qmap]
+        qids = [q.id for q in selected_questions]
         
-        # Cache question ids for this user/topic session to avoid repeated DB hits
-        qkey = f"quiz_qids_{db_user.id}_{topic_id}_{num_questions}"
-        qids = memory_cache.get(qkey)
-        if not qids:
-            qids = [q.id for q in all_questions]
-            random.shuffle(qids)
-            qids = qids[:num_questions]
-            ttl = 600
-            memory_cache.set(qkey, qids, ttl)
-        selected_questions = []
-        for qid in qids:
-            result = await db.execute(select(Question).where(Question.id == qid))
-            qobj = result.scalar_one_or_none()
-            if qobj:
-                selected_questions.append(qobj)
-        
-        # Create quiz session
+        # Create quiz session; question_ids is the durable copy used by resume
         quiz_session = QuizSession(
-            user_id=db_user.id,
+            user_id=db_user_id,
             topic_id=topic_id,
             total_questions=num_questions,
-            current_question=0
+            current_question=0,
+            question_ids=qids
         )
         db.add(quiz_session)
-        # Persist question id order on the session for resume
-        try:
-            quiz_session.question_ids = ",".join(str(qid) for qid in qids)
-        except Exception:
-            pass
+        # Event log: quiz started, committed with the session row
+        db.add(EventLog(user_id=db_user_id, event_type="quiz_start", context={"topic_id": topic_id, "num_questions": num_questions}))
+        # AsyncSessionLocal uses expire_on_commit=False, so the flushed id is still loaded
         await db.commit()
-        # Event log: quiz started
-        async for db in get_async_db():
-            db.add(EventLog(user_id=db_user.id, event_type="quiz_start", context={"topic_id": topic_id, "num_questions": num_questions}))
-            await db.commit()
-        await db.refresh(quiz_session)
         
         # Store questions in context for this session
-        context.user_data[f"quiz_{quiz_session.id}_questions"] = [q.id for q in selected_questions]
+        context.user_data[f"quiz_{quiz_session.id}_questions"] = qids
         context.user_data[f"quiz_{quiz_session.id}_session_id"] = quiz_session.id
         
         # Start with first question
         await show_question(update, context, quiz_session.id, selected_questions[0], 1, num_questions)
 
-async def show_question(update: Update, context: ContextTypes.DEFAULT_TYPE, session_id: int, question: Question, question_num: int, total_questions: int):
-    """Show a quiz question"""
-    query = update.callback_query
-    
-    uploader_tag = None
-    if getattr(question, 'uploader', None) and getattr(question.uploader, 'username', None):
-        uploader_tag = f"\n_Uploaded by @{question.uploader.username}_"
-    elif getattr(question, 'uploader_user_id', None):
-        uploader_tag = ""
-    else:
-        uploader_tag = ""
+async def _record_user_quiz_totals(db, user_id: int, percentage: int) -> None:
+    """Bump the user's quiz count and rolling accuracy in a single UPDATE"""
+    taken = func.coalesce(User.total_quizzes_taken, 0)
+    await db.execute(
+        update(User)
+        .where(User.user_id == user_id)
+        .values(
+            total_quizzes_taken=taken + 1,
+            # SET expressions read the pre-update row, so `taken` is the previous count
+            average_accuracy=case(
+                (User.average_accuracy.is_(None), percentage),
+                else_=cast(func.round((User.average_accuracy * taken + percentage) * 1.0 / (taken + 1)), Integer)
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
 
-    question_text = f"""
-📝 **Question {question_num} of {total_questions}**
+def _render_question(question: CachedQuestion) -> str:
+    """Render the session-independent part of a question, cached per question id"""
+    key = f"qrender_{question.id}"
+    body = memory_cache.get(key)
+    if body is None:
+        uploader_tag = ""
+        if question.uploader_username:
+            uploader_tag = f"\n_Uploaded by @{question.uploader_username}_"
 
-{question.question_text}
+        body = f"""{question.question_text}
 
 **Options:**
 A) {question.option_a}
@@ -241,14 +295,23 @@ B) {question.option_b}
 C) {question.option_c}
 D) {question.option_d}{uploader_tag}
 """
+        memory_cache.set(key, body, QUESTION_CACHE_TTL)
+    return body
+
+async def show_question(update: Update, context: ContextTypes.DEFAULT_TYPE, session_id: int, question: CachedQuestion, question_num: int, total_questions: int):
+    """Show a quiz question"""
+    query = update.callback_query
+
+    question_text = f"""
+📝 **Question {question_num} of {total_questions}**
+
+{_render_question(question)}"""
     
     keyboard = [
-        [InlineKeyboardButton("A", callback_data=f"answer_{session_id}_{question.id}_A")],
-        [InlineKeyboardButton("B", callback_data=f"answer_{session_id}_{question.id}_B")],
-        [InlineKeyboardButton("C", callback_data=f"answer_{session_id}_{question.id}_C")],
-        [InlineKeyboardButton("D", callback_data=f"answer_{session_id}_{question.id}_D")],
-        [InlineKeyboardButton("❌ End Quiz", callback_data=f"end_quiz_{session_id}")]
+        [InlineKeyboardButton(opt, callback_data=_ANSWER_CB_FMT.format(sid=session_id, qid=question.id, opt=opt))]
+        for opt in _OPTIONS
     ]
+    keyboard.append([InlineKeyboardButton("❌ End Quiz", callback_data=f"end_quiz_{session_id}")])
     
     reply_markup = InlineKeyboardMarkup(keyboard)
     
@@ -274,24 +337,20 @@ async def answer_question_callback(update: Update, context: ContextTypes.DEFAULT
     
     # Get database session
     async for db in get_async_db():
-        # Get quiz session
-        result = await db.execute(select(QuizSession).where(QuizSession.id == session_id))
-        quiz_session = result.scalar_one_or_none()
+        # Get quiz session; the question usually comes from the cache
+        quiz_session = await db.get(QuizSession, session_id)
         
         if not quiz_session:
             await query.edit_message_text("Quiz session not found.")
             return
         
-        # Get question
-        result = await db.execute(select(Question).where(Question.id == question_id))
-        question = result.scalar_one_or_none()
-        
+        question = await _get_question(db, question_id)
         if not question:
             await query.edit_message_text("Question not found.")
             return
         
         # Check if answer is correct
-        is_correct = user_answer == question.correct_answer
+        is_correct = user_answer == question.correct_option
         
         # Save answer
         quiz_answer = QuizAnswer(
@@ -307,27 +366,9 @@ async def answer_question_callback(update: Update, context: ContextTypes.DEFAULT
         if is_correct:
             quiz_session.correct_answers += 1
         
-        await db.commit()
-        
-        # Show feedback
-        correct_option_map = {
-            'A': question.option_a,
-            'B': question.option_b,
-            'C': question.option_c,
-            'D': question.option_d,
-        }
-        feedback_text = f"""
-{'✅ Correct!' if is_correct else '❌ Incorrect.'}
-
-**Your answer:** {user_answer}) {correct_option_map.get(user_answer, '')}
-**Correct answer:** {question.correct_answer}) {correct_option_map.get(question.correct_answer, '')}
-
-{('🧠 ' + question.explanation) if question.explanation else ''}
-"""
-        
         # Check if quiz is complete
-        if quiz_session.current_question >= quiz_session.total_questions:
-            # Quiz completed
+        quiz_completed = quiz_session.current_question >= quiz_session.total_questions
+        if quiz_completed:
             quiz_session.is_completed = True
             # Calculate score and grade
             percentage = int((quiz_session.correct_answers / quiz_session.total_questions) * 100)
@@ -337,21 +378,25 @@ async def answer_question_callback(update: Update, context: ContextTypes.DEFAULT
             if quiz_session.started_at:
                 quiz_session.duration_seconds = int((quiz_session.completed_at - quiz_session.started_at).total_seconds())
             quiz_session.accuracy = percentage
-            # Update user aggregate stats
-            result = await db.execute(select(User).where(User.id == quiz_session.user_id))
-            agg_user = result.scalar_one_or_none()
-            if agg_user:
-                agg_user.total_quizzes_taken = (agg_user.total_quizzes_taken or 0) + 1
-                # rolling average
-                if agg_user.average_accuracy is None:
-                    agg_user.average_accuracy = percentage
-                else:
-                    prev_total = max((agg_user.total_quizzes_taken - 1), 0)
-                    prev_avg = agg_user.average_accuracy or 0
-                    new_avg = int(round(((prev_avg * prev_total) + percentage) / (prev_total + 1)))
-                    agg_user.average_accuracy = new_avg
-            await db.commit()
-            
+            await _record_user_quiz_totals(db, quiz_session.user_id, percentage)
+            # Event log: quiz completed, committed with the session row
+            db.add(EventLog(user_id=quiz_session.user_id, event_type="quiz_complete", context={"topic_id": quiz_session.topic_id, "score": quiz_session.score_percentage}))
+        
+        await db.commit()
+        
+        # Show feedback
+        user_option = getattr(question, _OPTION_FIELDS.get(user_answer, ''), '')
+        correct_text = getattr(question, _OPTION_FIELDS.get(question.correct_option, ''), '')
+        feedback_text = f"""
+{'✅ Correct!' if is_correct else '❌ Incorrect.'}
+
+**Your answer:** {user_answer}) {user_option}
+**Correct answer:** {question.correct_option}) {correct_text}
+
+{('🧠 ' + question.explanation) if question.explanation else ''}
+"""
+        
+        if quiz_completed:
             # Show final results
             await show_quiz_results(update, context, quiz_session)
             # Invalidate analytics cache key(s)
@@ -360,34 +405,24 @@ async def answer_question_callback(update: Update, context: ContextTypes.DEFAULT
                 memory_cache.delete("analytics_quizzes")
             except Exception:
                 pass
-            # Event log: quiz completed
-            async for db in get_async_db():
-                db.add(EventLog(user_id=quiz_session.user_id, event_type="quiz_complete", context={"topic_id": quiz_session.topic_id, "score": quiz_session.score_percentage}))
-                await db.commit()
         else:
             # Show next question
             questions = context.user_data.get(f"quiz_{session_id}_questions", [])
             next_question_id = questions[quiz_session.current_question]
             
-            result = await db.execute(select(Question).where(Question.id == next_question_id))
-            next_question = result.scalar_one_or_none()
-            
-            if next_question:
-                # Show feedback first, then next question
-                keyboard = [[InlineKeyboardButton("➡️ Next Question", callback_data=f"next_question_{session_id}")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                await query.edit_message_text(
+            # Show feedback while the next question loads; a cache hit makes the fetch free
+            keyboard = [[InlineKeyboardButton("➡️ Next Question", callback_data=f"next_question_{session_id}")]]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+            next_question, _ = await asyncio.gather(
+                _get_question(db, next_question_id),
+                query.edit_message_text(
                     feedback_text,
                     reply_markup=reply_markup,
                     parse_mode='Markdown'
                 )
-                # Disable previous inline keyboard by editing original message's reply markup if available
-                try:
-                    await query.edit_message_reply_markup(reply_markup=None)
-                except Exception:
-                    pass
-                
+            )
+            
+            if next_question:
                 # Store next question for the next callback
                 context.user_data[f"next_question_{session_id}"] = next_question
             else:
@@ -408,8 +443,7 @@ async def next_question_callback(update: Update, context: ContextTypes.DEFAULT_T
     
     # Get current session info
     async for db in get_async_db():
-        result = await db.execute(select(QuizSession).where(QuizSession.id == session_id))
-        quiz_session = result.scalar_one_or_none()
+        quiz_session = await db.get(QuizSession, session_id)
         
         if quiz_session:
             await show_question(update, context, session_id, next_question, 
@@ -475,22 +509,16 @@ async def resume_quiz_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     session_id = int(query.data.split("_")[2])
     # Load session and next question
     async for db in get_async_db():
-        result = await db.execute(select(QuizSession).where(QuizSession.id == session_id))
-        session = result.scalar_one_or_none()
+        session = await db.get(QuizSession, session_id)
         if not session or session.is_completed:
             await query.edit_message_text("Session not found or already completed.")
             return
-        # Build question id list from stored order or from topic
-        qids = []
-        if getattr(session, 'question_ids', None):
-            try:
-                qids = [int(x) for x in (session.question_ids or '').split(',') if x]
-            except Exception:
-                qids = []
+        # Use the stored question order, falling back to the topic's questions
+        qids = session.question_ids or []
         if not qids:
             # Fallback: fetch all active for topic
-            result = await db.execute(select(Question).where(Question.topic_id == session.topic_id, Question.is_active == True))
-            qids = [q.id for q in result.scalars().all()]
+            result = await db.execute(select(Question.question_id).where(Question.topic_id == session.topic_id, Question.is_active == True))
+            qids = list(result.scalars().all())
         # Determine next question id
         idx = session.current_question or 0
         if idx >= len(qids):
@@ -500,8 +528,7 @@ async def resume_quiz_callback(update: Update, context: ContextTypes.DEFAULT_TYP
             await query.edit_message_text("This quiz session has no remaining questions.")
             return
         # Load that question and show
-        result = await db.execute(select(Question).where(Question.id == qids[idx]))
-        next_q = result.scalar_one_or_none()
+        next_q = await _get_question(db, qids[idx])
         if not next_q:
             await query.edit_message_text("Next question not found.")
             return
@@ -515,8 +542,7 @@ async def start_new_from_resume_callback(update: Update, context: ContextTypes.D
     await query.answer()
     session_id = int(query.data.split("_")[3])
     async for db in get_async_db():
-        result = await db.execute(select(QuizSession).where(QuizSession.id == session_id))
-        session = result.scalar_one_or_none()
+        session = await db.get(QuizSession, session_id)
         if session and not session.is_completed:
             session.is_completed = True
             await db.commit()
@@ -532,8 +558,7 @@ async def end_quiz_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Get database session
     async for db in get_async_db():
-        result = await db.execute(select(QuizSession).where(QuizSession.id == session_id))
-        quiz_session = result.scalar_one_or_none()
+        quiz_session = await db.get(QuizSession, session_id)
         
         if quiz_session:
             quiz_session.is_completed = True
@@ -548,17 +573,7 @@ async def end_quiz_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             quiz_session.accuracy = quiz_session.score_percentage
             # Update user aggregate stats only if at least one answered
             if quiz_session.current_question > 0:
-                result = await db.execute(select(User).where(User.id == quiz_session.user_id))
-                agg_user = result.scalar_one_or_none()
-                if agg_user:
-                    agg_user.total_quizzes_taken = (agg_user.total_quizzes_taken or 0) + 1
-                    if agg_user.average_accuracy is None:
-                        agg_user.average_accuracy = quiz_session.score_percentage
-                    else:
-                        prev_total = max((agg_user.total_quizzes_taken - 1), 0)
-                        prev_avg = agg_user.average_accuracy or 0
-                        new_avg = int(round(((prev_avg * prev_total) + quiz_session.score_percentage) / (prev_total + 1)))
-                        agg_user.average_accuracy = new_avg
+                await _record_user_quiz_totals(db, quiz_session.user_id, quiz_session.score_percentage)
             await db.commit()
             
             # Show partial results
@@ -601,26 +616,23 @@ async def view_stats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
     query = update.callback_query
     await query.answer()
     
-    user = update.effective_user
-    
     # Get database session
     async for db in get_async_db():
-        # Get user
-        result = await db.execute(select(User).where(User.telegram_id == user.id))
-        db_user = result.scalar_one_or_none()
-        
-        if not db_user:
+        db_user_id = await _resolve_user_id(update, context, db)
+        if db_user_id is None:
             await query.edit_message_text("User not found. Please use /start first.")
             return
         
-        # Get quiz statistics
-        result = await db.execute(select(QuizSession).where(
-            QuizSession.user_id == db_user.id,
-            QuizSession.is_completed == True
-        ))
-        completed_sessions = result.scalars().all()
+        # Get quiz statistics as a single aggregate row
+        completed = (QuizSession.user_id == db_user_id, QuizSession.is_completed == True)
+        result = await db.execute(select(
+            func.count(QuizSession.id),
+            func.coalesce(func.sum(QuizSession.total_questions), 0),
+            func.coalesce(func.sum(QuizSession.correct_answers), 0)
+        ).where(*completed))
+        completed_count, total_questions, total_correct = result.one()
         
-        if not completed_sessions:
+        if not completed_count:
             stats_text = """
 📊 **Your Statistics**
 
@@ -629,15 +641,13 @@ No quizzes completed yet.
 Start taking quizzes to see your progress!
 """
         else:
-            total_questions = sum(session.total_questions for session in completed_sessions)
-            total_correct = sum(session.correct_answers for session in completed_sessions)
             average_score = (total_correct / total_questions) * 100 if total_questions > 0 else 0
             
             stats_text = f"""
 📊 **Your Statistics**
 
 **Overall Performance:**
-🎯 Quizzes Completed: {len(completed_sessions)}
+🎯 Quizzes Completed: {completed_count}
 📝 Total Questions: {total_questions}
 ✅ Correct Answers: {total_correct}
 📊 Average Score: {average_score:.1f}%
@@ -646,10 +656,16 @@ Start taking quizzes to see your progress!
 """
             
             # Show last 5 quizzes
-            recent_sessions = completed_sessions[-5:]
-            for session in recent_sessions:
-                session_score = (session.correct_answers / session.total_questions) * 100
-                stats_text += f"• {session.topic.name}: {session_score:.0f} % (Grade: {session.grade or '-'})\n"
+            result = await db.execute(
+                select(Topic.name, QuizSession.correct_answers, QuizSession.total_questions, QuizSession.grade)
+                .join(Topic, QuizSession.topic_id == Topic.id)
+                .where(*completed)
+                .order_by(QuizSession.completed_at.desc())
+                .limit(5)
+            )
+            for topic_name, correct, total, grade in result.all():
+                session_score = (correct / total) * 100
+                stats_text += f"• {topic_name}: {session_score:.0f} % (Grade: {grade or '-'})\n"
     
     keyboard = [[InlineKeyboardButton("🔙 Back to Main Menu", callback_data="main_menu")]]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -662,39 +678,46 @@ Start taking quizzes to see your progress!
 
 async def quiz_history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show last few quiz sessions for the user (/quiz_history)"""
-    user = update.effective_user
     async for db in get_async_db():
-        result = await db.execute(select(User).where(User.telegram_id == user.id))
-        db_user = result.scalar_one_or_none()
-        if not db_user:
+        db_user_id = await _resolve_user_id(update, context, db)
+        if db_user_id is None:
             await update.message.reply_text("Please use /start first.")
             return
-        result = await db.execute(select(QuizSession).where(QuizSession.user_id == db_user.id).order_by(QuizSession.started_at.desc()))
-        sessions = result.scalars().all()
+        result = await db.execute(
+            select(Topic.name, QuizSession.correct_answers, QuizSession.total_questions, QuizSession.grade)
+            .join(Topic, QuizSession.topic_id == Topic.id)
+            .where(QuizSession.user_id == db_user_id)
+            .order_by(QuizSession.started_at.desc())
+            .limit(10)
+        )
+        sessions = result.all()
     if not sessions:
         await update.message.reply_text("No quiz history yet.")
         return
     lines = ["🗂️ Your recent quizzes:"]
-    for s in sessions[:10]:
-        pct = int((s.correct_answers / s.total_questions) * 100) if s.total_questions else 0
-        lines.append(f"• {s.topic.name} — {pct}% (Grade: {s.grade or _compute_grade(pct)})")
+    for topic_name, correct, total, grade in sessions:
+        pct = int((correct / total) * 100) if total else 0
+        lines.append(f"• {topic_name} — {pct}% (Grade: {grade or _compute_grade(pct)})")
     await update.message.reply_text("\n".join(lines))
 
 async def retry_last_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Retry the last topic (/retry_last)"""
-    user = update.effective_user
     async for db in get_async_db():
-        result = await db.execute(select(User).where(User.telegram_id == user.id))
-        db_user = result.scalar_one_or_none()
-        if not db_user:
+        db_user_id = await _resolve_user_id(update, context, db)
+        if db_user_id is None:
             await update.message.reply_text("Please use /start first.")
             return
-        result = await db.execute(select(QuizSession).where(QuizSession.user_id == db_user.id).order_by(QuizSession.started_at.desc()))
-        last_session = result.scalars().first()
-    if not last_session:
+        result = await db.execute(
+            select(QuizSession.topic_id)
+            .where(QuizSession.user_id == db_user_id)
+            .order_by(QuizSession.started_at.desc())
+            .limit(1)
+        )
+        last_topic_id = result.scalar_one_or_none()
+    if last_topic_id is None:
         await update.message.reply_text("No previous quiz found to retry.")
         return
     # Trigger the quiz options for that topic
     # Simulate navigation by sending a button back to the same topic flow
-    keyboard = [[InlineKeyboardButton("▶️ Start", callback_data=f"quiz_topic_{last_session.topic_id}")]]
+    keyboard = [[InlineKeyboardButton("▶️ Start", callback_data=f"quiz_topic_{last_topic_id}")]]
     await update.message.reply_text("Retry last topic:", reply_markup=InlineKeyboardMarkup(keyboard))
@@ -6,244 +6,294 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from services.quiz_service import QuizService
 from services.user_service import UserService
+from services.cache import shared_cache
+from database.db_v2 import run_db
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
-class QuizHandler:
-    def __init__(self):
-        self.quiz_service = QuizService()
-        self.user_service = UserService()
-        self.active_sessions = {}  # Store active quiz sessions
-    
-    async def start_quiz(self, update: Update, context: ContextTypes.DEFAULT_TYPE, unit: str, topic: str = None):
-        """Start a new quiz"""
-        try:
-            telegram_id = update.effective_user.id
-            user_prefs = self.user_service.get_user_preferences(telegram_id)
-            
-            if not user_prefs.get("university") or not user_prefs.get("course"):
-                await update.callback_query.edit_message_text(
-                    "❌ Please complete your profile setup first with /start"
-                )
-                return
-            
-            # Create quiz session
-            session = self.quiz_service.create_quiz_session(telegram_id, unit, topic)
-            
-            if not session:
-                await update.callback_query.edit_message_text(
-                    f"❌ No questions available for {unit}" + (f" - {topic}" if topic else "")
-                )
-                return
-            
-            # Store session in context
-            self.active_sessions[telegram_id] = session.id
-            
-            # Get first question
-            question_data = self.quiz_service.get_current_question(session.id)
-            
-            if not question_data:
-                await update.callback_query.edit_message_text(
-                    "❌ Failed to load quiz questions"
-                )
-                return
-            
-            await self.show_question(update, context, question_data)
-            
-        except Exception as e:
-            logger.error(f"Error in start_quiz: {e}")
-            await update.callback_query.edit_message_text("❌ An error occurred. Please try again.")
-    
-    async def show_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_data: dict):
-        """Show a quiz question"""
-        try:
-            keyboard = [
-                [InlineKeyboardButton(f"A) {question_data['option_a']}", callback_data=f"answer_{question_data['question_id']}_A")],
-                [InlineKeyboardButton(f"B) {question_data['option_b']}", callback_data=f"answer_{question_data['question_id']}_B")],
-                [InlineKeyboardButton(f"C) {question_data['option_c']}", callback_data=f"answer_{question_data['question_id']}_C")],
-                [InlineKeyboardButton(f"D) {question_data['option_d']}", callback_data=f"answer_{question_data['question_id']}_D")]
-            ]
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            question_text = f"""📝 **Question {question_data['current_question']} of {question_data['total_questions']}**
+ACTIVE_SESSION_TTL = 3600
+
+def _session_key(telegram_id: int) -> str:
+    return f"quiz:sess:{telegram_id}"
+
+# Ascending lower bounds; _GRADES[i] applies from _GRADE_THRESHOLDS[i - 1] up
+_GRADE_THRESHOLDS = (40, 50, 60, 70, 80, 90)
+_GRADES = ("F", "C", "C+", "B", "B+", "A", "A+")
+
+# Telegram caps button text at 64 characters
+BUTTON_LABEL_MAX = 60
+
+def _option_label(letter: str, text: str) -> str:
+    label = f"{letter}) {text}"
+    if len(label) > BUTTON_LABEL_MAX:
+        label = label[:BUTTON_LABEL_MAX - 1] + "…"
+    return label
+
+@lru_cache(maxsize=256)
+def _answer_markup(question_id: int, options: Tuple[str, str, str, str]) -> InlineKeyboardMarkup:
+    """Answer keyboard for a question; labels are truncated once and the markup reused on re-renders"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(_option_label(letter, text), callback_data=f"a{question_id}{letter}")]
+        for letter, text in zip("ABCD", options)
+    ])
+
+# Message templates, filled with str.format_map
+QUESTION_TEMPLATE = """📝 **Question {current_question} of {total_questions}**
 
-{question_data['question_text']}
+{question_text}
 
 Choose your answer:"""
-            
-            await update.callback_query.edit_message_text(
-                question_text,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-            
-        except Exception as e:
-            logger.error(f"Error in show_question: {e}")
-            await update.callback_query.edit_message_text("❌ An error occurred. Please try again.")
-    
-    async def handle_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle quiz answer submission"""
-        try:
-            query = update.callback_query
-            await query.answer()
-            
-            telegram_id = update.effective_user.id
-            
-            # Get session
-            if telegram_id not in self.active_sessions:
-                await query.edit_message_text("❌ No active quiz session found")
-                return
-            
-            session_id = self.active_sessions[telegram_id]
-            
-            # Parse callback data
-            parts = query.data.split("_")
-            question_id = int(parts[1])
-            user_answer = parts[2]
-            
-            # Submit answer
-            result = self.quiz_service.submit_answer(session_id, question_id, user_answer)
-            
-            if "error" in result:
-                await query.edit_message_text(f"❌ {result['error']}")
-                return
-            
-            # Show result
-            result_text = f"""✅ **Answer Submitted!**
+
+RESULT_TEMPLATE = """✅ **Answer Submitted!**
 
 Your answer: **{user_answer}**
-Correct answer: **{result['correct_answer']}**
+Correct answer: **{correct_answer}**
 
-{'🎉 Correct!' if result['is_correct'] else '❌ Incorrect'}
+{verdict}
 
-**Score: {result['current_score']}/{result['total_questions']}**"""
-            
-            if result['explanation']:
-                result_text += f"\n\n**Explanation:**\n{result['explanation']}"
-            
-            if result['is_complete']:
-                # Quiz completed
-                result_text += f"""
+**Score: {current_score}/{total_questions}**"""
+
+EXPLANATION_TEMPLATE = "\n\n**Explanation:**\n{explanation}"
+
+COMPLETION_TEMPLATE = """
 
 🎯 **Quiz Completed!**
 
-**Final Score: {result['final_score']}%**
-**Grade: {self._calculate_grade(result['final_score'])}**
+**Final Score: {final_score}%**
+**Grade: {grade}**
 
 Great job! You can start another quiz anytime."""
-                
-                # Clean up session
-                del self.active_sessions[telegram_id]
-                
-                keyboard = [
-                    [InlineKeyboardButton("📊 View Statistics", callback_data="view_stats")],
-                    [InlineKeyboardButton("🔄 Take Another Quiz", callback_data="take_quiz")],
-                    [InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")]
-                ]
-            else:
-                # Continue to next question
-                keyboard = [
-                    [InlineKeyboardButton("➡️ Next Question", callback_data="next_question")]
-                ]
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await query.edit_message_text(
-                result_text,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-            
-        except Exception as e:
-            logger.error(f"Error in handle_answer: {e}")
-            await query.edit_message_text("❌ An error occurred. Please try again.")
-    
-    async def next_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show next question"""
-        try:
-            query = update.callback_query
-            await query.answer()
-            
-            telegram_id = update.effective_user.id
-            
-            if telegram_id not in self.active_sessions:
-                await query.edit_message_text("❌ No active quiz session found")
-                return
-            
-            session_id = self.active_sessions[telegram_id]
-            
-            # Get next question
-            question_data = self.quiz_service.get_current_question(session_id)
-            
-            if not question_data:
-                await query.edit_message_text("❌ No more questions available")
-                return
-            
-            await self.show_question(update, context, question_data)
-            
-        except Exception as e:
-            logger.error(f"Error in next_question: {e}")
-            await query.edit_message_text("❌ An error occurred. Please try again.")
-    
-    async def show_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show user statistics"""
-        try:
-            telegram_id = update.effective_user.id
-            user_prefs = self.user_service.get_user_preferences(telegram_id)
-            stats = self.quiz_service.get_user_stats(telegram_id)
-            
-            stats_text = f"""📊 **Your Statistics**
+
+STATS_TEMPLATE = """📊 **Your Statistics**
 
 **Profile:**
-🏛️ University: {user_prefs.get('university', 'Not set')}
-🎓 Course: {user_prefs.get('course', 'Not set')}
-📅 Year: {user_prefs.get('year', 'Not set')}
+🏛️ University: {university}
+🎓 Course: {course}
+📅 Year: {year}
 
 **Quiz Performance:**
-📝 Total Quizzes: {stats.get('total_quizzes', 0)}
-📈 Average Score: {stats.get('average_score', 0)}%
-🏆 Best Score: {stats.get('best_score', 0)}%
+📝 Total Quizzes: {total_quizzes}
+📈 Average Score: {average_score}%
+🏆 Best Score: {best_score}%
 
 **Recent Performance:**"""
+
+def _call_on_own_session(service_cls, method: str, *args):
+    """Run one service call on a fresh instance, and so a fresh DB session, then close it
+    
+    For worker threads: the shared services keep one Session that the event loop also uses,
+    and a Session must not be used from two threads at once.
+    """
+    service = service_cls()
+    try:
+        return getattr(service, method)(*args)
+    finally:
+        service.close()
+
+class QuizHandler:
+    def __init__(self, quiz_service: Optional[QuizService] = None, user_service: Optional[UserService] = None):
+        self.quiz_service = quiz_service or QuizService()
+        self.user_service = user_service or UserService()
+        # telegram_id -> (session_id, task) for the question after the one just answered;
+        # per-process, so a worker that didn't see the answer just fetches directly
+        self._prefetched: Dict[int, Tuple[int, asyncio.Task]] = {}
+    
+    async def _fetch_question(self, session_id: int) -> Optional[dict]:
+        # Off the loop and on its own session, so a prefetch never blocks other updates
+        return await run_db(_call_on_own_session, QuizService, "get_current_question", session_id)
+    
+    def _prefetch_next(self, telegram_id: int, session_id: int):
+        """Load the next question while the user reads the feedback"""
+        self._prefetched[telegram_id] = (session_id, asyncio.create_task(self._fetch_question(session_id)))
+    
+    async def _take_next_question(self, telegram_id: int, session_id: int) -> Optional[dict]:
+        entry = self._prefetched.pop(telegram_id, None)
+        if entry is not None and entry[0] == session_id:
+            return await entry[1]
+        return await self._fetch_question(session_id)
+    
+    async def start_quiz(self, update: Update, context: ContextTypes.DEFAULT_TYPE, unit: str, topic: str = None):
+        """Start a new quiz"""
+        telegram_id = update.effective_user.id
+        user_prefs = self.user_service.get_user_preferences(telegram_id)
+        
+        if not user_prefs.get("university") or not user_prefs.get("course"):
+            await update.callback_query.edit_message_text(
+                "❌ Please complete your profile setup first with /start"
+            )
+            return
+        
+        # Create quiz session
+        session = self.quiz_service.create_quiz_session(telegram_id, unit, topic)
+        
+        if not session:
+            await update.callback_query.edit_message_text(
+                f"❌ No questions available for {unit}" + (f" - {topic}" if topic else "")
+            )
+            return
+        
+        # Store session in the shared store so any worker can continue it
+        shared_cache.set(_session_key(telegram_id), session.id, ACTIVE_SESSION_TTL)
+        
+        # Get first question
+        question_data = self.quiz_service.get_current_question(session.id)
+        
+        if not question_data:
+            await update.callback_query.edit_message_text(
+                "❌ Failed to load quiz questions"
+            )
+            return
+        
+        await self.show_question(update, context, question_data)
+    
+    async def show_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_data: dict):
+        """Show a quiz question"""
+        reply_markup = _answer_markup(
+            question_data['question_id'],
+            (question_data['option_a'], question_data['option_b'],
+             question_data['option_c'], question_data['option_d'])
+        )
+        
+        question_text = QUESTION_TEMPLATE.format_map(question_data)
+        
+        await update.callback_query.edit_message_text(
+            question_text,
+            reply_markup=reply_markup,
+            parse_mode='Markdown'
+        )
+    
+    async def handle_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle quiz answer submission"""
+        query = update.callback_query
+        await query.answer()
+        
+        telegram_id = update.effective_user.id
+        
+        # Get session
+        session_id = shared_cache.get(_session_key(telegram_id))
+        if session_id is None:
+            await query.edit_message_text("❌ No active quiz session found")
+            return
+        
+        # Parse callback data: a<question_id><letter>
+        try:
+            question_id = int(query.data[1:-1])
+        except ValueError:
+            await query.edit_message_text("❌ Invalid answer selection")
+            return
+        user_answer = query.data[-1]
+        
+        # Submit answer
+        result = self.quiz_service.submit_answer(session_id, question_id, user_answer)
+        
+        if "error" in result:
+            await query.edit_message_text(f"❌ {result['error']}")
+            return
+        
+        # Show result
+        result_text = RESULT_TEMPLATE.format(
+            user_answer=user_answer,
+            verdict='🎉 Correct!' if result['is_correct'] else '❌ Incorrect',
+            **result
+        )
+        
+        if result['explanation']:
+            result_text += EXPLANATION_TEMPLATE.format_map(result)
+        
+        if result['is_complete']:
+            # Quiz completed
+            result_text += COMPLETION_TEMPLATE.format(
+                final_score=result['final_score'],
+                grade=self._calculate_grade(result['final_score'])
+            )
             
-            recent_performance = stats.get('recent_performance', [])
-            if recent_performance:
-                for perf in recent_performance:
-                    stats_text += f"\n• {perf['unit']}: {perf['score']}% ({perf['date'].strftime('%Y-%m-%d')})"
-            else:
-                stats_text += "\n• No recent quizzes taken"
+            # Clean up session
+            shared_cache.delete(_session_key(telegram_id))
+            self._prefetched.pop(telegram_id, None)
             
             keyboard = [
-                [InlineKeyboardButton("🔄 Take Quiz", callback_data="take_quiz")],
+                [InlineKeyboardButton("📊 View Statistics", callback_data="view_stats")],
+                [InlineKeyboardButton("🔄 Take Another Quiz", callback_data="take_quiz")],
                 [InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")]
             ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.callback_query.edit_message_text(
-                stats_text,
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
-            )
-            
-        except Exception as e:
-            logger.error(f"Error in show_stats: {e}")
-            await update.callback_query.edit_message_text("❌ An error occurred. Please try again.")
+        else:
+            # Continue to next question
+            keyboard = [
+                [InlineKeyboardButton("➡️ Next Question", callback_data="next_question")]
+            ]
+            self._prefetch_next(telegram_id, session_id)
+        
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        await query.edit_message_text(
+            result_text,
+            reply_markup=reply_markup,
+            parse_mode='Markdown'
+        )
+    
+    async def next_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show next question"""
+        query = update.callback_query
+        await query.answer()
+        
+        telegram_id = update.effective_user.id
+        
+        session_id = shared_cache.get(_session_key(telegram_id))
+        if session_id is None:
+            await query.edit_message_text("❌ No active quiz session found")
+            return
+        
+        # Get next question, usually already loaded by handle_answer
+        question_data = await self._take_next_question(telegram_id, session_id)
+        
+        if not question_data:
+            await query.edit_message_text("❌ No more questions available")
+            return
+        
+        await self.show_question(update, context, question_data)
+    
+    async def show_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show user statistics"""
+        telegram_id = update.effective_user.id
+        # Independent lookups, each on its own session in a worker thread; run them side by side
+        user_prefs, stats = await asyncio.gather(
+            run_db(_call_on_own_session, UserService, "get_user_preferences", telegram_id),
+            run_db(_call_on_own_session, QuizService, "get_user_stats", telegram_id)
+        )
+        
+        stats_text = STATS_TEMPLATE.format(
+            university=user_prefs.get('university', 'Not set'),
+            course=user_prefs.get('course', 'Not set'),
+            year=user_prefs.get('year', 'Not set'),
+            total_quizzes=stats.get('total_quizzes', 0),
+            average_score=stats.get('average_score', 0),
+            best_score=stats.get('best_score', 0)
+        )
+        
+        recent_performance = stats.get('recent_performance', [])
+        if recent_performance:
+            for perf in recent_performance:
+                stats_text += f"\n• {perf['unit']}: {perf['score']}% ({perf['date'].strftime('%Y-%m-%d')})"
+        else:
+            stats_text += "\n• No recent quizzes taken"
+        
+        keyboard = [
+            [InlineKeyboardButton("🔄 Take Quiz", callback_data="take_quiz")],
+            [InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")]
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        await update.callback_query.edit_message_text(
+            stats_text,
+            reply_markup=reply_markup,
+            parse_mode='Markdown'
+        )
     
     def _calculate_grade(self, score_percentage: int) -> str:
         """Calculate grade based on score percentage"""
-        if score_percentage >= 90:
-            return "A+"
-        elif score_percentage >= 80:
-            return "A"
-        elif score_percentage >= 70:
-            return "B+"
-        elif score_percentage >= 60:
-            return "B"
-        elif score_percentage >= 50:
-            return "C+"
-        elif score_percentage >= 40:
-            return "C"
-        else:
-            return "F"
+        return _GRADES[bisect_right(_GRADE_THRESHOLDS, score_percentage)]
@@ -4,18 +4,216 @@ Role-based authentication handlers for BotCamp Medical
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
+from telegram.error import BadRequest
 from services.user_service import UserService
 from config.auth import verify_admin_code, verify_super_admin_code, get_admin_name
 from handlers.quiz_handler import QuizHandler
+from services.cache import shared_cache
+from contextlib import suppress
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from collections import deque
+import asyncio
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Abandoned code prompts expire on their own
+PENDING_AUTH_TTL = 300
+
+def _pending_auth_key(telegram_id: int) -> str:
+    return f"auth:pending:{telegram_id}"
+
+# Code attempts allowed per user within the sliding window, and failures before the prompt is dropped
+AUTH_ATTEMPT_LIMIT = 5
+AUTH_ATTEMPT_WINDOW = 60
+AUTH_MAX_FAILURES = 10
+
+# Preference and student-role writes are queued so replies aren't held up by the DB round-trip;
+# admin grants are written before they are confirmed
+WRITE_QUEUE_SIZE = 256
+
+# Static menus; InlineKeyboardMarkup is immutable so one instance serves every render
+ROLE_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("1️⃣ Student", callback_data="role_student")],
+    [InlineKeyboardButton("2️⃣ Admin", callback_data="role_admin")],
+    [InlineKeyboardButton("3️⃣ Super Admin", callback_data="role_super_admin")]
+])
+UNIVERSITY_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🏛️ University of Nairobi", callback_data="university_uon")]
+])
+COURSE_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🎓 MBChB (Bachelor of Medicine)", callback_data="course_mbchb")]
+])
+YEAR_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Year 1", callback_data="year_1"),
+     InlineKeyboardButton("Year 2", callback_data="year_2")],
+    [InlineKeyboardButton("Year 3", callback_data="year_3"),
+     InlineKeyboardButton("Year 4", callback_data="year_4")],
+    [InlineKeyboardButton("Year 5", callback_data="year_5"),
+     InlineKeyboardButton("Year 6", callback_data="year_6")]
+])
+
+# Curriculum tables (simplified for now)
+_UNITS_BY_YEAR = MappingProxyType({
+    1: ("Human Anatomy", "Physiology I", "Biochemistry", "Behavioural Science", "IT in Medicine"),
+    2: ("Microbiology", "Immunology", "Pathology I", "Physiology II"),
+    3: ("Pathology II", "Clinical Pharmacology I", "General Surgery I", "Internal Medicine I"),
+    4: ("Obstetrics & Gynaecology", "Psychiatry"),
+    5: ("Community Health", "Internal Medicine"),
+    6: ("Clinical Rotations",)
+})
+_TOPICS_BY_UNIT = MappingProxyType({
+    "Human Anatomy": ("Upper Limb", "Head and Neck", "Thorax", "Abdomen", "Lower Limb", "Neuroanatomy"),
+    "Physiology I": ("Cardiovascular", "Respiratory", "Renal", "Endocrine"),
+    "Biochemistry": ("Carbohydrates", "Proteins", "Lipids", "Enzymes"),
+    "Microbiology": ("Bacteriology", "Virology", "Parasitology", "Mycology"),
+    "Pathology I": ("Cellular Injury", "Inflammation", "Neoplasia")
+})
+_DEFAULT_TOPICS = ("General Topics",)
+
+# Units and topics travel in callback_data as short integer ids ("u3", "t3:12", "qa3");
+# topic and quiz buttons carry their unit, so no per-user state is needed between taps
+_UNITS_BY_ID = tuple(sorted({unit for units in _UNITS_BY_YEAR.values() for unit in units}))
+_UNIT_IDS = MappingProxyType({unit: i for i, unit in enumerate(_UNITS_BY_ID)})
+_TOPICS_BY_ID = tuple(sorted({topic for topics in _TOPICS_BY_UNIT.values() for topic in topics} | set(_DEFAULT_TOPICS)))
+_TOPIC_IDS = MappingProxyType({topic: i for i, topic in enumerate(_TOPICS_BY_ID)})
+
+@lru_cache(maxsize=None)
+def _unit_markup(year: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(f"📖 {unit}", callback_data=f"u{_UNIT_IDS[unit]}")]
+        for unit in _UNITS_BY_YEAR[year]
+    ])
+
+@lru_cache(maxsize=32)
+def _topic_markup(unit: str) -> InlineKeyboardMarkup:
+    unit_id = _UNIT_IDS[unit]
+    keyboard = [
+        [InlineKeyboardButton(f"📚 {topic}", callback_data=f"t{unit_id}:{_TOPIC_IDS[topic]}")]
+        for topic in _TOPICS_BY_UNIT.get(unit, _DEFAULT_TOPICS)
+    ]
+    # Add quiz option
+    keyboard.append([InlineKeyboardButton("📝 Take Quiz (All Topics)", callback_data=f"qa{unit_id}")])
+    return InlineKeyboardMarkup(keyboard)
+
 class RoleAuthHandler:
-    def __init__(self):
-        self.user_service = UserService()
-        self.quiz_handler = QuizHandler()
-        self.pending_auth = {}  # Store pending authentication attempts
+    def __init__(self, quiz_handler: Optional[QuizHandler] = None, user_service: Optional[UserService] = None):
+        self.user_service = user_service or UserService()
+        self.quiz_handler = quiz_handler or QuizHandler(user_service=self.user_service)
+        self._routes = {
+            "university_uon": self._on_university,
+            "course_mbchb": self._on_course,
+            "next_question": lambda update, context, _: self.quiz_handler.next_question(update, context),
+            "view_stats": lambda update, context, _: self.quiz_handler.show_stats(update, context),
+        }
+        self._prefix_routes = (
+            ("year_", self._on_year),
+            ("qa", self._on_quiz_all),
+        )
+        # Compact callbacks: one letter followed by a numeric id
+        self._short_routes = {
+            "u": self._on_unit,
+            "t": self._on_topic,
+            "a": lambda update, context, _: self.quiz_handler.handle_answer(update, context),
+        }
+        self._auth_attempts: Dict[int, Deque[float]] = {}
+        self._auth_swept_at = time.monotonic()
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._write_worker: Optional[asyncio.Task] = None
+        self._overflow_writes = set()  # strong refs to writes started while the queue was full
+    
+    def _enqueue_write(self, kind: str, telegram_id: int, **kwargs):
+        """Hand a user write to the background worker, starting it on first use"""
+        if self._write_worker is None or self._write_worker.done():
+            if self._write_queue is None:
+                self._write_queue = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
+            self._write_worker = asyncio.create_task(self._drain_writes())
+        try:
+            self._write_queue.put_nowait((kind, telegram_id, kwargs))
+        except asyncio.QueueFull:
+            # Worker is falling behind; start this write on its own rather than drop it
+            task = asyncio.create_task(asyncio.to_thread(self._apply_write, kind, telegram_id, kwargs))
+            self._overflow_writes.add(task)
+            task.add_done_callback(self._overflow_writes.discard)
+    
+    def _allow_auth_attempt(self, telegram_id: int) -> bool:
+        """Record an attempt; False once the user is over the limit for the window"""
+        now = time.monotonic()
+        if now - self._auth_swept_at > AUTH_ATTEMPT_WINDOW:
+            # At most once per window, forget users whose attempts have all expired
+            self._auth_attempts = {
+                tid: recent for tid, recent in self._auth_attempts.items()
+                if now - recent[-1] <= AUTH_ATTEMPT_WINDOW
+            }
+            self._auth_swept_at = now
+        attempts = self._auth_attempts.setdefault(telegram_id, deque())
+        while attempts and now - attempts[0] > AUTH_ATTEMPT_WINDOW:
+            attempts.popleft()
+        if len(attempts) >= AUTH_ATTEMPT_LIMIT:
+            return False
+        attempts.append(now)
+        return True
+    
+    async def _reject_auth_code(self, update: Update, telegram_id: int, auth_info: dict, message: str):
+        """Count a failed code; after too many, drop the prompt so the user must /start again"""
+        failures = auth_info.get("failures", 0) + 1
+        if failures >= AUTH_MAX_FAILURES:
+            self.cleanup_pending_auth(telegram_id)
+            await update.message.reply_text("❌ Too many invalid codes. Please start over with /start")
+            return
+        shared_cache.set(_pending_auth_key(telegram_id), {**auth_info, "failures": failures}, PENDING_AUTH_TTL)
+        await update.message.reply_text(message)
+    
+    async def _drain_writes(self):
+        """Apply queued writes, merging consecutive preference updates for the same user"""
+        while True:
+            batch = [await self._write_queue.get()]
+            while not self._write_queue.empty():
+                batch.append(self._write_queue.get_nowait())
+            for kind, telegram_id, kwargs in self._coalesce(batch):
+                try:
+                    await asyncio.to_thread(self._apply_write, kind, telegram_id, kwargs)
+                except Exception as e:
+                    logger.error(f"Error applying {kind} for {telegram_id}: {e}")
+            for _ in batch:
+                self._write_queue.task_done()
+    
+    @staticmethod
+    def _coalesce(batch: List[Tuple[str, int, Dict[str, Any]]]) -> List[Tuple[str, int, Dict[str, Any]]]:
+        merged = []
+        for kind, telegram_id, kwargs in batch:
+            if (kind == "set_prefs" and merged
+                    and merged[-1][0] == kind and merged[-1][1] == telegram_id):
+                merged[-1][2].update(kwargs)
+            else:
+                merged.append((kind, telegram_id, dict(kwargs)))
+        return merged
+    
+    @staticmethod
+    def _apply_write(kind: str, telegram_id: int, kwargs: Dict[str, Any]) -> bool:
+        """Run one write in a worker thread on its own session; UserService.db is shared with the loop"""
+        service = UserService()
+        try:
+            if kind == "set_prefs":
+                return service.set_user_preferences(telegram_id, **kwargs)
+            if kind == "set_role":
+                return service.set_user_role(telegram_id, **kwargs)
+            return False
+        finally:
+            service.close()
+    
+    async def _grant_role(self, update: Update, telegram_id: int, role: str, code: str) -> bool:
+        """Write an admin role before it is confirmed; tells the user and returns False if it failed"""
+        # Let earlier queued writes (e.g. a "student" pick) land first so they can't overwrite the grant
+        if self._write_queue is not None and self._write_worker is not None and not self._write_worker.done():
+            await self._write_queue.join()
+        granted = await asyncio.to_thread(self._apply_write, "set_role", telegram_id, {"role": role, "auth_code": code})
+        if not granted:
+            await update.message.reply_text("❌ Could not update your access. Please try again.")
+        return granted
     
     async def show_role_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show role selection menu"""
@@ -33,13 +231,6 @@ class RoleAuthHandler:
                 await self.show_unit_selection(update, context)
                 return
             
-            keyboard = [
-                [InlineKeyboardButton("1️⃣ Student", callback_data="role_student")],
-                [InlineKeyboardButton("2️⃣ Admin", callback_data="role_admin")],
-                [InlineKeyboardButton("3️⃣ Super Admin", callback_data="role_super_admin")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
             welcome_text = """👋 Welcome to BotCamp Medical!
 
 Please choose your role:
@@ -49,7 +240,7 @@ Please choose your role:
 
 Choose your role to continue:"""
             
-            await update.message.reply_text(welcome_text, reply_markup=reply_markup)
+            await update.message.reply_text(welcome_text, reply_markup=ROLE_MARKUP)
             
         except Exception as e:
             logger.error(f"Error in show_role_selection: {e}")
@@ -66,12 +257,12 @@ Choose your role to continue:"""
             
             if role_data == "role_student":
                 # Set user as student and proceed to university selection
-                self.user_service.set_user_role(telegram_id, "student")
+                self._enqueue_write("set_role", telegram_id, role="student")
                 await self.show_university_selection(update, context)
                 
             elif role_data == "role_admin":
                 # Request admin code
-                self.pending_auth[telegram_id] = {"role": "admin", "step": "code"}
+                shared_cache.set(_pending_auth_key(telegram_id), {"role": "admin", "step": "code"}, PENDING_AUTH_TTL)
                 await query.edit_message_text(
                     "🔐 Admin Access Required\n\n"
                     "Please enter your admin code:",
@@ -80,7 +271,7 @@ Choose your role to continue:"""
                 
             elif role_data == "role_super_admin":
                 # Request super admin code
-                self.pending_auth[telegram_id] = {"role": "super_admin", "step": "code"}
+                shared_cache.set(_pending_auth_key(telegram_id), {"role": "super_admin", "step": "code"}, PENDING_AUTH_TTL)
                 await query.edit_message_text(
                     "🔐 Super Admin Access Required\n\n"
                     "Please enter your super admin code:",
@@ -89,7 +280,8 @@ Choose your role to continue:"""
                 
         except Exception as e:
             logger.error(f"Error in handle_role_callback: {e}")
-            await query.edit_message_text("❌ An error occurred. Please try again.")
+            with suppress(BadRequest):
+                await query.edit_message_text("❌ An error occurred. Please try again.")
     
     async def handle_auth_code(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle authentication code input"""
@@ -97,38 +289,48 @@ Choose your role to continue:"""
             telegram_id = update.effective_user.id
             code = update.message.text.strip()
             
-            if telegram_id not in self.pending_auth:
+            auth_info = shared_cache.get(_pending_auth_key(telegram_id))
+            if auth_info is None:
                 await update.message.reply_text("❌ No pending authentication. Please start over with /start")
                 return
             
-            auth_info = self.pending_auth[telegram_id]
+            if not self._allow_auth_attempt(telegram_id):
+                await update.message.reply_text(
+                    f"⏳ Too many attempts. Please wait {AUTH_ATTEMPT_WINDOW} seconds and try again."
+                )
+                return
+            
             role = auth_info["role"]
             
             # Verify code based on role
             if role == "admin":
                 if verify_admin_code(code):
-                    self.user_service.set_user_role(telegram_id, "admin", code)
+                    if not await self._grant_role(update, telegram_id, "admin", code):
+                        return
                     admin_name = get_admin_name(code)
                     await update.message.reply_text(
                         f"✅ Welcome, {admin_name}!\n\n"
                         "You now have admin access. Use /admin to access admin features."
                     )
-                    del self.pending_auth[telegram_id]
+                    self.cleanup_pending_auth(telegram_id)
                 else:
-                    await update.message.reply_text(
+                    await self._reject_auth_code(
+                        update, telegram_id, auth_info,
                         "❌ Invalid admin code. Please try again or contact support."
                     )
                     
             elif role == "super_admin":
                 if verify_super_admin_code(code):
-                    self.user_service.set_user_role(telegram_id, "super_admin", code)
+                    if not await self._grant_role(update, telegram_id, "super_admin", code):
+                        return
                     await update.message.reply_text(
                         "✅ Welcome, Super Admin!\n\n"
                         "You now have full system access. Use /superadmin to access admin features."
                     )
-                    del self.pending_auth[telegram_id]
+                    self.cleanup_pending_auth(telegram_id)
                 else:
-                    await update.message.reply_text(
+                    await self._reject_auth_code(
+                        update, telegram_id, auth_info,
                         "❌ Invalid super admin code. Please try again or contact support."
                     )
             
@@ -138,104 +340,47 @@ Choose your role to continue:"""
     
     async def show_university_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show university selection (defaults to University of Nairobi)"""
-        try:
-            keyboard = [
-                [InlineKeyboardButton("🏛️ University of Nairobi", callback_data="university_uon")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.callback_query.edit_message_text(
-                "🏛️ Select University:\n\n"
-                "Currently available:",
-                reply_markup=reply_markup
-            )
-            
-        except Exception as e:
-            logger.error(f"Error in show_university_selection: {e}")
-            await update.callback_query.edit_message_text("❌ An error occurred. Please try again.")
+        await update.callback_query.edit_message_text(
+            "🏛️ Select University:\n\n"
+            "Currently available:",
+            reply_markup=UNIVERSITY_MARKUP
+        )
     
     async def show_course_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show course selection (defaults to MBChB)"""
-        try:
-            keyboard = [
-                [InlineKeyboardButton("🎓 MBChB (Bachelor of Medicine)", callback_data="course_mbchb")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.callback_query.edit_message_text(
-                "🎓 Select Course:\n\n"
-                "Available courses:",
-                reply_markup=reply_markup
-            )
-            
-        except Exception as e:
-            logger.error(f"Error in show_course_selection: {e}")
-            await update.callback_query.edit_message_text("❌ An error occurred. Please try again.")
+        await update.callback_query.edit_message_text(
+            "🎓 Select Course:\n\n"
+            "Available courses:",
+            reply_markup=COURSE_MARKUP
+        )
     
     async def show_year_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show year selection (1-6)"""
-        try:
-            keyboard = [
-                [InlineKeyboardButton("Year 1", callback_data="year_1"),
-                 InlineKeyboardButton("Year 2", callback_data="year_2")],
-                [InlineKeyboardButton("Year 3", callback_data="year_3"),
-                 InlineKeyboardButton("Year 4", callback_data="year_4")],
-                [InlineKeyboardButton("Year 5", callback_data="year_5"),
-                 InlineKeyboardButton("Year 6", callback_data="year_6")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.callback_query.edit_message_text(
-                "📚 Select Your Year of Study:\n\n"
-                "Choose your current year:",
-                reply_markup=reply_markup
-            )
-            
-        except Exception as e:
-            logger.error(f"Error in show_year_selection: {e}")
-            await update.callback_query.edit_message_text("❌ An error occurred. Please try again.")
+        await update.callback_query.edit_message_text(
+            "📚 Select Your Year of Study:\n\n"
+            "Choose your current year:",
+            reply_markup=YEAR_MARKUP
+        )
     
-    async def show_unit_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def show_unit_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE, year: Optional[int] = None):
         """Show unit selection based on user's year"""
-        try:
-            telegram_id = update.effective_user.id
-            user_prefs = self.user_service.get_user_preferences(telegram_id)
-            year = user_prefs.get("year")
-            
-            if not year:
-                await update.message.reply_text("❌ Please select your year first with /start")
-                return
-            
-            # Define units by year (simplified for now)
-            units_by_year = {
-                1: ["Human Anatomy", "Physiology I", "Biochemistry", "Behavioural Science", "IT in Medicine"],
-                2: ["Microbiology", "Immunology", "Pathology I", "Physiology II"],
-                3: ["Pathology II", "Clinical Pharmacology I", "General Surgery I", "Internal Medicine I"],
-                4: ["Obstetrics & Gynaecology", "Psychiatry"],
-                5: ["Community Health", "Internal Medicine"],
-                6: ["Clinical Rotations"]
-            }
-            
-            units = units_by_year.get(year, [])
-            if not units:
-                await update.message.reply_text(f"❌ No units available for Year {year}")
-                return
-            
-            keyboard = []
-            for unit in units:
-                keyboard.append([InlineKeyboardButton(f"📖 {unit}", callback_data=f"unit_{unit}")])
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.callback_query.edit_message_text(
-                f"📖 Select Unit (Year {year}):\n\n"
-                "Choose a unit to study:",
-                reply_markup=reply_markup
-            )
-            
-        except Exception as e:
-            logger.error(f"Error in show_unit_selection: {e}")
-            await update.callback_query.edit_message_text("❌ An error occurred. Please try again.")
+        if year is None:
+            # The queued year write may not have landed yet, so callers that know it pass it in
+            year = self.user_service.get_user_preferences(update.effective_user.id).get("year")
+        
+        if not year:
+            await update.message.reply_text("❌ Please select your year first with /start")
+            return
+        
+        if year not in _UNITS_BY_YEAR:
+            await update.message.reply_text(f"❌ No units available for Year {year}")
+            return
+        
+        await update.callback_query.edit_message_text(
+            f"📖 Select Unit (Year {year}):\n\n"
+            "Choose a unit to study:",
+            reply_markup=_unit_markup(year)
+        )
     
     async def handle_navigation_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle navigation callbacks (university, course, year, unit)"""
@@ -243,84 +388,64 @@ Choose your role to continue:"""
             query = update.callback_query
             await query.answer()
             
-            telegram_id = update.effective_user.id
             callback_data = query.data
             
-            if callback_data == "university_uon":
-                self.user_service.set_user_preferences(telegram_id, university="University of Nairobi")
-                await self.show_course_selection(update, context)
-                
-            elif callback_data == "course_mbchb":
-                self.user_service.set_user_preferences(telegram_id, course="MBChB")
-                await self.show_year_selection(update, context)
-                
-            elif callback_data.startswith("year_"):
-                year = int(callback_data.split("_")[1])
-                self.user_service.set_user_preferences(telegram_id, year=year)
-                await self.show_unit_selection(update, context)
-                
-            elif callback_data.startswith("unit_"):
-                unit = callback_data.replace("unit_", "")
-                # Store current unit in context for quiz
-                context.user_data["current_unit"] = unit
-                await self.show_topic_selection(update, context, unit)
-                
-            elif callback_data.startswith("topic_"):
-                topic = callback_data.replace("topic_", "")
-                unit = context.user_data.get("current_unit", "General")
-                await self.quiz_handler.start_quiz(update, context, unit, topic)
-                
-            elif callback_data == "quiz_all":
-                unit = context.user_data.get("current_unit", "General")
-                await self.quiz_handler.start_quiz(update, context, unit)
-                
-            elif callback_data.startswith("answer_"):
-                await self.quiz_handler.handle_answer(update, context)
-                
-            elif callback_data == "next_question":
-                await self.quiz_handler.next_question(update, context)
-                
-            elif callback_data == "view_stats":
-                await self.quiz_handler.show_stats(update, context)
+            # Exact callbacks resolve in one dict lookup; the rest by a short prefix scan
+            route = self._routes.get(callback_data)
+            if route:
+                await route(update, context, callback_data)
+                return
+            if callback_data[1:2].isdigit():
+                route = self._short_routes.get(callback_data[0])
+                if route:
+                    await route(update, context, callback_data[1:])
+                return
+            for prefix, route in self._prefix_routes:
+                if callback_data.startswith(prefix):
+                    await route(update, context, callback_data[len(prefix):])
+                    return
                 
         except Exception as e:
             logger.error(f"Error in handle_navigation_callback: {e}")
-            await query.edit_message_text("❌ An error occurred. Please try again.")
+            with suppress(BadRequest):
+                await query.edit_message_text("❌ An error occurred. Please try again.")
+    
+    async def _on_university(self, update: Update, context: ContextTypes.DEFAULT_TYPE, arg: str):
+        self._enqueue_write("set_prefs", update.effective_user.id, university="University of Nairobi")
+        await self.show_course_selection(update, context)
+    
+    async def _on_course(self, update: Update, context: ContextTypes.DEFAULT_TYPE, arg: str):
+        self._enqueue_write("set_prefs", update.effective_user.id, course="MBChB")
+        await self.show_year_selection(update, context)
+    
+    async def _on_year(self, update: Update, context: ContextTypes.DEFAULT_TYPE, arg: str):
+        year = int(arg)
+        self._enqueue_write("set_prefs", update.effective_user.id, year=year)
+        await self.show_unit_selection(update, context, year)
+    
+    async def _on_unit(self, update: Update, context: ContextTypes.DEFAULT_TYPE, arg: str):
+        unit = _UNITS_BY_ID[int(arg)]
+        await self.show_topic_selection(update, context, unit)
+    
+    async def _on_topic(self, update: Update, context: ContextTypes.DEFAULT_TYPE, arg: str):
+        unit_id, _, topic_id = arg.partition(":")
+        unit = _UNITS_BY_ID[int(unit_id)]
+        topic = _TOPICS_BY_ID[int(topic_id)]
+        await self.quiz_handler.start_quiz(update, context, unit, topic)
+    
+    async def _on_quiz_all(self, update: Update, context: ContextTypes.DEFAULT_TYPE, arg: str):
+        unit = _UNITS_BY_ID[int(arg)]
+        await self.quiz_handler.start_quiz(update, context, unit)
     
     async def show_topic_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE, unit: str):
         """Show topic selection for a unit"""
-        try:
-            # Define topics by unit (simplified for now)
-            topics_by_unit = {
-                "Human Anatomy": ["Upper Limb", "Head and Neck", "Thorax", "Abdomen", "Lower Limb", "Neuroanatomy"],
-                "Physiology I": ["Cardiovascular", "Respiratory", "Renal", "Endocrine"],
-                "Biochemistry": ["Carbohydrates", "Proteins", "Lipids", "Enzymes"],
-                "Microbiology": ["Bacteriology", "Virology", "Parasitology", "Mycology"],
-                "Pathology I": ["Cellular Injury", "Inflammation", "Neoplasia"]
-            }
-            
-            topics = topics_by_unit.get(unit, ["General Topics"])
-            
-            keyboard = []
-            for topic in topics:
-                keyboard.append([InlineKeyboardButton(f"📚 {topic}", callback_data=f"topic_{topic}")])
-            
-            # Add quiz option
-            keyboard.append([InlineKeyboardButton("📝 Take Quiz (All Topics)", callback_data="quiz_all")])
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.callback_query.edit_message_text(
-                f"📚 Select Topic in {unit}:\n\n"
-                "Choose a specific topic or take a quiz covering all topics:",
-                reply_markup=reply_markup
-            )
-            
-        except Exception as e:
-            logger.error(f"Error in show_topic_selection: {e}")
-            await update.callback_query.edit_message_text("❌ An error occurred. Please try again.")
+        await update.callback_query.edit_message_text(
+            f"📚 Select Topic in {unit}:\n\n"
+            "Choose a specific topic or take a quiz covering all topics:",
+            reply_markup=_topic_markup(unit)
+        )
     
     def cleanup_pending_auth(self, telegram_id: int):
         """Clean up pending authentication for a user"""
-        if telegram_id in self.pending_auth:
-            del self.pending_auth[telegram_id]
+        shared_cache.delete(_pending_auth_key(telegram_id))
+        self._auth_attempts.pop(telegram_id, None)
@@ -3,406 +3,463 @@ Role Management Handlers for BotCamp Medical
 Implements Part 4 - Dynamic Role Management and Access Control
 """
 
+import asyncio
 import logging
-from typing import Dict, Any
+from datetime import datetime
+from functools import wraps
+from typing import Dict, Any, Optional
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
+from sqlalchemy import func, update as sql_update
 from database.models import User, QuestionUpload
-from database.db_v2 import SessionLocal
+from database.db_v2 import get_session
 from services.role_management_service import RoleManagementService
 from services.session_service import SessionService
+from services.cache import shared_cache
 
 logger = logging.getLogger(__name__)
 
+# Rendered /view_global_stats message; "/view_global_stats force" bypasses it
+GLOBAL_STATS_KEY = "global_stats:v1"
+GLOBAL_STATS_TTL = 20
+
+# Static dashboards; InlineKeyboardMarkup is immutable so one instance serves every render
+_ADMIN_DASHBOARD_TEXT = """⚙️ **ADMIN DASHBOARD**
+Select what you'd like to do:"""
+_ADMIN_DASHBOARD_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📤 Upload Questions", callback_data="admin_upload")],
+    [InlineKeyboardButton("📋 Review Uploads", callback_data="admin_review")],
+    [InlineKeyboardButton("📊 View Unit Stats", callback_data="admin_stats")],
+    [InlineKeyboardButton("📈 My Uploads", callback_data="admin_my_uploads")],
+    [InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")]
+])
+
+_SUPER_ADMIN_DASHBOARD_TEXT = """👑 **SUPER ADMIN CONTROL PANEL**
+Select an option:"""
+_SUPER_ADMIN_DASHBOARD_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("👥 Manage Admins", callback_data="super_manage_admins")],
+    [InlineKeyboardButton("🔑 Generate Admin Code", callback_data="super_generate_code")],
+    [InlineKeyboardButton("📊 Global Statistics", callback_data="super_global_stats")],
+    [InlineKeyboardButton("📋 Review All Uploads", callback_data="super_review_uploads")],
+    [InlineKeyboardButton("🔒 Security & Backup", callback_data="super_security")],
+    [InlineKeyboardButton("📋 Audit Logs", callback_data="super_audit_logs")],
+    [InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")]
+])
+
+_BACK_TO_ROLES_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔙 Back to Role Selection", callback_data="back_to_roles")]
+])
+
+_GLOBAL_STATS_TEMPLATE = """📊 **Global System Statistics**
+
+**👥 Users:**
+• Total Users: {total_users}
+• Students: {total_students}
+• Admins: {total_admins}
+• Super Admins: {total_super_admins}
+
+**📤 Uploads:**
+• Total Uploads: {total_uploads}
+• Pending: {pending_uploads}
+• Approved: {approved_uploads}
+• Rejected: {rejected_uploads}
+
+**🔑 Access Control:**
+• Active Access Codes: {active_codes}
+
+**📈 System Health:** ✅ Operational"""
+
+# Listing headers
+_ADMIN_LIST_HEADER = "👥 **Admin List**\n\n"
+_ACCESS_CODES_HEADER = "🔑 **Active Admin Access Codes**\n\n"
+_AUDIT_LOGS_HEADER = "📋 **Recent Audit Logs** (Last {count} entries)\n\n"
+
+# Bound formatters for the timestamp columns in the listings
+_fmt_min = "{:%Y-%m-%d %H:%M}".format
+_fmt_sec = "{:%Y-%m-%d %H:%M:%S}".format
+
+_ACTION_EMOJI = {
+    "role_change": "🔄",
+    "admin_promotion": "⬆️",
+    "admin_demotion": "⬇️",
+    "admin_disabled": "❌",
+    "admin_code_generated": "🔑",
+    "access_code_revoked": "🔒"
+}
+
+def _handler_errors(error_message: str):
+    """Log a command handler's failure and reply with error_message instead of raising"""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+            try:
+                return await handler(self, update, context)
+            except Exception:
+                logger.exception(f"Error in {handler.__name__}")
+                await update.effective_message.reply_text(error_message)
+        return wrapper
+    return decorator
+
+def _one_per_chat(handler):
+    """Run at most one call of a heavy handler per chat at a time; other chats aren't held up
+    
+    Each chat's entry is [lock, holders + waiters] and is dropped when the last caller leaves,
+    so the table only holds chats with a command in flight.
+    """
+    @wraps(handler)
+    async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        chat_id = update.effective_chat.id
+        entry = self._chat_locks.get(chat_id)
+        if entry is None:
+            entry = self._chat_locks[chat_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                return await handler(self, update, context)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chat_locks[chat_id]
+    return wrapper
+
 class RoleManagementHandlers:
     def __init__(self):
         self.role_service = RoleManagementService()
         self.session_service = SessionService()
+        self._chat_locks: Dict[int, list] = {}
+        # user_id -> in-flight permission check, shared by concurrent commands
+        self._role_lookups: Dict[int, asyncio.Future] = {}
+    
+    async def _is_super_admin(self, user_id: int) -> bool:
+        """Cached answer, or join the check already running for this user rather than start another"""
+        allowed = self.role_service.get_cached_super_admin(user_id)
+        if allowed is not None:
+            return allowed
+        lookup = self._role_lookups.get(user_id)
+        if lookup is None:
+            lookup = asyncio.ensure_future(asyncio.to_thread(self.role_service.is_super_admin, user_id))
+            self._role_lookups[user_id] = lookup
+            lookup.add_done_callback(lambda _: self._role_lookups.pop(user_id, None))
+        return await asyncio.shield(lookup)
+    
+    async def _parse_int_arg(self, update: Update, context: ContextTypes.DEFAULT_TYPE, name: str,
+                             usage: Optional[str] = None, default: Optional[int] = None) -> Optional[int]:
+        """First argument as an int, or default when absent; replies and returns None if it can't be used"""
+        if not context.args:
+            if default is None:
+                await update.message.reply_text(f"Usage: {usage}")
+            return default
+        try:
+            return int(context.args[0])
+        except ValueError:
+            await update.message.reply_text(f"❌ {name} must be a number.")
+            return None
     
+    async def _require_super_admin(self, update: Update, user_id: int) -> bool:
+        """Reply with a refusal and return False unless the user is a super admin"""
+        if not await self._is_super_admin(user_id):
+            await update.message.reply_text("❌ Super admin privileges required.")
+            return False
+        return True
+    
+    @_handler_errors("❌ Error promoting user.")
     async def promote_admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /promote_admin command - Super Admin only"""
-        try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            if self.role_service.get_user_role(user_id) != "super_admin":
-                await update.message.reply_text("❌ Super admin privileges required.")
-                return
-            
-            if not context.args:
-                await update.message.reply_text("Usage: /promote_admin <user_id>")
-                return
-            
-            try:
-                target_user_id = int(context.args[0])
-            except ValueError:
-                await update.message.reply_text("❌ User ID must be a number.")
-                return
-            
-            result = self.role_service.promote_to_admin(target_user_id, user_id)
-            
-            if result['success']:
-                await update.message.reply_text(f"✅ {result['message']}")
-            else:
-                await update.message.reply_text(f"❌ {result['message']}")
-                
-        except Exception as e:
-            logger.error(f"Error in promote_admin_command: {e}")
-            await update.message.reply_text("❌ Error promoting user.")
+        user_id = update.effective_user.id
+        
+        if not await self._require_super_admin(update, user_id):
+            return
+        
+        target_user_id = await self._parse_int_arg(update, context, "User ID", usage="/promote_admin <user_id>")
+        if target_user_id is None:
+            return
+        
+        result = await asyncio.to_thread(self.role_service.promote_to_admin, target_user_id, user_id)
+        
+        if result['success']:
+            await update.message.reply_text(f"✅ {result['message']}")
+        else:
+            await update.message.reply_text(f"❌ {result['message']}")
     
+    @_handler_errors("❌ Error demoting admin.")
     async def demote_admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /demote_admin command - Super Admin only"""
-        try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            if self.role_service.get_user_role(user_id) != "super_admin":
-                await update.message.reply_text("❌ Super admin privileges required.")
-                return
-            
-            if not context.args:
-                await update.message.reply_text("Usage: /demote_admin <user_id>")
-                return
-            
-            try:
-                target_user_id = int(context.args[0])
-            except ValueError:
-                await update.message.reply_text("❌ User ID must be a number.")
-                return
-            
-            result = self.role_service.demote_admin(target_user_id, user_id)
-            
-            if result['success']:
-                await update.message.reply_text(f"✅ {result['message']}")
-            else:
-                await update.message.reply_text(f"❌ {result['message']}")
-                
-        except Exception as e:
-            logger.error(f"Error in demote_admin_command: {e}")
-            await update.message.reply_text("❌ Error demoting admin.")
+        user_id = update.effective_user.id
+        
+        if not await self._require_super_admin(update, user_id):
+            return
+        
+        target_user_id = await self._parse_int_arg(update, context, "User ID", usage="/demote_admin <user_id>")
+        if target_user_id is None:
+            return
+        
+        result = await asyncio.to_thread(self.role_service.demote_admin, target_user_id, user_id)
+        
+        if result['success']:
+            await update.message.reply_text(f"✅ {result['message']}")
+        else:
+            await update.message.reply_text(f"❌ {result['message']}")
     
+    @_handler_errors("❌ Error disabling admin.")
     async def disable_admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /disable_admin command - Super Admin only"""
-        try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            if self.role_service.get_user_role(user_id) != "super_admin":
-                await update.message.reply_text("❌ Super admin privileges required.")
-                return
-            
-            if not context.args:
-                await update.message.reply_text("Usage: /disable_admin <user_id>")
-                return
-            
-            try:
-                target_user_id = int(context.args[0])
-            except ValueError:
-                await update.message.reply_text("❌ User ID must be a number.")
-                return
-            
-            result = self.role_service.disable_admin(target_user_id, user_id)
-            
-            if result['success']:
-                await update.message.reply_text(f"✅ {result['message']}")
-            else:
-                await update.message.reply_text(f"❌ {result['message']}")
-                
-        except Exception as e:
-            logger.error(f"Error in disable_admin_command: {e}")
-            await update.message.reply_text("❌ Error disabling admin.")
+        user_id = update.effective_user.id
+        
+        if not await self._require_super_admin(update, user_id):
+            return
+        
+        target_user_id = await self._parse_int_arg(update, context, "User ID", usage="/disable_admin <user_id>")
+        if target_user_id is None:
+            return
+        
+        result = await asyncio.to_thread(self.role_service.disable_admin, target_user_id, user_id)
+        
+        if result['success']:
+            await update.message.reply_text(f"✅ {result['message']}")
+        else:
+            await update.message.reply_text(f"❌ {result['message']}")
     
+    @_handler_errors("❌ Error generating access code.")
     async def generate_admin_code_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /generate_admin_code command - Super Admin only"""
-        try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            if self.role_service.get_user_role(user_id) != "super_admin":
-                await update.message.reply_text("❌ Super admin privileges required.")
-                return
-            
-            # Parse expiration hours if provided
-            expires_hours = 24  # Default
-            if context.args:
-                try:
-                    expires_hours = int(context.args[0])
-                except ValueError:
-                    await update.message.reply_text("❌ Expiration hours must be a number.")
-                    return
-            
-            result = self.role_service.generate_admin_access_code(user_id, expires_hours)
-            
-            if result['success']:
-                message = f"""✅ **Admin Access Code Generated**
+        user_id = update.effective_user.id
+        
+        if not await self._require_super_admin(update, user_id):
+            return
+        
+        # Parse expiration hours if provided
+        expires_hours = await self._parse_int_arg(update, context, "Expiration hours", default=24)
+        if expires_hours is None:
+            return
+        
+        result = await asyncio.to_thread(self.role_service.generate_admin_access_code, user_id, expires_hours)
+        
+        if result['success']:
+            message = f"""✅ **Admin Access Code Generated**
 
 **Code:** `{result['code']}`
-**Expires:** {result['expires_at'].strftime('%Y-%m-%d %H:%M:%S')}
+**Expires:** {_fmt_sec(result['expires_at'])}
 **ID:** {result['code_id']}
 
 ⚠️ **Share this code securely with the intended admin.**"""
-                
-                await update.message.reply_text(message, parse_mode='Markdown')
-            else:
-                await update.message.reply_text(f"❌ {result['message']}")
-                
-        except Exception as e:
-            logger.error(f"Error in generate_admin_code_command: {e}")
-            await update.message.reply_text("❌ Error generating access code.")
-    
-    async def view_global_stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /view_global_stats command - Super Admin only"""
-        try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            if self.role_service.get_user_role(user_id) != "super_admin":
-                await update.message.reply_text("❌ Super admin privileges required.")
-                return
-            
-            session = SessionLocal()
-            
-            # Get global statistics
-            total_users = session.query(User).count()
-            total_admins = session.query(User).filter(User.role == "admin").count()
-            total_super_admins = session.query(User).filter(User.role == "super_admin").count()
-            total_students = session.query(User).filter(User.role == "student").count()
-            
-            # Get upload statistics
-            total_uploads = session.query(QuestionUpload).count()
-            pending_uploads = session.query(QuestionUpload).filter(QuestionUpload.status == "pending").count()
-            approved_uploads = session.query(QuestionUpload).filter(QuestionUpload.status == "approved").count()
-            rejected_uploads = session.query(QuestionUpload).filter(QuestionUpload.status == "rejected").count()
-            
-            # Get active access codes
-            active_codes = len(self.role_service.get_active_access_codes())
-            
-            session.close()
-            
-            message = f"""📊 **Global System Statistics**
-
-**👥 Users:**
-• Total Users: {total_users}
-• Students: {total_students}
-• Admins: {total_admins}
-• Super Admins: {total_super_admins}
-
-**📤 Uploads:**
-• Total Uploads: {total_uploads}
-• Pending: {pending_uploads}
-• Approved: {approved_uploads}
-• Rejected: {rejected_uploads}
-
-**🔑 Access Control:**
-• Active Access Codes: {active_codes}
-
-**📈 System Health:** ✅ Operational"""
             
             await update.message.reply_text(message, parse_mode='Markdown')
+        else:
+            await update.message.reply_text(f"❌ {result['message']}")
+    
+    def _build_global_stats_message(self) -> str:
+        """Render the global statistics message from two grouped counts"""
+        with get_session() as session:
+            # Get global statistics: one grouped count per table
+            users_by_role = dict(session.query(User.role, func.count()).group_by(User.role).all())
             
-        except Exception as e:
-            logger.error(f"Error in view_global_stats_command: {e}")
-            await update.message.reply_text("❌ Error retrieving global statistics.")
+            # Get upload statistics
+            uploads_by_status = dict(
+                session.query(QuestionUpload.status, func.count()).group_by(QuestionUpload.status).all()
+            )
+        
+        total_users = sum(users_by_role.values())
+        total_admins = users_by_role.get("admin", 0)
+        total_super_admins = users_by_role.get("super_admin", 0)
+        total_students = users_by_role.get("student", 0)
+        
+        total_uploads = sum(uploads_by_status.values())
+        pending_uploads = uploads_by_status.get("pending", 0)
+        approved_uploads = uploads_by_status.get("approved", 0)
+        rejected_uploads = uploads_by_status.get("rejected", 0)
+        
+        # Get active access codes
+        active_codes = len(self.role_service.get_active_access_codes())
+        
+        return _GLOBAL_STATS_TEMPLATE.format(
+            total_users=total_users,
+            total_students=total_students,
+            total_admins=total_admins,
+            total_super_admins=total_super_admins,
+            total_uploads=total_uploads,
+            pending_uploads=pending_uploads,
+            approved_uploads=approved_uploads,
+            rejected_uploads=rejected_uploads,
+            active_codes=active_codes
+        )
+    
+    def _approve_pending_uploads(self, upload_ids, approved_by: int) -> int:
+        """Approve the given uploads with one UPDATE; returns how many were still pending"""
+        # Rows that are missing or no longer pending are skipped.
+        # Commits on success, rolls back on error, and always returns the connection
+        with get_session() as session, session.begin():
+            result = session.execute(
+                sql_update(QuestionUpload)
+                .where(QuestionUpload.upload_id.in_(upload_ids), QuestionUpload.status == "pending")
+                .values(status="approved", approved_by=approved_by, approved_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            return result.rowcount
+    
+    @_handler_errors("❌ Error retrieving global statistics.")
+    @_one_per_chat
+    async def view_global_stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /view_global_stats command - Super Admin only"""
+        user_id = update.effective_user.id
+        
+        if not await self._require_super_admin(update, user_id):
+            return
+        
+        force = bool(context.args) and context.args[0].lower() == "force"
+        message = None if force else shared_cache.get(GLOBAL_STATS_KEY)
+        if message is None:
+            message = await asyncio.to_thread(self._build_global_stats_message)
+            shared_cache.set(GLOBAL_STATS_KEY, message, GLOBAL_STATS_TTL)
+        
+        await update.message.reply_text(message, parse_mode='Markdown')
     
+    @_handler_errors("❌ Error approving upload.")
+    @_one_per_chat
     async def approve_upload_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /approve_upload command - Super Admin only"""
+        user_id = update.effective_user.id
+        
+        if not await self._require_super_admin(update, user_id):
+            return
+        
+        if not context.args:
+            await update.message.reply_text("Usage: /approve_upload <upload_id> [upload_id ...]")
+            return
+        
         try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            if self.role_service.get_user_role(user_id) != "super_admin":
-                await update.message.reply_text("❌ Super admin privileges required.")
-                return
-            
-            if not context.args:
-                await update.message.reply_text("Usage: /approve_upload <upload_id>")
-                return
-            
-            try:
-                upload_id = int(context.args[0])
-            except ValueError:
-                await update.message.reply_text("❌ Upload ID must be a number.")
-                return
-            
-            session = SessionLocal()
-            
-            # Find upload
-            upload = session.query(QuestionUpload).filter(QuestionUpload.upload_id == upload_id).first()
-            
-            if not upload:
-                session.close()
-                await update.message.reply_text("❌ Upload not found.")
-                return
-            
-            if upload.status != "pending":
-                session.close()
-                await update.message.reply_text("❌ Upload is not pending approval.")
-                return
-            
-            # Approve upload
-            upload.status = "approved"
-            upload.approved_by = user_id
-            upload.approved_at = datetime.utcnow()
-            
-            session.commit()
-            session.close()
-            
-            await update.message.reply_text(f"✅ Upload {upload_id} approved successfully.")
-            
-        except Exception as e:
-            logger.error(f"Error in approve_upload_command: {e}")
-            await update.message.reply_text("❌ Error approving upload.")
+            upload_ids = sorted({int(arg) for arg in context.args})
+        except ValueError:
+            await update.message.reply_text("❌ Upload IDs must be numbers.")
+            return
+        
+        approved = await asyncio.to_thread(self._approve_pending_uploads, upload_ids, user_id)
+        
+        if not approved:
+            await update.message.reply_text("❌ No pending uploads found for the given ID(s).")
+            return
+        
+        shared_cache.delete(GLOBAL_STATS_KEY)
+        
+        if len(upload_ids) == 1:
+            message = f"✅ Upload {upload_ids[0]} approved successfully."
+        elif approved < len(upload_ids):
+            message = f"✅ Approved {approved} of {len(upload_ids)} uploads; the rest were not found or not pending."
+        else:
+            message = f"✅ Approved {approved} uploads."
+        await update.message.reply_text(message)
     
+    @_handler_errors("❌ Error retrieving admin list.")
+    @_one_per_chat
     async def list_admins_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /list_admins command - Super Admin only"""
-        try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            if self.role_service.get_user_role(user_id) != "super_admin":
-                await update.message.reply_text("❌ Super admin privileges required.")
-                return
-            
-            admins = self.role_service.get_admin_list()
-            
-            if not admins:
-                await update.message.reply_text("📋 No admins found.")
-                return
-            
-            message = "👥 **Admin List**\n\n"
-            
-            for admin in admins:
-                role_emoji = "👑" if admin['role'] == "super_admin" else "👨‍🏫"
-                status = "✅ Active" if admin['is_active'] else "❌ Disabled"
-                
-                message += f"{role_emoji} **{admin['first_name'] or admin['username']}**\n"
-                message += f"• Role: {admin['role'].title()}\n"
-                message += f"• Status: {status}\n"
-                if admin['university'] and admin['course']:
-                    message += f"• Scope: {admin['university']} - {admin['course']}\n"
-                message += f"• Last Activity: {admin['last_activity'].strftime('%Y-%m-%d %H:%M') if admin['last_activity'] else 'Never'}\n\n"
-            
-            await update.message.reply_text(message, parse_mode='Markdown')
-            
-        except Exception as e:
-            logger.error(f"Error in list_admins_command: {e}")
-            await update.message.reply_text("❌ Error retrieving admin list.")
+        user_id = update.effective_user.id
+        
+        if not await self._require_super_admin(update, user_id):
+            return
+        
+        admins = await asyncio.to_thread(self.role_service.get_admin_list)
+        
+        if not admins:
+            await update.message.reply_text("📋 No admins found.")
+            return
+        
+        parts = [_ADMIN_LIST_HEADER]
+        
+        for admin in admins:
+            role_emoji = "👑" if admin['role'] == "super_admin" else "👨‍🏫"
+            status = "✅ Active" if admin['is_active'] else "❌ Disabled"
+            
+            parts.append(f"{role_emoji} **{admin['first_name'] or admin['username']}**\n")
+            parts.append(f"• Role: {admin['role'].title()}\n")
+            parts.append(f"• Status: {status}\n")
+            if admin['university'] and admin['course']:
+                parts.append(f"• Scope: {admin['university']} - {admin['course']}\n")
+            parts.append(f"• Last Activity: {_fmt_min(admin['last_activity']) if admin['last_activity'] else 'Never'}\n\n")
+        
+        await update.message.reply_text("".join(parts), parse_mode='Markdown')
     
+    @_handler_errors("❌ Error retrieving access codes.")
+    @_one_per_chat
     async def list_access_codes_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /list_access_codes command - Super Admin only"""
-        try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            if self.role_service.get_user_role(user_id) != "super_admin":
-                await update.message.reply_text("❌ Super admin privileges required.")
-                return
-            
-            codes = self.role_service.get_active_access_codes()
-            
-            if not codes:
-                await update.message.reply_text("🔑 No active access codes found.")
-                return
-            
-            message = "🔑 **Active Admin Access Codes**\n\n"
-            
-            for code in codes:
-                status = "✅ Used" if code['is_used'] else "⏳ Available"
-                used_by = f" by {code['used_by']}" if code['used_by'] else ""
-                
-                message += f"**Code ID:** {code['code_id']}\n"
-                message += f"• Created by: {code['created_by']}\n"
-                message += f"• Status: {status}{used_by}\n"
-                message += f"• Created: {code['created_at'].strftime('%Y-%m-%d %H:%M')}\n"
-                message += f"• Expires: {code['expires_at'].strftime('%Y-%m-%d %H:%M')}\n\n"
-            
-            await update.message.reply_text(message, parse_mode='Markdown')
-            
-        except Exception as e:
-            logger.error(f"Error in list_access_codes_command: {e}")
-            await update.message.reply_text("❌ Error retrieving access codes.")
+        user_id = update.effective_user.id
+        
+        if not await self._require_super_admin(update, user_id):
+            return
+        
+        codes = await asyncio.to_thread(self.role_service.get_active_access_codes)
+        
+        if not codes:
+            await update.message.reply_text("🔑 No active access codes found.")
+            return
+        
+        parts = [_ACCESS_CODES_HEADER]
+        
+        for code in codes:
+            status = "✅ Used" if code['is_used'] else "⏳ Available"
+            used_by = f" by {code['used_by']}" if code['used_by'] else ""
+            
+            parts.append(f"**Code ID:** {code['code_id']}\n")
+            parts.append(f"• Created by: {code['created_by']}\n")
+            parts.append(f"• Status: {status}{used_by}\n")
+            parts.append(f"• Created: {_fmt_min(code['created_at'])}\n")
+            parts.append(f"• Expires: {_fmt_min(code['expires_at'])}\n\n")
+        
+        await update.message.reply_text("".join(parts), parse_mode='Markdown')
     
+    @_handler_errors("❌ Error revoking access code.")
     async def revoke_access_code_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /revoke_access_code command - Super Admin only"""
-        try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            if self.role_service.get_user_role(user_id) != "super_admin":
-                await update.message.reply_text("❌ Super admin privileges required.")
-                return
-            
-            if not context.args:
-                await update.message.reply_text("Usage: /revoke_access_code <code_id>")
-                return
-            
-            try:
-                code_id = int(context.args[0])
-            except ValueError:
-                await update.message.reply_text("❌ Code ID must be a number.")
-                return
-            
-            result = self.role_service.revoke_access_code(code_id, user_id)
-            
-            if result['success']:
-                await update.message.reply_text(f"✅ {result['message']}")
-            else:
-                await update.message.reply_text(f"❌ {result['message']}")
-                
-        except Exception as e:
-            logger.error(f"Error in revoke_access_code_command: {e}")
-            await update.message.reply_text("❌ Error revoking access code.")
+        user_id = update.effective_user.id
+        
+        if not await self._require_super_admin(update, user_id):
+            return
+        
+        code_id = await self._parse_int_arg(update, context, "Code ID", usage="/revoke_access_code <code_id>")
+        if code_id is None:
+            return
+        
+        result = await asyncio.to_thread(self.role_service.revoke_access_code, code_id, user_id)
+        
+        if result['success']:
+            await update.message.reply_text(f"✅ {result['message']}")
+        else:
+            await update.message.reply_text(f"❌ {result['message']}")
     
+    @_handler_errors("❌ Error retrieving audit logs.")
+    @_one_per_chat
     async def audit_logs_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /audit_logs command - Super Admin only"""
-        try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            if self.role_service.get_user_role(user_id) != "super_admin":
-                await update.message.reply_text("❌ Super admin privileges required.")
-                return
-            
-            # Parse limit if provided
-            limit = 20  # Default
-            if context.args:
-                try:
-                    limit = int(context.args[0])
-                except ValueError:
-                    await update.message.reply_text("❌ Limit must be a number.")
-                    return
-            
-            logs = self.role_service.get_audit_logs(limit)
-            
-            if not logs:
-                await update.message.reply_text("📋 No audit logs found.")
-                return
-            
-            message = f"📋 **Recent Audit Logs** (Last {len(logs)} entries)\n\n"
-            
-            for log in logs:
-                action_emoji = {
-                    "role_change": "🔄",
-                    "admin_promotion": "⬆️",
-                    "admin_demotion": "⬇️",
-                    "admin_disabled": "❌",
-                    "admin_code_generated": "🔑",
-                    "access_code_revoked": "🔒"
-                }.get(log['action'], "📝")
-                
-                message += f"{action_emoji} **{log['user']}**\n"
-                message += f"• Action: {log['action'].replace('_', ' ').title()}\n"
-                if log['old_role'] and log['new_role']:
-                    message += f"• Role Change: {log['old_role']} → {log['new_role']}\n"
-                if log['details']:
-                    message += f"• Details: {log['details']}\n"
-                message += f"• Time: {log['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-            
-            await update.message.reply_text(message, parse_mode='Markdown')
-            
-        except Exception as e:
-            logger.error(f"Error in audit_logs_command: {e}")
-            await update.message.reply_text("❌ Error retrieving audit logs.")
+        user_id = update.effective_user.id
+        
+        if not await self._require_super_admin(update, user_id):
+            return
+        
+        # Parse limit if provided
+        limit = await self._parse_int_arg(update, context, "Limit", default=20)
+        if limit is None:
+            return
+        
+        logs = await asyncio.to_thread(self.role_service.get_audit_logs, limit)
+        
+        if not logs:
+            await update.message.reply_text("📋 No audit logs found.")
+            return
+        
+        parts = [_AUDIT_LOGS_HEADER.format(count=len(logs))]
+        
+        for log in logs:
+            action_emoji = _ACTION_EMOJI.get(log['action'], "📝")
+            
+            parts.append(f"{action_emoji} **{log['user']}**\n")
+            parts.append(f"• Action: {log['action'].replace('_', ' ').title()}\n")
+            if log['old_role'] and log['new_role']:
+                parts.append(f"• Role Change: {log['old_role']} → {log['new_role']}\n")
+            if log['details']:
+                parts.append(f"• Details: {log['details']}\n")
+            parts.append(f"• Time: {_fmt_sec(log['timestamp'])}\n\n")
+        
+        await update.message.reply_text("".join(parts), parse_mode='Markdown')
     
     async def admin_code_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle admin access code input"""
@@ -413,23 +470,20 @@ class RoleManagementHandlers:
             user_id = update.effective_user.id
             code = update.message.text.strip()
             
-            result = self.role_service.verify_admin_access_code(code, user_id)
+            # Acknowledge straight away; verification is a DB round-trip
+            placeholder = await update.message.reply_text("⏳ Verifying...")
+            result = await asyncio.to_thread(self.role_service.verify_admin_access_code, code, user_id)
             
             if result['success']:
                 # Update user state
                 self.session_service.save_user_state(user_id, "admin")
                 
-                await update.message.reply_text(result['message'])
+                await placeholder.edit_text(result['message'])
                 
                 # Show admin dashboard
                 await self._show_admin_dashboard(update)
             else:
-                await update.message.reply_text(
-                    result['message'],
-                    reply_markup=InlineKeyboardMarkup([
-                        [InlineKeyboardButton("🔙 Back to Role Selection", callback_data="back_to_roles")]
-                    ])
-                )
+                await placeholder.edit_text(result['message'], reply_markup=_BACK_TO_ROLES_MARKUP)
             
             context.user_data.pop('awaiting_admin_code', None)
             
@@ -445,23 +499,20 @@ class RoleManagementHandlers:
             user_id = update.effective_user.id
             key = update.message.text.strip()
             
-            result = self.role_service.verify_super_admin_key(key, user_id)
+            # Acknowledge straight away; verification is a DB round-trip
+            placeholder = await update.message.reply_text("⏳ Verifying...")
+            result = await asyncio.to_thread(self.role_service.verify_super_admin_key, key, user_id)
             
             if result['success']:
                 # Update user state
                 self.session_service.save_user_state(user_id, "super_admin")
                 
-                await update.message.reply_text(result['message'])
+                await placeholder.edit_text(result['message'])
                 
                 # Show super admin dashboard
                 await self._show_super_admin_dashboard(update)
             else:
-                await update.message.reply_text(
-                    result['message'],
-                    reply_markup=InlineKeyboardMarkup([
-                        [InlineKeyboardButton("🔙 Back to Role Selection", callback_data="back_to_roles")]
-                    ])
-                )
+                await placeholder.edit_text(result['message'], reply_markup=_BACK_TO_ROLES_MARKUP)
             
             context.user_data.pop('awaiting_super_admin_key', None)
             
@@ -471,61 +522,19 @@ class RoleManagementHandlers:
     async def _show_admin_dashboard(self, update: Update):
         """Show admin dashboard"""
         try:
-            message = """⚙️ **ADMIN DASHBOARD**
-Select what you'd like to do:"""
-            
-            keyboard = [
-                [InlineKeyboardButton("📤 Upload Questions", callback_data="admin_upload")],
-                [InlineKeyboardButton("📋 Review Uploads", callback_data="admin_review")],
-                [InlineKeyboardButton("📊 View Unit Stats", callback_data="admin_stats")],
-                [InlineKeyboardButton("📈 My Uploads", callback_data="admin_my_uploads")],
-                [InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")]
-            ]
-            
-            if update.callback_query:
-                await update.callback_query.edit_message_text(
-                    message,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='Markdown'
-                )
-            else:
-                await update.message.reply_text(
-                    message,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='Markdown'
-                )
-            
+            await self._show_dashboard(update, _ADMIN_DASHBOARD_TEXT, _ADMIN_DASHBOARD_MARKUP)
         except Exception as e:
             logger.error(f"Error showing admin dashboard: {e}")
     
     async def _show_super_admin_dashboard(self, update: Update):
         """Show super admin dashboard"""
         try:
-            message = """👑 **SUPER ADMIN CONTROL PANEL**
-Select an option:"""
-            
-            keyboard = [
-                [InlineKeyboardButton("👥 Manage Admins", callback_data="super_manage_admins")],
-                [InlineKeyboardButton("🔑 Generate Admin Code", callback_data="super_generate_code")],
-                [InlineKeyboardButton("📊 Global Statistics", callback_data="super_global_stats")],
-                [InlineKeyboardButton("📋 Review All Uploads", callback_data="super_review_uploads")],
-                [InlineKeyboardButton("🔒 Security & Backup", callback_data="super_security")],
-                [InlineKeyboardButton("📋 Audit Logs", callback_data="super_audit_logs")],
-                [InlineKeyboardButton("🏠 Main Menu", callback_data="main_menu")]
-            ]
-            
-            if update.callback_query:
-                await update.callback_query.edit_message_text(
-                    message,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='Markdown'
-                )
-            else:
-                await update.message.reply_text(
-                    message,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode='Markdown'
-                )
-            
+            await self._show_dashboard(update, _SUPER_ADMIN_DASHBOARD_TEXT, _SUPER_ADMIN_DASHBOARD_MARKUP)
         except Exception as e:
             logger.error(f"Error showing super admin dashboard: {e}")
+    
+    async def _show_dashboard(self, update: Update, text: str, markup: InlineKeyboardMarkup):
+        if update.callback_query:
+            await update.callback_query.edit_message_text(text, reply_markup=markup, parse_mode='Markdown')
+        else:
+            await update.message.reply_text(text, reply_markup=markup, parse_mode='Markdown')
@@ -3,12 +3,21 @@ Specification Handlers for BotCamp Medical
 Implements Master Specification Sections 11-15 command handlers
 """
 
+import asyncio
 import logging
-from typing import Dict, Any
+import os
+from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps, partial
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from database.models import User, AdminScope
-from database.db_v2 import SessionLocal
+from models import RoleEnum
+from sqlalchemy import lambda_stmt, select, text
+from database.db_v2 import engine, get_session, run_db
+from services.user_cache import CachedUser, resolve_user, invalidate_user
+from services.cache import memory_cache
 from services.session_service import SessionService
 from services.multi_admin_service import MultiAdminService
 from services.backup_export_service import BackupExportService
@@ -16,365 +25,284 @@ from services.multi_university_service import MultiUniversityService
 
 logger = logging.getLogger(__name__)
 
-class SpecificationHandlers:
-    def __init__(self):
-        self.session_service = SessionService()
-        self.multi_admin_service = MultiAdminService()
-        self.backup_service = BackupExportService()
-        self.university_service = MultiUniversityService()
-    
-    async def exportdata_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /exportdata command per Section 14.2"""
+HIERARCHY_CACHE_KEY = "university_hierarchy"
+HIERARCHY_CACHE_TTL = int(os.getenv("CACHE_TTL_HIERARCHY", "30"))
+
+# Replies accepted by restore_confirmation_handler; anything else cancels the restore
+_RESTORE_CONFIRMATIONS = frozenset({"CONFIRM", "Confirm", "confirm"})
+
+# Exports, backups and restores are long disk/DB jobs; give them their own small pool
+# so a burst of /backup requests can't starve the default executor used elsewhere
+_BACKUP_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="backup")
+
+async def _run_backup_op(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_BACKUP_EXECUTOR, partial(fn, *args))
+
+# Sent as plain text: db_status can carry driver error text with Markdown metacharacters
+_HEALTH_TEMPLATE = """🔍 System Health Check
+
+Database: {db_status}
+
+Backups:
+📁 Total Backups: {backup_count}
+📊 Total Exports: {export_count}
+💾 Total Size: {total_size_mb} MB
+🗑️ Retention: {retention_days} days
+
+Admin Coordination:
+🔓 Expired Locks Cleaned: {expired_locks}
+
+Status: ✅ System Operational"""
+
+_HEALTH_DEFAULTS = {'backup_count': 0, 'export_count': 0, 'total_size_mb': 0, 'retention_days': 0}
+
+def _ping_db() -> None:
+    """Liveness probe on a raw pooled connection; no ORM session or unit of work"""
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+def _find_user_ids(username: str):
+    """Look up (user_id, telegram_id) for a username in one short session"""
+    with get_session() as session:
+        # lambda_stmt caches the constructed statement; username becomes a bound parameter
+        return session.execute(lambda_stmt(
+            lambda: select(User.user_id, User.telegram_id).where(User.username == username)
+        )).first()
+
+def _handler_errors(error_message: str):
+    """Log a handler's failure with its traceback and reply with error_message instead of raising"""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE, *args):
+            try:
+                return await handler(self, update, context, *args)
+            except Exception:
+                logger.exception("Error in %s", handler.__name__)
+                await update.message.reply_text(error_message)
+        return wrapper
+    return decorator
+
+def _require_super_admin(handler):
+    """Gate a command on the caller being a super admin and pass their cached user row in"""
+    @wraps(handler)
+    async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            session = SessionLocal()
-            user = session.query(User).filter(User.telegram_id == user_id).first()
-            session.close()
-            
-            if not user or user.role != 'super_admin':
-                await update.message.reply_text("❌ Super admin access required.")
-                return
-            
-            # Parse filters from command arguments
-            filters = {}
-            if context.args:
-                for arg in context.args:
-                    if '=' in arg:
-                        key, value = arg.split('=', 1)
-                        filters[key] = value
-            
-            # Create export
-            result = self.backup_service.export_data(filters)
-            
-            if result['success']:
-                await update.message.reply_text(
-                    f"✅ Export created successfully!\n"
-                    f"📊 Records exported: {result['records_exported']}\n"
-                    f"📁 File: {result['file_path']}"
-                )
-            else:
-                await update.message.reply_text(f"❌ Export failed: {result['message']}")
-                
-        except Exception as e:
-            logger.error(f"Error in exportdata_command: {e}")
-            await update.message.reply_text("❌ Error creating export.")
+            user = await run_db(resolve_user, update.effective_user.id)
+        except Exception:
+            logger.exception("Error checking permissions for %s", handler.__name__)
+            await update.message.reply_text("❌ Error checking permissions.")
+            return
+        if not user or user.role != RoleEnum.super_admin:
+            await update.message.reply_text("❌ Super admin access required.")
+            return
+        return await handler(self, update, context, user)
+    return wrapper
+
+class _AddSpec(NamedTuple):
+    min_args: int
+    usage: str
+    method: str                                  # MultiUniversityService method name
+    parse: Callable[[List[str]], Tuple]          # context.args -> positional args; ValueError -> bad_args
+    noun: str
+    bad_args: str = ""
+
+_ADD_COMMANDS: Dict[str, _AddSpec] = {
+    'adduniversity': _AddSpec(1, "Usage: /adduniversity <name>", 'add_university',
+                              lambda a: (' '.join(a),), "university"),
+    'addcourse': _AddSpec(2, "Usage: /addcourse <university> <course>", 'add_course',
+                          lambda a: (a[0], ' '.join(a[1:])), "course"),
+    'addunit': _AddSpec(3, "Usage: /addunit <course> <year> <unit>", 'add_unit',
+                        lambda a: (a[0], int(a[1]), ' '.join(a[2:])), "unit", "❌ Year must be a number."),
+    'addtopic': _AddSpec(2, "Usage: /addtopic <unit> <topic>", 'add_topic',
+                         lambda a: (a[0], ' '.join(a[1:])), "topic"),
+}
+
+def _add_command(command: str):
+    """Build the /<command> handler from its _ADD_COMMANDS entry"""
+    spec = _ADD_COMMANDS[command]
     
-    async def adduniversity_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /adduniversity command per Section 15.2"""
+    async def handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user: CachedUser):
+        args = context.args or []
+        if len(args) < spec.min_args:
+            await update.message.reply_text(spec.usage)
+            return
         try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            session = SessionLocal()
-            user = session.query(User).filter(User.telegram_id == user_id).first()
-            session.close()
-            
-            if not user or user.role != 'super_admin':
-                await update.message.reply_text("❌ Super admin access required.")
-                return
-            
-            if not context.args:
-                await update.message.reply_text("Usage: /adduniversity <name>")
-                return
-            
-            university_name = ' '.join(context.args)
-            result = self.university_service.add_university(university_name, user.user_id)
-            
-            if result['success']:
-                await update.message.reply_text(f"✅ {result['message']}")
-            else:
-                await update.message.reply_text(f"❌ {result['message']}")
-                
-        except Exception as e:
-            logger.error(f"Error in adduniversity_command: {e}")
-            await update.message.reply_text("❌ Error adding university.")
+            service_args = spec.parse(args)
+        except ValueError:
+            await update.message.reply_text(spec.bad_args)
+            return
+        
+        result = await run_db(getattr(self.university_service, spec.method), *service_args, user.user_id)
+        
+        if result['success']:
+            memory_cache.delete(HIERARCHY_CACHE_KEY)
+            await update.message.reply_text(f"✅ {result['message']}")
+        else:
+            await update.message.reply_text(f"❌ {result['message']}")
     
-    async def addcourse_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /addcourse command per Section 15.2"""
-        try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            session = SessionLocal()
-            user = session.query(User).filter(User.telegram_id == user_id).first()
-            session.close()
-            
-            if not user or user.role != 'super_admin':
-                await update.message.reply_text("❌ Super admin access required.")
-                return
-            
-            if len(context.args) < 2:
-                await update.message.reply_text("Usage: /addcourse <university> <course>")
-                return
-            
-            university_name = context.args[0]
-            course_name = ' '.join(context.args[1:])
-            
-            result = self.university_service.add_course(university_name, course_name, user.user_id)
-            
-            if result['success']:
-                await update.message.reply_text(f"✅ {result['message']}")
-            else:
-                await update.message.reply_text(f"❌ {result['message']}")
-                
-        except Exception as e:
-            logger.error(f"Error in addcourse_command: {e}")
-            await update.message.reply_text("❌ Error adding course.")
+    handler.__name__ = handler.__qualname__ = f"{command}_command"
+    handler.__doc__ = f"Handle /{command} command per Section 15.2"
+    return _require_super_admin(_handler_errors(f"❌ Error adding {spec.noun}.")(handler))
+
+class SpecificationHandlers:
+    def __init__(
+        self,
+        session_service: Optional[SessionService] = None,
+        multi_admin_service: Optional[MultiAdminService] = None,
+        backup_service: Optional[BackupExportService] = None,
+        university_service: Optional[MultiUniversityService] = None,
+    ):
+        self.session_service = session_service or SessionService()
+        self.multi_admin_service = multi_admin_service or MultiAdminService()
+        self.backup_service = backup_service or BackupExportService()
+        self.university_service = university_service or MultiUniversityService()
     
-    async def addunit_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /addunit command per Section 15.2"""
-        try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            session = SessionLocal()
-            user = session.query(User).filter(User.telegram_id == user_id).first()
-            session.close()
-            
-            if not user or user.role != 'super_admin':
-                await update.message.reply_text("❌ Super admin access required.")
-                return
-            
-            if len(context.args) < 3:
-                await update.message.reply_text("Usage: /addunit <course> <year> <unit>")
-                return
-            
-            course_name = context.args[0]
-            try:
-                year = int(context.args[1])
-            except ValueError:
-                await update.message.reply_text("❌ Year must be a number.")
-                return
-            
-            unit_name = ' '.join(context.args[2:])
-            
-            result = self.university_service.add_unit(course_name, year, unit_name, user.user_id)
-            
-            if result['success']:
-                await update.message.reply_text(f"✅ {result['message']}")
-            else:
-                await update.message.reply_text(f"❌ {result['message']}")
-                
-        except Exception as e:
-            logger.error(f"Error in addunit_command: {e}")
-            await update.message.reply_text("❌ Error adding unit.")
+    @_require_super_admin
+    @_handler_errors("❌ Error creating export.")
+    async def exportdata_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user: CachedUser):
+        """Handle /exportdata command per Section 14.2"""
+        # Parse key=value filters from command arguments; args without '=' are ignored
+        filters = {k: v for k, sep, v in (arg.partition('=') for arg in context.args or ()) if sep}
+        
+        # Create export
+        result = await _run_backup_op(self.backup_service.export_data, filters)
+        
+        if result['success']:
+            await update.message.reply_text(
+                f"✅ Export created successfully!\n"
+                f"📊 Records exported: {result['records_exported']}\n"
+                f"📁 File: {result['file_path']}"
+            )
+        else:
+            await update.message.reply_text(f"❌ Export failed: {result['message']}")
     
-    async def addtopic_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /addtopic command per Section 15.2"""
-        try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            session = SessionLocal()
-            user = session.query(User).filter(User.telegram_id == user_id).first()
-            session.close()
-            
-            if not user or user.role != 'super_admin':
-                await update.message.reply_text("❌ Super admin access required.")
-                return
-            
-            if len(context.args) < 2:
-                await update.message.reply_text("Usage: /addtopic <unit> <topic>")
-                return
-            
-            unit_name = context.args[0]
-            topic_name = ' '.join(context.args[1:])
-            
-            result = self.university_service.add_topic(unit_name, topic_name, user.user_id)
-            
-            if result['success']:
-                await update.message.reply_text(f"✅ {result['message']}")
-            else:
-                await update.message.reply_text(f"❌ {result['message']}")
-                
-        except Exception as e:
-            logger.error(f"Error in addtopic_command: {e}")
-            await update.message.reply_text("❌ Error adding topic.")
+    # Section 15.2 structure commands, all built from _ADD_COMMANDS
+    adduniversity_command = _add_command('adduniversity')
+    addcourse_command = _add_command('addcourse')
+    addunit_command = _add_command('addunit')
+    addtopic_command = _add_command('addtopic')
     
+    @_handler_errors("❌ Health check failed.")
     async def healthcheck_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /healthcheck command per Section 14.5"""
-        try:
-            # Check database connection
-            session = SessionLocal()
-            try:
-                session.execute("SELECT 1")
-                db_status = "✅ Connected"
-            except Exception as e:
-                db_status = f"❌ Error: {str(e)}"
-            finally:
-                session.close()
-            
-            # Check backup status
-            backup_status = self.backup_service.get_backup_status()
-            
-            # Check expired locks
-            expired_locks = self.multi_admin_service.cleanup_expired_locks()
-            
-            message = f"""🔍 **System Health Check**
-
-**Database:** {db_status}
-
-**Backups:**
-📁 Total Backups: {backup_status.get('backup_count', 0)}
-📊 Total Exports: {backup_status.get('export_count', 0)}
-💾 Total Size: {backup_status.get('total_size_mb', 0)} MB
-🗑️ Retention: {backup_status.get('retention_days', 0)} days
-
-**Admin Coordination:**
-🔓 Expired Locks Cleaned: {expired_locks}
-
-**Status:** ✅ System Operational"""
-            
-            await update.message.reply_text(message, parse_mode='Markdown')
-            
-        except Exception as e:
-            logger.error(f"Error in healthcheck_command: {e}")
-            await update.message.reply_text("❌ Health check failed.")
+        # Database ping, backup directory scan and expired-lock cleanup are independent;
+        # run them side by side in worker threads
+        db_result, backup_status, expired_locks = await asyncio.gather(
+            asyncio.to_thread(_ping_db),
+            asyncio.to_thread(self.backup_service.get_backup_status),
+            asyncio.to_thread(self.multi_admin_service.cleanup_expired_locks),
+            return_exceptions=True
+        )
+        db_status = f"❌ Error: {db_result}" if isinstance(db_result, Exception) else "✅ Connected"
+        if isinstance(backup_status, Exception):
+            logger.error("Backup status probe failed: %s", backup_status)
+            backup_status = {}
+        if isinstance(expired_locks, Exception):
+            logger.error("Expired lock cleanup failed: %s", expired_locks)
+            expired_locks = 0
+        
+        message = _HEALTH_TEMPLATE.format_map(
+            ChainMap({'db_status': db_status, 'expired_locks': expired_locks}, backup_status, _HEALTH_DEFAULTS)
+        )
+        
+        await update.message.reply_text(message)
     
-    async def backup_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    @_require_super_admin
+    @_handler_errors("❌ Backup failed.")
+    async def backup_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user: CachedUser):
         """Handle /backup command for manual backup creation"""
-        try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            session = SessionLocal()
-            user = session.query(User).filter(User.telegram_id == user_id).first()
-            session.close()
-            
-            if not user or user.role != 'super_admin':
-                await update.message.reply_text("❌ Super admin access required.")
-                return
-            
-            await update.message.reply_text("📦 Creating backup... Please wait.")
-            
-            result = self.backup_service.create_daily_backup()
-            
-            if result['success']:
-                await update.message.reply_text(f"✅ {result['message']}")
-            else:
-                await update.message.reply_text(f"❌ {result['message']}")
-                
-        except Exception as e:
-            logger.error(f"Error in backup_command: {e}")
-            await update.message.reply_text("❌ Backup failed.")
+        await update.message.reply_text("📦 Creating backup... Please wait.")
+        
+        result = await _run_backup_op(self.backup_service.create_daily_backup)
+        
+        if result['success']:
+            await update.message.reply_text(f"✅ {result['message']}")
+        else:
+            await update.message.reply_text(f"❌ {result['message']}")
     
-    async def restore_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    @_require_super_admin
+    @_handler_errors("❌ Restore command failed.")
+    async def restore_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user: CachedUser):
         """Handle /restore command for database restoration"""
-        try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            session = SessionLocal()
-            user = session.query(User).filter(User.telegram_id == user_id).first()
-            session.close()
-            
-            if not user or user.role != 'super_admin':
-                await update.message.reply_text("❌ Super admin access required.")
-                return
-            
-            if not context.args:
-                await update.message.reply_text("Usage: /restore <backup_file_path>")
-                return
-            
-            backup_path = context.args[0]
-            
-            await update.message.reply_text("⚠️ **WARNING: This will replace the current database!**\n\nType 'CONFIRM' to proceed:")
-            context.user_data['awaiting_restore_confirmation'] = backup_path
-            
-        except Exception as e:
-            logger.error(f"Error in restore_command: {e}")
-            await update.message.reply_text("❌ Restore command failed.")
+        if not context.args:
+            await update.message.reply_text("Usage: /restore <backup_file_path>")
+            return
+        
+        backup_path = context.args[0]
+        
+        await update.message.reply_text("⚠️ **WARNING: This will replace the current database!**\n\nType 'CONFIRM' to proceed:")
+        context.user_data['awaiting_restore_confirmation'] = backup_path
     
+    @_handler_errors("❌ Restore failed.")
     async def restore_confirmation_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle restore confirmation"""
-        try:
-            if not context.user_data.get('awaiting_restore_confirmation'):
-                return
-            
-            if update.message.text.strip().upper() != 'CONFIRM':
-                await update.message.reply_text("❌ Restore cancelled.")
-                context.user_data.pop('awaiting_restore_confirmation', None)
-                return
-            
-            backup_path = context.user_data.pop('awaiting_restore_confirmation')
-            
-            await update.message.reply_text("🔄 Restoring database... Please wait.")
-            
-            result = self.backup_service.restore_from_backup(backup_path)
-            
-            if result['success']:
-                await update.message.reply_text(f"✅ {result['message']}")
-            else:
-                await update.message.reply_text(f"❌ {result['message']}")
-                
-        except Exception as e:
-            logger.error(f"Error in restore_confirmation_handler: {e}")
-            await update.message.reply_text("❌ Restore failed.")
+        if not context.user_data.get('awaiting_restore_confirmation'):
+            return
+        
+        text = update.message.text
+        if len(text) > 16 or text.strip() not in _RESTORE_CONFIRMATIONS:
+            await update.message.reply_text("❌ Restore cancelled.")
+            context.user_data.pop('awaiting_restore_confirmation', None)
+            return
+        
+        backup_path = context.user_data.pop('awaiting_restore_confirmation')
+        
+        await update.message.reply_text("🔄 Restoring database... Please wait.")
+        
+        result = await _run_backup_op(self.backup_service.restore_from_backup, backup_path)
+        
+        if result['success']:
+            memory_cache.delete(HIERARCHY_CACHE_KEY)
+            await update.message.reply_text(f"✅ {result['message']}")
+        else:
+            await update.message.reply_text(f"❌ {result['message']}")
     
+    @_handler_errors("❌ Error listing universities.")
     async def listuniversities_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /listuniversities command"""
-        try:
-            hierarchy = self.university_service.get_university_hierarchy()
-            
+        # Read-mostly; add* commands and restores drop the entry on success
+        hierarchy = memory_cache.get(HIERARCHY_CACHE_KEY)
+        if hierarchy is None:
+            hierarchy = await run_db(self.university_service.get_university_hierarchy)
             if 'error' in hierarchy:
                 await update.message.reply_text(f"❌ {hierarchy['error']}")
                 return
-            
-            message = "🏫 **Available Universities:**\n\n"
-            
-            for uni in hierarchy.get('universities', []):
-                message += f"• {uni['name']} ({uni['courses_count']} courses)\n"
-            
-            await update.message.reply_text(message, parse_mode='Markdown')
-            
-        except Exception as e:
-            logger.error(f"Error in listuniversities_command: {e}")
-            await update.message.reply_text("❌ Error listing universities.")
+            memory_cache.set(HIERARCHY_CACHE_KEY, hierarchy, HIERARCHY_CACHE_TTL)
+        
+        # Plain text so an underscore or asterisk in a university name cannot fail the send
+        lines = ["🏫 Available Universities:", ""]
+        lines.extend(f"• {uni['name']} ({uni['courses_count']} courses)" for uni in hierarchy.get('universities', []))
+        message = "\n".join(lines)
+        
+        await update.message.reply_text(message)
     
-    async def setadminscope_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    @_require_super_admin
+    @_handler_errors("❌ Error setting admin scope.")
+    async def setadminscope_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user: CachedUser):
         """Handle /setadminscope command per Section 15.3"""
+        if len(context.args) < 3:
+            await update.message.reply_text("Usage: /setadminscope <admin_username> <university_id> <course_id>")
+            return
+        
+        admin_username = context.args[0]
         try:
-            user_id = update.effective_user.id
-            
-            # Check if user is super admin
-            session = SessionLocal()
-            user = session.query(User).filter(User.telegram_id == user_id).first()
-            session.close()
-            
-            if not user or user.role != 'super_admin':
-                await update.message.reply_text("❌ Super admin access required.")
-                return
-            
-            if len(context.args) < 3:
-                await update.message.reply_text("Usage: /setadminscope <admin_username> <university_id> <course_id>")
-                return
-            
-            admin_username = context.args[0]
-            try:
-                university_id = int(context.args[1])
-                course_id = int(context.args[2])
-            except ValueError:
-                await update.message.reply_text("❌ University ID and Course ID must be numbers.")
-                return
-            
-            # Find admin user
-            session = SessionLocal()
-            admin_user = session.query(User).filter(User.username == admin_username).first()
-            session.close()
-            
-            if not admin_user:
-                await update.message.reply_text(f"❌ Admin user '{admin_username}' not found.")
-                return
-            
-            result = self.university_service.set_admin_scope(admin_user.user_id, university_id, course_id)
-            
-            if result['success']:
-                await update.message.reply_text(f"✅ {result['message']}")
-            else:
-                await update.message.reply_text(f"❌ {result['message']}")
-                
-        except Exception as e:
-            logger.error(f"Error in setadminscope_command: {e}")
-            await update.message.reply_text("❌ Error setting admin scope.")
+            university_id = int(context.args[1])
+            course_id = int(context.args[2])
+        except ValueError:
+            await update.message.reply_text("❌ University ID and Course ID must be numbers.")
+            return
+        
+        # Caller was resolved from the user cache; this is the only DB lookup
+        admin_user = await run_db(_find_user_ids, admin_username)
+        
+        if not admin_user:
+            await update.message.reply_text(f"❌ Admin user '{admin_username}' not found.")
+            return
+        
+        result = await run_db(self.university_service.set_admin_scope, admin_user.user_id, university_id, course_id)
+        
+        if result['success']:
+            invalidate_user(admin_user.telegram_id)
+            await update.message.reply_text(f"✅ {result['message']}")
+        else:
+            await update.message.reply_text(f"❌ {result['message']}")
@@ -5,16 +5,11 @@ from database.models import User, University, Course, Unit, Topic, Paper, QuizSe
 from sqlalchemy import select
 import os
 from services.cache import memory_cache
-from services.user_service import UserService
-from handlers.role_auth import RoleAuthHandler
+from services.container import user_service, role_auth_handler
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Initialize handlers
-user_service = UserService()
-role_auth_handler = RoleAuthHandler()
-
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the /start command with role-based authentication"""
     try:
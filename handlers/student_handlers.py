@@ -10,14 +10,14 @@ from telegram.ext import ContextTypes
 from database.models import User, Question, QuizSession
 from database.db_v2 import SessionLocal
 from services.session_service import SessionService
-from services.analytics_service import AnalyticsService
+from services.analytics_service import analytics_service
 
 logger = logging.getLogger(__name__)
 
 class StudentHandlers:
     def __init__(self):
         self.session_service = SessionService()
-        self.analytics_service = AnalyticsService()
+        self.analytics_service = analytics_service
     
     async def start_quiz_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start_quiz command - Student only"""
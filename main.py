@@ -13,7 +13,7 @@ from handlers.start import (
     course_selected_callback, year_selected_callback, unit_selected_callback,
     topic_selected_callback, main_menu_callback, help_callback, weak_topics_command
 )
-from handlers.role_auth import RoleAuthHandler
+from services.container import role_auth_handler, spec_handler, quiz_service
 from handlers.admin_upload import AdminUploadHandler
 from handlers.super_admin import SuperAdminHandler
 from services.security_service import SecurityService
@@ -44,7 +44,6 @@ from handlers.admin import (
     my_stats_command, system_status_command, my_uploads_command, topic_stats_command, review_next_command, request_admin_command, set_admin_code_command, redeem_admin_code_command, reprocess_upload_command
 )
 from handlers.ui_flow_handlers import UIFlowHandlers
-from handlers.specification_handlers import SpecificationHandlers
 
 # Import database setup
 from database.db import create_tables_sync
@@ -115,13 +114,11 @@ def setup_handlers(application: Application):
     """Setup all bot handlers"""
     
     # Initialize handlers
-    role_auth_handler = RoleAuthHandler()
     admin_upload_handler = AdminUploadHandler()
     super_admin_handler = SuperAdminHandler()
     security_service = SecurityService()
     upload_handler = UploadHandler()
     ui_flow_handler = UIFlowHandlers()
-    spec_handler = SpecificationHandlers()
     
     # Command handlers
     application.add_handler(CommandHandler("start", ui_flow_handler.start_command_handler))
@@ -181,7 +178,7 @@ def setup_handlers(application: Application):
     
     # Role authentication handlers
     application.add_handler(CallbackQueryHandler(role_auth_handler.handle_role_callback, pattern="^role_"))
-    application.add_handler(CallbackQueryHandler(role_auth_handler.handle_navigation_callback, pattern=r"^(university_|course_|year_|unit_|topic_|quiz_)"))
+    application.add_handler(CallbackQueryHandler(role_auth_handler.handle_navigation_callback, pattern=r"^(university_|course_|year_|qa\d|[uta]\d)"))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, role_auth_handler.handle_auth_code))
     
     # Callback query handlers for start flow
@@ -285,6 +282,10 @@ def setup_handlers(application: Application):
     # Add error handler
     application.add_error_handler(error_handler)
 
+async def _post_shutdown(application: Application):
+    """Persist quiz answers still buffered for unfinished quizzes"""
+    await asyncio.to_thread(quiz_service.flush_pending_answers)
+
 def main():
     """Main function to run the bot (synchronous for PTB v21)."""
     logger.info("Starting BotCamp Medical Bot...")
@@ -295,7 +296,7 @@ def main():
     logger.info("Database tables created successfully")
     
     # Create application
-    application = Application.builder().token(BOT_TOKEN).build()
+    application = Application.builder().token(BOT_TOKEN).post_shutdown(_post_shutdown).build()
     
     # Setup handlers
     setup_handlers(application)
@@ -0,0 +1,44 @@
+"""
+Migration to add indexes for the moderation and analytics lookups
+"""
+
+import sqlite3
+from pathlib import Path
+
+INDEXES = [
+    ("ix_users_telegram_id", "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_telegram_id ON users (telegram_id)"),
+    ("ix_users_username", "CREATE INDEX IF NOT EXISTS ix_users_username ON users (username)"),
+    ("ix_questions_needs_review", "CREATE INDEX IF NOT EXISTS ix_questions_needs_review ON questions (needs_review)"),
+    ("ix_questions_pending_created_at",
+     "CREATE INDEX IF NOT EXISTS ix_questions_pending_created_at ON questions (created_at) WHERE needs_review = 1"),
+]
+
+def run_migration():
+    """Create indexes used by the auth gates and the moderation queue"""
+    
+    # Get database path
+    db_path = Path(__file__).parent.parent / "botcamp_medical.db"
+    
+    if not db_path.exists():
+        print("Database not found, skipping migration")
+        return
+    
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+    
+    try:
+        for name, ddl in INDEXES:
+            cursor.execute(ddl)
+            print(f"Ensured index {name}")
+        
+        conn.commit()
+        print("Migration completed successfully")
+        
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,45 @@
+"""
+Migration to add composite indexes for the quiz handlers
+"""
+
+import sqlite3
+from pathlib import Path
+
+INDEXES = [
+    ("ix_questions_topic_active",
+     "CREATE INDEX IF NOT EXISTS ix_questions_topic_active ON questions (topic_id, is_active)"),
+    ("ix_quiz_sessions_user_completed",
+     "CREATE INDEX IF NOT EXISTS ix_quiz_sessions_user_completed ON quiz_sessions (user_id, is_completed)"),
+    ("ix_quiz_sessions_user_started",
+     "CREATE INDEX IF NOT EXISTS ix_quiz_sessions_user_started ON quiz_sessions (user_id, started_at DESC)"),
+]
+
+def run_migration():
+    """Create indexes matching the quiz menu, sampling and history filters"""
+    
+    # Get database path
+    db_path = Path(__file__).parent.parent / "botcamp_medical.db"
+    
+    if not db_path.exists():
+        print("Database not found, skipping migration")
+        return
+    
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+    
+    try:
+        for name, ddl in INDEXES:
+            cursor.execute(ddl)
+            print(f"Ensured index {name}")
+        
+        conn.commit()
+        print("Migration completed successfully")
+        
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,40 @@
+"""
+Migration to convert quiz_sessions.question_ids from comma-separated text to JSON arrays
+"""
+
+import sqlite3
+from pathlib import Path
+
+def run_migration():
+    """Rewrite legacy "1,2,3" values as "[1,2,3]" so the JSON column type can load them"""
+    
+    # Get database path
+    db_path = Path(__file__).parent.parent / "botcamp_medical.db"
+    
+    if not db_path.exists():
+        print("Database not found, skipping migration")
+        return
+    
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            UPDATE quiz_sessions
+            SET question_ids = '[' || question_ids || ']'
+            WHERE question_ids IS NOT NULL AND question_ids != '' AND question_ids NOT LIKE '[%'
+        """)
+        print(f"Converted {cursor.rowcount} quiz session(s)")
+        cursor.execute("UPDATE quiz_sessions SET question_ids = NULL WHERE question_ids = ''")
+        
+        conn.commit()
+        print("Migration completed successfully")
+        
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    run_migration()
@@ -203,7 +203,7 @@ class QuizSession(Base):
     grade = Column(String, nullable=True)
     duration_seconds = Column(Integer, nullable=True)
     accuracy = Column(Integer, nullable=True)
-    question_ids = Column(Text, nullable=True)  # Comma-separated question IDs
+    question_ids = Column(JSON, nullable=True)  # Ordered list of question IDs
     score_percent = Column(Integer, nullable=True)  # Final percentage score
 
     # Helper properties to maintain compatibility
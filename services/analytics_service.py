@@ -4,17 +4,26 @@ Handles quiz analytics, contributor analytics, and admin dashboards
 """
 
 import logging
+import os
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, desc, and_, case
 from database.models import (
     User, Question, QuizSession, QuizAnswer, Topic, Unit, Course, University
 )
 from database.db_v2 import SessionLocal
+from services.cache import memory_cache
+from utils.helpers import escape_markdown_legacy as md
 
 logger = logging.getLogger(__name__)
 
+# System-wide aggregates are cached briefly so repeated dashboard opens
+# and "Refresh" taps don't rescan the tables every time.
+ANALYTICS_CACHE_TTL = int(os.getenv("CACHE_TTL_ANALYTICS", "60"))
+QUIZ_ANALYTICS_CACHE_KEY = "analytics_quizzes"
+ADMIN_DASHBOARD_CACHE_KEY = "analytics_admin_dashboard"
+
 class AnalyticsService:
     def __init__(self):
         self.db_session = SessionLocal
@@ -22,185 +31,211 @@ class AnalyticsService:
     def get_quiz_analytics(self, user_id: Optional[int] = None, topic_id: Optional[int] = None, 
                           days_back: int = 30) -> Dict[str, Any]:
         """Get comprehensive quiz analytics"""
+        cacheable = user_id is None and topic_id is None and days_back == 30
+        if cacheable:
+            cached = memory_cache.get(QUIZ_ANALYTICS_CACHE_KEY)
+            if cached is not None:
+                return cached
         try:
-            session = self.db_session()
-            
-            # Base query for quiz sessions
-            query = session.query(QuizSession)
-            
-            # Apply filters
-            if user_id:
-                query = query.filter(QuizSession.user_id == user_id)
-            if topic_id:
-                query = query.filter(QuizSession.topic_id == topic_id)
-            
-            # Date filter
-            date_filter = datetime.utcnow() - timedelta(days=days_back)
-            query = query.filter(QuizSession.started_at >= date_filter)
-            
-            # Get basic stats
-            total_quizzes = query.count()
-            completed_quizzes = query.filter(QuizSession.is_completed == True).count()
-            
-            if completed_quizzes == 0:
-                return {
-                    "total_quizzes": 0,
-                    "completed_quizzes": 0,
-                    "average_accuracy": 0,
-                    "total_questions_attempted": 0,
-                    "total_correct_answers": 0,
-                    "most_attempted_topics": [],
-                    "lowest_performing_topics": [],
-                    "top_students": []
-                }
-            
-            # Calculate averages
-            avg_accuracy = session.query(func.avg(QuizSession.accuracy)).filter(
-                QuizSession.is_completed == True,
-                QuizSession.accuracy.isnot(None)
-            ).scalar() or 0
-            
-            total_questions = session.query(func.sum(QuizSession.total_questions)).filter(
-                QuizSession.is_completed == True
-            ).scalar() or 0
-            
-            total_correct = session.query(func.sum(QuizSession.correct_answers)).filter(
-                QuizSession.is_completed == True
-            ).scalar() or 0
-            
-            # Most attempted topics
-            most_attempted = session.query(
-                Topic.name,
-                func.count(QuizSession.id).label('attempt_count')
-            ).join(QuizSession).filter(
-                QuizSession.is_completed == True
-            ).group_by(Topic.id, Topic.name).order_by(desc('attempt_count')).limit(5).all()
-            
-            # Lowest performing topics (by average accuracy)
-            lowest_performing = session.query(
-                Topic.name,
-                func.avg(QuizSession.accuracy).label('avg_accuracy')
-            ).join(QuizSession).filter(
-                QuizSession.is_completed == True,
-                QuizSession.accuracy.isnot(None)
-            ).group_by(Topic.id, Topic.name).order_by('avg_accuracy').limit(5).all()
-            
-            # Top students (by average accuracy)
-            top_students = session.query(
-                User.username,
-                User.first_name,
-                func.avg(QuizSession.accuracy).label('avg_accuracy'),
-                func.count(QuizSession.id).label('quiz_count')
-            ).join(QuizSession).filter(
-                QuizSession.is_completed == True,
-                QuizSession.accuracy.isnot(None),
-                User.role == 'student'
-            ).group_by(User.user_id, User.username, User.first_name).having(
-                func.count(QuizSession.id) >= 3  # At least 3 quizzes
-            ).order_by(desc('avg_accuracy')).limit(10).all()
-            
-            session.close()
-            
-            return {
-                "total_quizzes": total_quizzes,
-                "completed_quizzes": completed_quizzes,
-                "average_accuracy": round(avg_accuracy, 1),
-                "total_questions_attempted": total_questions,
-                "total_correct_answers": total_correct,
-                "most_attempted_topics": [{"name": name, "count": count} for name, count in most_attempted],
-                "lowest_performing_topics": [{"name": name, "accuracy": round(acc, 1)} for name, acc in lowest_performing],
-                "top_students": [{"username": username or first_name or "Unknown", "accuracy": round(acc, 1), "quizzes": count} 
-                               for username, first_name, acc, count in top_students]
-            }
+            with self.db_session() as session:
+                analytics = self._quiz_analytics(session, user_id, topic_id, days_back)
             
         except Exception as e:
             logger.error(f"Error getting quiz analytics: {e}")
             return {}
+        
+        if cacheable:
+            memory_cache.set(QUIZ_ANALYTICS_CACHE_KEY, analytics, ANALYTICS_CACHE_TTL)
+        return analytics
+    
+    def invalidate_cached_analytics(self):
+        """Drop cached system-wide aggregates after moderation changes"""
+        memory_cache.delete(QUIZ_ANALYTICS_CACHE_KEY)
+        memory_cache.delete(ADMIN_DASHBOARD_CACHE_KEY)
+    
+    def _quiz_analytics(self, session: Session, user_id: Optional[int] = None,
+                        topic_id: Optional[int] = None, days_back: int = 30) -> Dict[str, Any]:
+        """Quiz analytics computed on the caller's session"""
+        # Base query for quiz sessions
+        query = session.query(QuizSession)
+        
+        # Apply filters
+        if user_id:
+            query = query.filter(QuizSession.user_id == user_id)
+        if topic_id:
+            query = query.filter(QuizSession.topic_id == topic_id)
+        
+        # Date filter
+        date_filter = datetime.utcnow() - timedelta(days=days_back)
+        query = query.filter(QuizSession.started_at >= date_filter)
+        
+        # Get basic stats
+        total_quizzes = query.count()
+        completed_quizzes = query.filter(QuizSession.is_completed == True).count()
+        
+        if completed_quizzes == 0:
+            return {
+                "total_quizzes": 0,
+                "completed_quizzes": 0,
+                "average_accuracy": 0,
+                "total_questions_attempted": 0,
+                "total_correct_answers": 0,
+                "most_attempted_topics": [],
+                "lowest_performing_topics": [],
+                "top_students": []
+            }
+        
+        # Calculate averages
+        avg_accuracy = session.query(func.avg(QuizSession.accuracy)).filter(
+            QuizSession.is_completed == True,
+            QuizSession.accuracy.isnot(None)
+        ).scalar() or 0
+        
+        total_questions = session.query(func.sum(QuizSession.total_questions)).filter(
+            QuizSession.is_completed == True
+        ).scalar() or 0
+        
+        total_correct = session.query(func.sum(QuizSession.correct_answers)).filter(
+            QuizSession.is_completed == True
+        ).scalar() or 0
+        
+        # Most attempted topics
+        most_attempted = session.query(
+            Topic.name,
+            func.count(QuizSession.id).label('attempt_count')
+        ).join(QuizSession).filter(
+            QuizSession.is_completed == True
+        ).group_by(Topic.id, Topic.name).order_by(desc('attempt_count')).limit(5).all()
+        
+        # Lowest performing topics (by average accuracy)
+        lowest_performing = session.query(
+            Topic.name,
+            func.avg(QuizSession.accuracy).label('avg_accuracy')
+        ).join(QuizSession).filter(
+            QuizSession.is_completed == True,
+            QuizSession.accuracy.isnot(None)
+        ).group_by(Topic.id, Topic.name).order_by('avg_accuracy').limit(5).all()
+        
+        # Top students (by average accuracy)
+        top_students = session.query(
+            User.username,
+            User.first_name,
+            func.avg(QuizSession.accuracy).label('avg_accuracy'),
+            func.count(QuizSession.id).label('quiz_count')
+        ).join(QuizSession).filter(
+            QuizSession.is_completed == True,
+            QuizSession.accuracy.isnot(None),
+            User.role == 'student'
+        ).group_by(User.user_id, User.username, User.first_name).having(
+            func.count(QuizSession.id) >= 3  # At least 3 quizzes
+        ).order_by(desc('avg_accuracy')).limit(10).all()
+        
+        return {
+            "total_quizzes": total_quizzes,
+            "completed_quizzes": completed_quizzes,
+            "average_accuracy": round(avg_accuracy, 1),
+            "total_questions_attempted": total_questions,
+            "total_correct_answers": total_correct,
+            "most_attempted_topics": [{"name": md(name), "count": count} for name, count in most_attempted],
+            "lowest_performing_topics": [{"name": md(name), "accuracy": round(acc, 1)} for name, acc in lowest_performing],
+            "top_students": [{"username": md(username or first_name or "Unknown"), "accuracy": round(acc, 1), "quizzes": count} 
+                           for username, first_name, acc, count in top_students]
+        }
     
     def get_contributor_analytics(self, user_id: int) -> Dict[str, Any]:
         """Get analytics for a specific contributor"""
         try:
-            session = self.db_session()
-            
-            # Get user info
-            user = session.query(User).filter(User.user_id == user_id).first()
-            if not user:
-                return {}
-            
-            # Get upload stats
-            total_uploaded = session.query(Question).filter(Question.uploader_id == user_id).count()
-            approved_count = session.query(Question).filter(
-                Question.uploader_id == user_id,
-                Question.needs_review == False
-            ).count()
-            flagged_count = session.query(Question).filter(
-                Question.uploader_id == user_id,
-                Question.needs_review == True
-            ).count()
-            rejected_count = session.query(Question).filter(
-                Question.uploader_id == user_id,
-                Question.is_active == False
-            ).count()
-            
-            # Average moderation score
-            avg_score = session.query(func.avg(Question.moderation_score)).filter(
-                Question.uploader_id == user_id,
-                Question.moderation_score.isnot(None)
-            ).scalar() or 0
-            
-            # Most active unit
-            most_active_unit = session.query(
-                Unit.name,
-                func.count(Question.question_id).label('question_count')
-            ).join(Question, Question.unit == Unit.name).filter(
-                Question.uploader_id == user_id
-            ).group_by(Unit.name).order_by(desc('question_count')).first()
-            
-            # Most active topic
-            most_active_topic = session.query(
-                Topic.name,
-                func.count(Question.question_id).label('question_count')
-            ).join(Question, Question.topic == Topic.name).filter(
-                Question.uploader_id == user_id
-            ).group_by(Topic.name).order_by(desc('question_count')).first()
-            
-            # Quiz performance
-            quiz_stats = session.query(
-                func.count(QuizSession.id).label('total_quizzes'),
-                func.avg(QuizSession.accuracy).label('avg_accuracy')
-            ).filter(QuizSession.user_id == user_id).first()
-            
-            session.close()
-            
-            return {
-                "user_info": {
-                    "username": user.username or user.first_name or "Unknown",
-                    "role": user.role
-                },
-                "upload_stats": {
-                    "total_uploaded": total_uploaded,
-                    "approved": approved_count,
-                    "flagged": flagged_count,
-                    "rejected": rejected_count,
-                    "approval_rate": round((approved_count / total_uploaded * 100) if total_uploaded > 0 else 0, 1)
-                },
-                "quality_metrics": {
-                    "average_moderation_score": round(avg_score, 1),
-                    "most_active_unit": most_active_unit[0] if most_active_unit else "None",
-                    "most_active_topic": most_active_topic[0] if most_active_topic else "None"
-                },
-                "quiz_performance": {
-                    "total_quizzes_taken": quiz_stats[0] or 0,
-                    "average_accuracy": round(quiz_stats[1] or 0, 1)
-                }
-            }
+            with self.db_session() as session:
+                return self._contributor_analytics(session, user_id)
             
         except Exception as e:
             logger.error(f"Error getting contributor analytics: {e}")
             return {}
     
+    def _contributor_analytics(self, session: Session, user_id: int) -> Dict[str, Any]:
+        """Contributor analytics computed on the caller's session"""
+        # Get user info
+        user = session.query(User).filter(User.user_id == user_id).first()
+        if not user:
+            return {}
+        
+        # Upload stats and average moderation score in one scan
+        upload_stats = session.query(
+            func.count(Question.question_id),
+            func.sum(case((Question.needs_review == False, 1), else_=0)),
+            func.sum(case((Question.needs_review == True, 1), else_=0)),
+            func.sum(case((Question.is_active == False, 1), else_=0)),
+            func.avg(Question.moderation_score)
+        ).filter(Question.uploader_id == user_id).one()
+        total_uploaded = upload_stats[0] or 0
+        approved_count = upload_stats[1] or 0
+        flagged_count = upload_stats[2] or 0
+        rejected_count = upload_stats[3] or 0
+        avg_score = upload_stats[4] or 0
+        
+        # Most active unit
+        most_active_unit = session.query(
+            Unit.name,
+            func.count(Question.question_id).label('question_count')
+        ).join(Question, Question.unit == Unit.name).filter(
+            Question.uploader_id == user_id
+        ).group_by(Unit.name).order_by(desc('question_count')).first()
+        
+        # Most active topic
+        most_active_topic = session.query(
+            Topic.name,
+            func.count(Question.question_id).label('question_count')
+        ).join(Question, Question.topic == Topic.name).filter(
+            Question.uploader_id == user_id
+        ).group_by(Topic.name).order_by(desc('question_count')).first()
+        
+        # Quiz performance
+        quiz_stats = session.query(
+            func.count(QuizSession.id).label('total_quizzes'),
+            func.avg(QuizSession.accuracy).label('avg_accuracy')
+        ).filter(QuizSession.user_id == user_id).first()
+        
+        return {
+            "user_info": {
+                "username": md(user.username or user.first_name or "Unknown"),
+                "role": user.role
+            },
+            "upload_stats": {
+                "total_uploaded": total_uploaded,
+                "approved": approved_count,
+                "flagged": flagged_count,
+                "rejected": rejected_count,
+                "approval_rate": round((approved_count / total_uploaded * 100) if total_uploaded > 0 else 0, 1)
+            },
+            "quality_metrics": {
+                "average_moderation_score": round(avg_score, 1),
+                "most_active_unit": md(most_active_unit[0]) if most_active_unit else "None",
+                "most_active_topic": md(most_active_topic[0]) if most_active_topic else "None"
+            },
+            "quiz_performance": {
+                "total_quizzes_taken": quiz_stats[0] or 0,
+                "average_accuracy": round(quiz_stats[1] or 0, 1)
+            }
+        }
+    
+    def get_personal_stats(self, user_id: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Get quiz and contributor analytics for one user over a single session"""
+        try:
+            with self.db_session() as session:
+                return (
+                    self._quiz_analytics(session, user_id=user_id),
+                    self._contributor_analytics(session, user_id)
+                )
+            
+        except Exception as e:
+            logger.error(f"Error getting personal stats: {e}")
+            return {}, {}
+    
     def get_admin_dashboard_data(self, admin_user_id: Optional[int] = None) -> Dict[str, Any]:
         """Get comprehensive admin dashboard data"""
+        cached = memory_cache.get(ADMIN_DASHBOARD_CACHE_KEY)
+        if cached is not None:
+            return cached
         try:
             session = self.db_session()
             
@@ -249,7 +284,7 @@ class AnalyticsService:
             
             session.close()
             
-            return {
+            dashboard_data = {
                 "system_overview": {
                     "total_users": total_users,
                     "total_students": total_students,
@@ -265,39 +300,46 @@ class AnalyticsService:
                     "quiz_sessions_this_week": recent_quizzes,
                     "uploads_this_week": recent_uploads,
                     "average_quiz_accuracy": round(avg_quiz_accuracy, 1),
-                    "most_active_topic": most_active_topic[0] if most_active_topic else "None"
+                    "most_active_topic": md(most_active_topic[0]) if most_active_topic else "None"
                 },
                 "moderation": {
                     "questions_pending_review": pending_review
                 }
             }
+            memory_cache.set(ADMIN_DASHBOARD_CACHE_KEY, dashboard_data, ANALYTICS_CACHE_TTL)
+            return dashboard_data
             
         except Exception as e:
             logger.error(f"Error getting admin dashboard data: {e}")
             return {}
     
-    def get_moderation_queue(self) -> List[Dict[str, Any]]:
+    def _moderation_queue_query(self, session: Session):
+        """Pending-review questions with their uploader eagerly joined"""
+        return session.query(Question).options(joinedload(Question.uploader)).filter(
+            Question.needs_review == True
+        ).order_by(Question.created_at.desc())
+    
+    def _moderation_queue_item(self, q: Question) -> Dict[str, Any]:
+        """Queue row with user-supplied text pre-escaped for Markdown messages"""
+        uploader = q.uploader
+        return {
+            "question_id": q.question_id,
+            "question_text": md(q.question_text[:100] + "..." if len(q.question_text) > 100 else q.question_text),
+            "topic": md(q.topic),
+            "unit": md(q.unit),
+            "moderation_score": q.moderation_score,
+            "moderation_comments": md(q.moderation_comments),
+            "uploader": md(uploader.username or uploader.first_name or "Unknown") if uploader else "Unknown",
+            "created_at": q.created_at.strftime("%Y-%m-%d %H:%M") if q.created_at else "Unknown"
+        }
+    
+    def get_moderation_queue(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Get questions pending moderation review"""
         try:
             session = self.db_session()
             
-            pending_questions = session.query(Question).filter(
-                Question.needs_review == True
-            ).order_by(Question.created_at.desc()).limit(50).all()
-            
-            result = []
-            for q in pending_questions:
-                uploader = session.query(User).filter(User.user_id == q.uploader_id).first()
-                result.append({
-                    "question_id": q.question_id,
-                    "question_text": q.question_text[:100] + "..." if len(q.question_text) > 100 else q.question_text,
-                    "topic": q.topic,
-                    "unit": q.unit,
-                    "moderation_score": q.moderation_score,
-                    "moderation_comments": q.moderation_comments,
-                    "uploader": uploader.username or uploader.first_name or "Unknown" if uploader else "Unknown",
-                    "created_at": q.created_at.strftime("%Y-%m-%d %H:%M") if q.created_at else "Unknown"
-                })
+            pending_questions = self._moderation_queue_query(session).limit(limit).all()
+            result = [self._moderation_queue_item(q) for q in pending_questions]
             
             session.close()
             return result
@@ -306,6 +348,28 @@ class AnalyticsService:
             logger.error(f"Error getting moderation queue: {e}")
             return []
     
+    def get_moderation_queue_page(self, limit: int = 10) -> Dict[str, Any]:
+        """Get the first page of the moderation queue plus the total pending count"""
+        try:
+            session = self.db_session()
+            
+            total_count = session.query(func.count(Question.question_id)).filter(
+                Question.needs_review == True
+            ).scalar() or 0
+            pending_questions = self._moderation_queue_query(session).limit(limit).all() if total_count else []
+            
+            result = {
+                "questions": [self._moderation_queue_item(q) for q in pending_questions],
+                "total_count": total_count
+            }
+            
+            session.close()
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error getting moderation queue page: {e}")
+            return {"questions": [], "total_count": 0}
+    
     def update_user_analytics(self, user_id: int, quiz_session: QuizSession):
         """Update user analytics after quiz completion"""
         try:
@@ -335,36 +399,48 @@ class AnalyticsService:
         except Exception as e:
             logger.error(f"Error updating user analytics: {e}")
     
-    def update_contributor_stats(self, user_id: int, question_id: int, action: str):
-        """Update contributor stats when question is moderated"""
+    def update_contributor_stats(self, user_id: int, question_id: int, action: str,
+                                 session: Optional[Session] = None):
+        """Update contributor stats when question is moderated
+        
+        Pass the caller's session to make the update part of its transaction;
+        errors then propagate so the whole moderation action rolls back.
+        """
+        if session is not None:
+            self._update_contributor_stats(session, user_id, question_id, action)
+            return
         try:
-            session = self.db_session()
-            
-            user = session.query(User).filter(User.user_id == user_id).first()
-            if not user:
-                return
-            
-            if action == "approved":
-                user.approved_count = (user.approved_count or 0) + 1
-            elif action == "flagged":
-                user.flagged_count = (user.flagged_count or 0) + 1
-            elif action == "rejected":
-                user.rejected_count = (user.rejected_count or 0) + 1
-            
-            # Update average moderation score
-            question = session.query(Question).filter(Question.question_id == question_id).first()
-            if question and question.moderation_score:
-                all_questions = session.query(Question).filter(
-                    Question.uploader_id == user_id,
-                    Question.moderation_score.isnot(None)
-                ).all()
-                
-                if all_questions:
-                    avg_score = sum(q.moderation_score for q in all_questions) / len(all_questions)
-                    user.average_moderation_score = round(avg_score)
-            
-            session.commit()
-            session.close()
+            with self.db_session() as own_session:
+                self._update_contributor_stats(own_session, user_id, question_id, action)
+                own_session.commit()
             
         except Exception as e:
             logger.error(f"Error updating contributor stats: {e}")
+    
+    def _update_contributor_stats(self, session: Session, user_id: int, question_id: int, action: str):
+        """Apply contributor stat changes on the caller's session without committing"""
+        user = session.get(User, user_id)
+        if not user:
+            return
+        
+        if action == "approved":
+            user.approved_count = (user.approved_count or 0) + 1
+        elif action == "flagged":
+            user.flagged_count = (user.flagged_count or 0) + 1
+        elif action == "rejected":
+            user.rejected_count = (user.rejected_count or 0) + 1
+        
+        # Update average moderation score (identity map hit when the caller loaded the question)
+        question = session.get(Question, question_id)
+        if question and question.moderation_score:
+            session.flush()  # sessions are created with autoflush=False
+            avg_score = session.query(func.avg(Question.moderation_score)).filter(
+                Question.uploader_id == user_id,
+                Question.moderation_score.isnot(None)
+            ).scalar()
+            if avg_score is not None:
+                user.average_moderation_score = round(avg_score)
+
+
+# Shared instance; the service is stateless apart from its session factory
+analytics_service = AnalyticsService()
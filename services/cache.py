@@ -1,7 +1,12 @@
+import json
+import logging
+import os
 import threading
 import time
 from typing import Any, Optional
 
+logger = logging.getLogger(__name__)
+
 
 class CacheProvider:
     def get(self, key: str) -> Any:
@@ -52,7 +57,39 @@ class MemoryCache(CacheProvider):
             return {"hits": self._hits, "misses": self._misses, "hit_ratio": ratio}
 
 
+class RedisCache(CacheProvider):
+    """JSON-serialized cache shared by every bot worker; values must be JSON-compatible"""
+
+    def __init__(self, url: str, prefix: str = "botcamp:") -> None:
+        import redis
+
+        self._client = redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key: str) -> Any:
+        raw = self._client.get(self._prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        self._client.set(self._prefix + key, json.dumps(value), ex=ttl or None)
+
+    def delete(self, key: str) -> None:
+        self._client.delete(self._prefix + key)
+
+
+def _build_shared_cache() -> CacheProvider:
+    url = os.getenv("REDIS_URL")
+    if url:
+        try:
+            return RedisCache(url)
+        except ImportError:
+            logger.warning("REDIS_URL is set but the redis package is not installed; using in-process cache")
+    return memory_cache
+
+
 # Global cache instance (simple for now)
 memory_cache = MemoryCache()
+# Conversation state that must survive restarts and be visible to every worker
+shared_cache = _build_shared_cache()
 
 
@@ -0,0 +1,26 @@
+"""
+Process-wide service and handler instances
+Handlers share these rather than constructing their own, so there is one DB
+session per service and one set of in-process quiz state.
+"""
+
+from services.user_service import UserService
+from services.quiz_service import QuizService
+from services.session_service import SessionService
+from services.multi_admin_service import MultiAdminService
+from services.backup_export_service import BackupExportService
+from services.multi_university_service import MultiUniversityService
+from handlers.quiz_handler import QuizHandler
+from handlers.role_auth import RoleAuthHandler
+from handlers.specification_handlers import SpecificationHandlers
+
+user_service = UserService()
+quiz_service = QuizService()
+quiz_handler = QuizHandler(quiz_service, user_service)
+role_auth_handler = RoleAuthHandler(quiz_handler, user_service)
+
+session_service = SessionService()
+multi_admin_service = MultiAdminService()
+backup_service = BackupExportService()
+university_service = MultiUniversityService()
+spec_handler = SpecificationHandlers(session_service, multi_admin_service, backup_service, university_service)
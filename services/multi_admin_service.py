@@ -55,7 +55,7 @@ class MultiAdminService:
             if batch.locked_by and batch.locked_by != admin_id:
                 # Check if lock has expired
                 if batch.locked_at and (datetime.utcnow() - batch.locked_at).total_seconds() < (self.lock_timeout_minutes * 60):
-                    locker = session.query(User).filter(User.user_id == batch.locked_by).first()
+                    locker = session.query(User.username, User.first_name).filter(User.user_id == batch.locked_by).first()
                     locker_name = locker.username or locker.first_name if locker else "Unknown"
                     session.close()
                     return {
@@ -119,7 +119,7 @@ class MultiAdminService:
             
             result = []
             for batch in batches:
-                uploader = session.query(User).filter(User.user_id == batch.uploader_id).first()
+                uploader = session.query(User.username, User.first_name).filter(User.user_id == batch.uploader_id).first()
                 result.append({
                     "batch_id": batch.batch_id,
                     "uploader": uploader.username or uploader.first_name if uploader else "Unknown",
@@ -199,7 +199,7 @@ class MultiAdminService:
             
             result = []
             for audit in audits:
-                admin = session.query(User).filter(User.user_id == audit.admin_id).first()
+                admin = session.query(User.username, User.first_name).filter(User.user_id == audit.admin_id).first()
                 result.append({
                     "audit_id": audit.audit_id,
                     "old_value": audit.old_value,
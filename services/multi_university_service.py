@@ -9,6 +9,7 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 from database.models import University, Course, Unit, Topic, Paper, Question, AdminScope, User
 from database.db_v2 import SessionLocal
+from services.cache import memory_cache
 
 logger = logging.getLogger(__name__)
 
@@ -165,6 +166,8 @@ class MultiUniversityService:
             session.refresh(topic)
             
             session.close()
+            # The quiz topic menu caches the active topic list
+            memory_cache.delete("active_topics")
             
             return {
                 "success": True,
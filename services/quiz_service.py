@@ -4,17 +4,55 @@ Quiz service for managing quiz sessions and results
 
 from database.db import SessionLocal
 from database.models import Question, QuizSession, QuizAnswer, QuizResult, User
-from sqlalchemy import select, func, desc
+from sqlalchemy import select, func, desc, insert
 from typing import List, Dict, Any, Optional
+from collections import defaultdict
 import logging
 import random
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Answers are buffered per session and written in one multi-row INSERT
+ANSWER_FLUSH_SIZE = 20
+
 class QuizService:
     def __init__(self):
         self.db = SessionLocal()
+        self._pending_answers = defaultdict(list)
+        # quiz session id -> owning user_id, for sessions that have buffered answers
+        self._pending_owner: Dict[int, int] = {}
+    
+    def flush_pending_answers(self, user_id: Optional[int] = None) -> None:
+        """Write buffered QuizAnswer rows in one INSERT, in its own transaction
+        
+        Only user_id's sessions when given, otherwise everything (used on shutdown).
+        Rows leave the buffer only once the commit succeeded; on failure they stay
+        buffered for the next flush.
+        """
+        if user_id is None:
+            session_ids = list(self._pending_answers)
+        else:
+            session_ids = [sid for sid, owner in self._pending_owner.items() if owner == user_id]
+        rows = [row for session_id in session_ids for row in self._pending_answers.get(session_id, ())]
+        if not rows:
+            return
+        db = SessionLocal()
+        try:
+            db.execute(insert(QuizAnswer), rows)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Error flushing buffered quiz answers: {e}")
+            db.rollback()
+            return
+        finally:
+            db.close()
+        for session_id in session_ids:
+            self._forget_pending(session_id)
+    
+    def _forget_pending(self, session_id: int) -> None:
+        self._pending_answers.pop(session_id, None)
+        self._pending_owner.pop(session_id, None)
     
     def get_questions_for_topic(self, unit: str, topic: str = None, limit: int = 10, difficulty: str = None) -> List[Question]:
         """Get questions for a specific unit/topic with dynamic filtering"""
@@ -41,6 +79,9 @@ class QuizService:
     
     def create_quiz_session(self, user_id: int, unit: str, topic: str = None) -> Optional[QuizSession]:
         """Create a new quiz session"""
+        # Write out answers this user left behind in abandoned quizzes, separately from the new session
+        self.flush_pending_answers(user_id)
+        
         try:
             # Get questions for the quiz
             questions = self.get_questions_for_topic(unit, topic)
@@ -118,16 +159,16 @@ class QuizService:
             # Check if answer is correct
             is_correct = user_answer.upper() == question.correct_option.upper()
             
-            # Create quiz answer record
-            quiz_answer = QuizAnswer(
-                session_id=session_id,
-                question_id=question_id,
-                user_answer=user_answer,
-                is_correct=is_correct,
-                answered_at=datetime.utcnow()
-            )
-            
-            self.db.add(quiz_answer)
+            # Scoring below does not need the answer persisted; it is buffered once the
+            # commit succeeds, so a failed submit that is retried isn't recorded twice
+            answer = {
+                "session_id": session_id,
+                "question_id": question_id,
+                "user_answer": user_answer,
+                "is_correct": is_correct,
+                "answered_at": datetime.utcnow()
+            }
+            pending = self._pending_answers.get(session_id, [])
             
             # Update session
             if is_correct:
@@ -165,8 +206,19 @@ class QuizService:
                     else:
                         user.average_accuracy = int((user.average_accuracy + session.score_percentage) / 2)
             
+            # Flushed rows go in this transaction and leave the buffer only after it commits
+            flush = session.is_completed or len(pending) + 1 >= ANSWER_FLUSH_SIZE
+            if flush:
+                self.db.execute(insert(QuizAnswer), [*pending, answer])
+            
             self.db.commit()
             
+            if flush:
+                self._forget_pending(session_id)
+            else:
+                self._pending_answers[session_id].append(answer)
+                self._pending_owner[session_id] = session.user_id
+            
             return {
                 "is_correct": is_correct,
                 "correct_answer": question.correct_option,
@@ -4,17 +4,33 @@ Implements Part 4 - Dynamic Role Management and Access Control
 """
 
 import logging
+import os
 import secrets
 import hashlib
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from database.models import User, AdminAccessCode, QuestionUpload, RoleAuditLog, AdminScope
+from database.models import User, AdminAccessCode, QuestionUpload, RoleAuditLog, AdminScope, University, Course
 from database.db_v2 import SessionLocal
+from services.user_cache import invalidate_user
+from services.cache import memory_cache
 from cryptography.fernet import Fernet
 
 logger = logging.getLogger(__name__)
 
+ROLE_CACHE_TTL = int(os.getenv("CACHE_TTL_ADMIN_ROLE", "60"))
+
+def _role_key(user_id: int) -> str:
+    return f"role_{user_id}"
+
+def _super_admin_key(user_id: int) -> str:
+    return f"is_super_admin_{user_id}"
+
+def _forget_role(user_id: int) -> None:
+    memory_cache.delete(_role_key(user_id))
+    memory_cache.delete(_super_admin_key(user_id))
+
 class RoleManagementService:
     def __init__(self):
         self.db_session = SessionLocal
@@ -114,6 +130,8 @@ class RoleManagementService:
                         access_code.used_at = datetime.utcnow()
                         
                         session.commit()
+                        invalidate_user(user.telegram_id)
+                        _forget_role(user_id)
                         
                         # Log the role change
                         self._log_role_action(
@@ -156,6 +174,8 @@ class RoleManagementService:
                     old_role = user.role
                     user.role = "super_admin"
                     session.commit()
+                    invalidate_user(user.telegram_id)
+                    _forget_role(user_id)
                     
                     # Log the role change
                     self._log_role_action(
@@ -203,6 +223,8 @@ class RoleManagementService:
             old_role = target_user.role
             target_user.role = "admin"
             session.commit()
+            invalidate_user(target_user.telegram_id)
+            _forget_role(target_user_id)
             
             # Log the promotion
             self._log_role_action(
@@ -254,6 +276,8 @@ class RoleManagementService:
             old_role = target_user.role
             target_user.role = "student"
             session.commit()
+            invalidate_user(target_user.telegram_id)
+            _forget_role(target_user_id)
             
             # Log the demotion
             self._log_role_action(
@@ -305,6 +329,7 @@ class RoleManagementService:
             # Disable the user
             target_user.is_active = False
             session.commit()
+            _forget_role(target_user_id)
             
             # Log the action
             self._log_role_action(
@@ -324,13 +349,45 @@ class RoleManagementService:
             logger.error(f"Error disabling admin: {e}")
             return {"success": False, "message": f"Error disabling admin: {str(e)}"}
     
+    def get_cached_super_admin(self, user_id: int) -> Optional[bool]:
+        """Cached result of is_super_admin; None on a miss"""
+        return memory_cache.get(_super_admin_key(user_id))
+    
+    def is_super_admin(self, user_id: int) -> bool:
+        """Permission check as a single EXISTS query, cached like get_user_role"""
+        cached = memory_cache.get(_super_admin_key(user_id))
+        if cached is not None:
+            return cached
+        try:
+            session = self.db_session()
+            try:
+                allowed = bool(session.query(
+                    session.query(User).filter(
+                        User.user_id == user_id,
+                        User.role == "super_admin"
+                    ).exists()
+                ).scalar())
+            finally:
+                session.close()
+            memory_cache.set(_super_admin_key(user_id), allowed, ROLE_CACHE_TTL)
+            return allowed
+        except Exception as e:
+            logger.error(f"Error checking super admin: {e}")
+            return False
+    
     def get_user_role(self, user_id: int) -> Optional[str]:
-        """Get user's current role"""
+        """Get user's current role, served from a short-lived cache"""
+        role = memory_cache.get(_role_key(user_id))
+        if role is not None:
+            return role
         try:
             session = self.db_session()
             user = session.query(User).filter(User.user_id == user_id).first()
             session.close()
-            return user.role if user else None
+            role = user.role if user else None
+            if role is not None:
+                memory_cache.set(_role_key(user_id), role, ROLE_CACHE_TTL)
+            return role
         except Exception as e:
             logger.error(f"Error getting user role: {e}")
             return None
@@ -340,29 +397,37 @@ class RoleManagementService:
         try:
             session = self.db_session()
             
-            admins = session.query(User).filter(
+            # Admins with their scope names in one query; an admin's first scope wins
+            rows = session.query(
+                User.user_id, User.username, User.first_name, User.role,
+                User.last_activity, User.is_active,
+                University.name, Course.name
+            ).outerjoin(
+                AdminScope, AdminScope.admin_id == User.user_id
+            ).outerjoin(
+                University, University.id == AdminScope.university_id
+            ).outerjoin(
+                Course, Course.id == AdminScope.course_id
+            ).filter(
                 User.role.in_(["admin", "super_admin"]),
                 User.is_active == True
-            ).all()
-            
-            result = []
-            for admin in admins:
-                # Get admin scope if exists
-                scope = session.query(AdminScope).filter(AdminScope.admin_id == admin.user_id).first()
-                
-                result.append({
-                    "user_id": admin.user_id,
-                    "username": admin.username,
-                    "first_name": admin.first_name,
-                    "role": admin.role,
-                    "university": scope.university.name if scope and scope.university else None,
-                    "course": scope.course.name if scope and scope.course else None,
-                    "last_activity": admin.last_activity,
-                    "is_active": admin.is_active
-                })
+            ).order_by(User.user_id, AdminScope.id).all()
             
             session.close()
-            return result
+            
+            result = {}
+            for user_id, username, first_name, role, last_activity, is_active, university, course in rows:
+                result.setdefault(user_id, {
+                    "user_id": user_id,
+                    "username": username,
+                    "first_name": first_name,
+                    "role": role,
+                    "university": university,
+                    "course": course,
+                    "last_activity": last_activity,
+                    "is_active": is_active
+                })
+            return list(result.values())
             
         except Exception as e:
             logger.error(f"Error getting admin list: {e}")
@@ -464,25 +529,28 @@ class RoleManagementService:
         try:
             session = self.db_session()
             
-            logs = session.query(RoleAuditLog).order_by(
-                RoleAuditLog.timestamp.desc()
-            ).limit(limit).all()
-            
-            result = []
-            for log in logs:
-                user = session.query(User).filter(User.user_id == log.user_id).first()
-                result.append({
-                    "log_id": log.log_id,
-                    "user": user.username or user.first_name if user else "Unknown",
-                    "action": log.action,
-                    "old_role": log.old_role,
-                    "new_role": log.new_role,
-                    "details": log.details,
-                    "timestamp": log.timestamp
-                })
+            # Plain column rows with the actor's name joined in; no ORM entities or per-log user lookups
+            rows = session.execute(
+                select(
+                    RoleAuditLog.log_id, RoleAuditLog.action, RoleAuditLog.old_role,
+                    RoleAuditLog.new_role, RoleAuditLog.details, RoleAuditLog.timestamp,
+                    User.user_id.label("actor_id"), User.username, User.first_name
+                )
+                .outerjoin(User, User.user_id == RoleAuditLog.user_id)
+                .order_by(RoleAuditLog.timestamp.desc())
+                .limit(limit)
+            ).mappings().all()
             
             session.close()
-            return result
+            return [{
+                "log_id": row["log_id"],
+                "user": row["username"] or row["first_name"] if row["actor_id"] is not None else "Unknown",
+                "action": row["action"],
+                "old_role": row["old_role"],
+                "new_role": row["new_role"],
+                "details": row["details"],
+                "timestamp": row["timestamp"]
+            } for row in rows]
             
         except Exception as e:
             logger.error(f"Error getting audit logs: {e}")
@@ -10,6 +10,7 @@ from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 from database.db import SessionLocal
 from database.models import User, SystemLog, EventLog
+from services.user_cache import invalidate_user
 import os
 
 logger = logging.getLogger(__name__)
@@ -218,6 +219,7 @@ class SecurityService:
                     db.add(new_user)
                 
                 db.commit()
+                invalidate_user(telegram_id)
                 
                 # Log admin creation
                 self.log_security_event(created_by, "admin_created", {
@@ -249,6 +251,7 @@ class SecurityService:
                     old_role = user.role
                     user.role = "student"
                     db.commit()
+                    invalidate_user(telegram_id)
                     
                     # Log admin removal
                     self.log_security_event(removed_by, "admin_removed", {
@@ -0,0 +1,68 @@
+"""
+Cached user lookups for auth gates
+Roles and names change rarely, so handlers resolve the calling Telegram user
+through a short-lived cache instead of hydrating a full User row on every
+command and callback.
+"""
+
+import os
+from typing import NamedTuple, Optional
+from sqlalchemy import lambda_stmt, select
+from sqlalchemy.orm import Session
+from database.models import User
+from database.db_v2 import get_session
+from services.cache import memory_cache
+
+USER_CACHE_TTL = int(os.getenv("CACHE_TTL_USER_ROLE", "300"))
+PREFS_CACHE_TTL = int(os.getenv("CACHE_TTL_USER_PREFS", "60"))
+
+
+class CachedUser(NamedTuple):
+    user_id: int
+    role: str
+    username: Optional[str]
+    first_name: Optional[str]
+
+
+def _user_key(telegram_id: int) -> str:
+    return f"user_{telegram_id}"
+
+
+def prefs_key(telegram_id: int) -> str:
+    """Cache key for UserService.get_user_preferences"""
+    return f"user_prefs_{telegram_id}"
+
+
+def _load_user(session: Session, telegram_id: int) -> Optional[CachedUser]:
+    # lambda_stmt caches the constructed statement; telegram_id becomes a bound parameter
+    row = session.execute(lambda_stmt(
+        lambda: select(User.user_id, User.role, User.username, User.first_name)
+        .where(User.telegram_id == telegram_id)
+    )).first()
+    if row is None:
+        return None
+    user = CachedUser(*row)
+    memory_cache.set(_user_key(telegram_id), user, USER_CACHE_TTL)
+    return user
+
+
+def resolve_user(telegram_id: int) -> Optional[CachedUser]:
+    """Return the cached user projection, opening a session only on a miss"""
+    user = memory_cache.get(_user_key(telegram_id))
+    if user is None:
+        with get_session() as session:
+            user = _load_user(session, telegram_id)
+    return user
+
+
+def get_user_role(session: Session, telegram_id: int) -> Optional[str]:
+    """Return the user's role, or None if the user does not exist"""
+    user = memory_cache.get(_user_key(telegram_id)) or _load_user(session, telegram_id)
+    return user.role if user else None
+
+
+def invalidate_user(telegram_id: Optional[int]) -> None:
+    """Forget the cached entries after the user's role, name or preferences changed"""
+    if telegram_id is not None:
+        memory_cache.delete(_user_key(telegram_id))
+        memory_cache.delete(prefs_key(telegram_id))
@@ -4,6 +4,8 @@ User service for managing user roles, preferences, and authentication
 
 from database.db import SessionLocal
 from database.models import User
+from services.user_cache import invalidate_user, prefs_key, PREFS_CACHE_TTL
+from services.cache import memory_cache
 from config.auth import verify_admin_code, verify_super_admin_code, get_admin_name, DEFAULT_SUPER_ADMIN_ID
 from typing import Optional, Dict, Any
 import logging
@@ -49,6 +51,7 @@ class UserService:
                     updated = True
                 if updated:
                     self.db.commit()
+                    invalidate_user(telegram_id)
                     logger.info(f"Updated user info: {user.name}")
             
             return user
@@ -82,6 +85,7 @@ class UserService:
                 logger.info(f"User {user.name} set to student role")
             
             self.db.commit()
+            invalidate_user(telegram_id)
             return True
             
         except Exception as e:
@@ -119,6 +123,7 @@ class UserService:
             
             if updated:
                 self.db.commit()
+                invalidate_user(telegram_id)
                 logger.info(f"Updated preferences for {user.name}: {university}, {course}, {year}")
             
             return True
@@ -129,19 +134,24 @@ class UserService:
             return False
     
     def get_user_preferences(self, telegram_id: int) -> Dict[str, Any]:
-        """Get user's stored preferences"""
+        """Get user's stored preferences, served from a short-lived cache"""
+        prefs = memory_cache.get(prefs_key(telegram_id))
+        if prefs is not None:
+            return prefs
         try:
             user = self.db.query(User).filter(User.telegram_id == telegram_id).first()
             if not user:
                 return {}
             
-            return {
+            prefs = {
                 "university": user.university,
                 "course": user.course,
                 "year": user.year,
                 "role": user.role,
                 "name": user.name
             }
+            memory_cache.set(prefs_key(telegram_id), prefs, PREFS_CACHE_TTL)
+            return prefs
         except Exception as e:
             logger.error(f"Error in get_user_preferences: {e}")
             return {}
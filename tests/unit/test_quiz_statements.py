@@ -0,0 +1,12 @@
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("telegram")
+
+from handlers import quiz
+
+
+def test_topic_question_count_stmt_compiles():
+    sql = str(quiz._topic_question_count_stmt(1).compile())
+    assert "count(questions.question_id)" in sql
+    assert "LEFT OUTER JOIN questions" in sql
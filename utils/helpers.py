@@ -58,6 +58,14 @@ def truncate_text(text: str, max_length: int = 100) -> str:
         return text
     return text[:max_length-3] + "..."
 
+_LEGACY_MARKDOWN_ESCAPES = str.maketrans({char: f'\\{char}' for char in '_*`['})
+
+def escape_markdown_legacy(text):
+    """Escape user-supplied text for parse_mode='Markdown' (Telegram's legacy flavour)"""
+    if text is None:
+        return None
+    return str(text).translate(_LEGACY_MARKDOWN_ESCAPES)
+
 def escape_markdown(text: str) -> str:
     """Escape special characters for Markdown"""
     special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']